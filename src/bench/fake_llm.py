@@ -0,0 +1,116 @@
+"""Servidor local compatível com a API de chat do Ollama, com respostas e latência determinísticas.
+
+Serve para medir o custo do lado do cliente (`OllamaRunner`, cache, concorrência, parsing das respostas) sem um
+modelo de verdade. A resposta é o CSV das linhas da tabela do prompt que têm números, e a latência simula um modelo:
+`prefill_ms` por token de entrada mais `decode_ms` por token gerado, sem sorteio. Assim duas execuções do
+benchmark com o mesmo corpus enviam e recebem exatamente os mesmos bytes e esperam o mesmo tempo.
+
+    python -m src.bench.fake_llm --port 11435
+    python -m src.llm.run_tllama --base_url http://127.0.0.1:11435
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.llm.chunking import approx_token_count
+
+_NUMBER_RE = re.compile(r"\d")
+
+
+def fake_completion(prompt):
+    """Resposta determinística para o prompt: as linhas com algum dígito, com os campos separados por vírgula."""
+    lines = [line.strip() for line in prompt.splitlines()]
+    rows = [",".join(line.replace(",", " ").split()) for line in lines if _NUMBER_RE.search(line)]
+    return "\n".join(rows) or "there is no information"
+
+
+class FakeLLM:
+    """Estado do servidor: parâmetros de latência e contadores de requisições."""
+
+    def __init__(self, prefill_ms=0.05, decode_ms=2.0):
+        self.prefill_ms = prefill_ms
+        self.decode_ms = decode_ms
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def respond(self, messages):
+        prompt = "\n".join(message.get("content", "") for message in messages)
+        content = fake_completion(prompt)
+        prompt_tokens = approx_token_count(prompt)
+        completion_tokens = approx_token_count(content)
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        time.sleep((prompt_tokens * self.prefill_ms + completion_tokens * self.decode_ms) / 1000)
+        return content, prompt_tokens, completion_tokens
+
+
+def make_handler(llm):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            try:
+                content, prompt_tokens, completion_tokens = llm.respond(body.get("messages", []))
+            except Exception as e:
+                # Como no Ollama, uma falha do modelo é um 500 com {"error": mensagem}
+                self._send(500, {"error": str(e)})
+                return
+            response = {
+                "model": body.get("model", "fake"),
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": 1,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": 1,
+                "eval_count": completion_tokens,
+                "eval_duration": 1,
+            }
+            self._send(200, response)
+
+        def _send(self, status, response):
+            data = (json.dumps(response) + "\n").encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeOllamaHandler
+
+
+def start_fake_llm(llm=None, port=0):
+    """Sobe o servidor em uma thread e devolve (servidor, URL base, `FakeLLM`)."""
+    llm = llm or FakeLLM()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", llm
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor Ollama falso com respostas determinísticas.")
+    parser.add_argument("--port", type=int, default=11435, help="Porta do servidor (padrão: 11435)")
+    parser.add_argument("--prefill_ms", type=float, default=0.05, help="Milissegundos por token de entrada")
+    parser.add_argument("--decode_ms", type=float, default=2.0, help="Milissegundos por token gerado")
+    args = parser.parse_args()
+
+    server, base_url, _ = start_fake_llm(FakeLLM(args.prefill_ms, args.decode_ms), args.port)
+    print(f"LLM falso em {base_url} (Ctrl+C para parar).")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,188 @@
+"""Corpus fixo de páginas, tabelas e CSVs para os benchmarks, sem rede nem modelo.
+
+O corpus fica em `data/bench/fixtures`:
+
+- `pages/{patente}.html`: páginas de patentes como vieram do site;
+- `tables/{patente}_{n}.txt`: o texto separado por vírgula de cada tabela (o antigo `table_N.txt`);
+- `csv/{patente}_table_{n}_{parte}.csv`: os CSVs gerados por `process_table_to_csv`.
+
+Ele pode ser gravado a partir do cache de páginas e do banco de patentes (`record`) ou gerado de forma
+determinística (`synthetic`), com tabelas de composição nas duas orientações, tabelas de propriedades e texto
+de descrição, para que os benchmarks rodem em qualquer máquina.
+
+    python -m src.bench.fixtures record --limit 200
+    python -m src.bench.fixtures synthetic --patents 200 --seed 0
+"""
+
+import argparse
+import hashlib
+import random
+import shutil
+from pathlib import Path
+
+from src.data.compounds import load_properties
+from src.data.patent_store import STORE_PATH, CsvTable, PatentStore
+from src.data.process_table_to_csv import table_to_csv
+from src.scraping.fetch import extract_patent_id_from_url
+from src.scraping.page_cache import CACHE_DIR, PageCache
+from src.scraping.parsers import get_parser
+
+FIXTURES_DIR = Path("data/bench/fixtures")
+
+_PROPERTIES = ["Tg (°C)", "Density (g/cm3)", "nd", "νd", "CTE (10-7/K)", "Liquidus (°C)"]
+
+
+def _reset(out_dir):
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    for sub in ("pages", "tables", "csv"):
+        (out_dir / sub).mkdir(parents=True)
+
+
+def _write_tables(out_dir, patent_id, tables_text):
+    """Grava as tabelas e os CSVs derivados delas, como fazem `get_patent_tables` e `process_table_to_csv`."""
+    for idx, text in enumerate(tables_text, start=1):
+        (out_dir / "tables" / f"{patent_id}_{idx}.txt").write_text(text)
+        for part, csv_text in enumerate(table_to_csv(text)):
+            (out_dir / "csv" / f"{patent_id}_table_{idx}_{part}.csv").write_text(csv_text)
+
+
+def record_fixtures(out_dir=FIXTURES_DIR, cache_dir=CACHE_DIR, store_path=STORE_PATH, limit=200):
+    """Copia até `limit` páginas de patentes do cache e as tabelas do banco (ou do parsing das páginas)."""
+    _reset(out_dir)
+    cache = PageCache(cache_dir)
+    store = PatentStore(store_path) if Path(store_path).exists() else None
+    html_parser = get_parser()
+    n_pages = 0
+    for url in cache.urls():
+        if "/result.html" in url:
+            continue
+        cached = cache.get(url)
+        if cached is None:
+            continue
+        patent_id = extract_patent_id_from_url(url)
+        (out_dir / "pages" / f"{patent_id}.html").write_bytes(cached["content"])
+        record = store.get_patent(patent_id) if store is not None else None
+        tables_text = (record or {}).get("tables_text")
+        if tables_text is None:
+            tables_text = html_parser.parse_patent_page(cached["content"])["tables_text"]
+        _write_tables(out_dir, patent_id, tables_text)
+        n_pages += 1
+        if n_pages >= limit:
+            break
+    cache.close()
+    if store is not None:
+        store.close()
+    return n_pages
+
+
+def _composition(rng, oxides):
+    """Composição aleatória somando 100, com duas casas decimais."""
+    weights = [rng.random() ** 2 for _ in oxides]
+    total = sum(weights)
+    values = [round(100 * weight / total, 2) for weight in weights]
+    values[0] = round(values[0] + 100 - sum(values), 2)
+    return values
+
+
+def _html_table(rows):
+    cells = "".join(
+        "<tr>" + "".join(f"<{'th' if r == 0 else 'td'}>{cell}</{'th' if r == 0 else 'td'}>" for cell in row) + "</tr>"
+        for r, row in enumerate(rows)
+    )
+    return f"<patent-tables><table>{cells}</table></patent-tables>"
+
+
+def synthetic_table(rng, compounds):
+    """Tabela de composição com 8 a 20 óxidos, 3 a 10 exemplos, propriedades e orientação sorteadas."""
+    oxides = rng.sample(compounds, rng.randint(8, min(20, len(compounds))))
+    n_examples = rng.randint(3, 10)
+    unit = rng.choice(["mol%", "wt%"])
+    examples = [_composition(rng, oxides) for _ in range(n_examples)]
+    properties = rng.sample(_PROPERTIES, rng.randint(1, 4))
+
+    rows = [[f"Component ({unit})"] + [f"Ex. {idx + 1}" for idx in range(n_examples)]]
+    for o, oxide in enumerate(oxides):
+        rows.append([oxide] + [f"{example[o]:.2f}" if example[o] >= 0.5 else "—" for example in examples])
+    for prop in properties:
+        rows.append([prop] + [f"{rng.uniform(1, 900):.3g}" for _ in examples])
+    if rng.random() < 0.4:
+        rows = [list(column) for column in zip(*rows)]
+    return rows
+
+
+def synthetic_page(rng, patent_id, compounds):
+    """Página de patente no formato do site, com claims, descrição e de 1 a 6 tabelas."""
+    tables = [synthetic_table(rng, compounds) for _ in range(rng.randint(1, 4))]
+    # Tabelas sem composição (condições de processo) também aparecem nas patentes
+    for _ in range(rng.randint(0, 2)):
+        tables.append(
+            [["Step", "Temperature", "Time"]] + [[f"{s}", f"{rng.randint(300, 1600)}", f"{s}h"] for s in range(5)]
+        )
+    rng.shuffle(tables)
+
+    mentioned = ", ".join(rng.sample(compounds, 5))
+    paragraphs = [
+        (
+            f"The glass comprises {mentioned} in the ranges given below."
+            if p % 3 == 0
+            else "Lorem ipsum dolor sit amet. " * 8
+        )
+        for p in range(rng.randint(10, 60))
+    ]
+    claims = " ".join(
+        f"{c + 1}. A glass comprising {rng.choice(compounds)} and {rng.choice(compounds)}." for c in range(10)
+    )
+    return (
+        "<html><body>"
+        f'<div class="disp_elm_title">Claims:</div><div>{claims}</div>'
+        f'<div class="disp_elm_title">Description:</div><div>{"<p>" + "</p><p>".join(paragraphs) + "</p>"}</div>'
+        + "".join(_html_table(rows) for rows in tables)
+        + f"<!-- {patent_id} --></body></html>"
+    )
+
+
+def synthetic_fixtures(out_dir=FIXTURES_DIR, n_patents=200, seed=0):
+    """Gera o corpus sintético; a mesma semente sempre gera os mesmos arquivos."""
+    _reset(out_dir)
+    rng = random.Random(seed)
+    compounds = load_properties()["desired_compounds"]
+    html_parser = get_parser("html.parser")
+    for n in range(n_patents):
+        patent_id = f"{9000000 + n}"
+        html = synthetic_page(rng, patent_id, compounds).encode("utf-8")
+        (out_dir / "pages" / f"{patent_id}.html").write_bytes(html)
+        _write_tables(out_dir, patent_id, html_parser.parse_patent_page(html)["tables_text"])
+    return n_patents
+
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """Carrega o corpus: páginas (id, bytes), tabelas (nome, texto) e CSVs como `CsvTable`."""
+    fixtures_dir = Path(fixtures_dir)
+    pages = [(path.stem, path.read_bytes()) for path in sorted((fixtures_dir / "pages").glob("*.html"))]
+    tables = [(path.stem, path.read_text()) for path in sorted((fixtures_dir / "tables").glob("*.txt"))]
+    csvs = []
+    for path in sorted((fixtures_dir / "csv").glob("*.csv")):
+        patent_id, table_name = path.stem.split("_", 1)
+        text = path.read_text()
+        csvs.append(CsvTable(patent_id, table_name, text, hashlib.sha256(text.encode("utf-8")).hexdigest()))
+    return {"pages": pages, "tables": tables, "csvs": csvs}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grava ou gera o corpus fixo dos benchmarks.")
+    parser.add_argument("command", choices=["record", "synthetic"], help="Origem do corpus")
+    parser.add_argument("--out", type=Path, default=FIXTURES_DIR, help=f"Pasta do corpus (padrão: {FIXTURES_DIR})")
+    parser.add_argument("--limit", type=int, default=200, help="Com record, máximo de páginas (padrão: 200)")
+    parser.add_argument("--patents", type=int, default=200, help="Com synthetic, número de patentes (padrão: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="Com synthetic, semente do gerador (padrão: 0)")
+    parser.add_argument("--cache_dir", type=Path, default=CACHE_DIR, help=f"Cache de páginas (padrão: {CACHE_DIR})")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help=f"Banco de patentes (padrão: {STORE_PATH})")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        n_pages = record_fixtures(args.out, args.cache_dir, args.store, args.limit)
+    else:
+        n_pages = synthetic_fixtures(args.out, args.patents, args.seed)
+    fixtures = load_fixtures(args.out)
+    print(f"Corpus em {args.out}: {n_pages} páginas, {len(fixtures['tables'])} tabelas, {len(fixtures['csvs'])} CSVs.")
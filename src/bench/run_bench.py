@@ -0,0 +1,298 @@
+"""Benchmark de cada etapa do pipeline sobre o corpus fixo, com comparação contra um baseline salvo.
+
+Cada etapa roda em um processo próprio (para que o pico de memória de uma não contamine a outra) sobre o corpus de
+`src/bench/fixtures.py`, e o LLM é o servidor falso e determinístico de `src/bench/fake_llm.py`. Para cada etapa
+são medidos itens/s, MB/s, latência por item (p50, p90, p99) e o pico de RSS do processo.
+
+    python -m src.bench.run_bench                         # gera o corpus sintético se ele não existir
+    python -m src.bench.run_bench --save_baseline         # grava data/bench/baseline.json
+    python -m src.bench.run_bench --compare --fail_on_regression
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from src.bench.fake_llm import FakeLLM, start_fake_llm
+from src.bench.fixtures import FIXTURES_DIR, load_fixtures, synthetic_fixtures
+from src.data.composition_tables import interpret_table, table_text
+from src.data.compounds import get_matcher
+from src.data.generate_dataset import load_table
+from src.data.process_table_to_csv import table_to_csv
+from src.llm.chunking import document_chunks
+from src.llm.run_tllama import make_runner, run_llm
+from src.scraping.parsers import default_parser_name, get_parser
+
+BASELINE_PATH = Path("data/bench/baseline.json")
+# Parágrafos só de prosa, que o filtro do `document_chunks` não pode mandar ao modelo
+PROSE_PROBE = (
+    "In another embodiment, the glass is annealed.\n\n"
+    "As shown in FIG. 1, I is the intensity measured at C and K.\n\n"
+    "Tg (C), CTE (10-7/K) and density were measured as described above."
+)
+STAGES = ("parse", "format_table", "table_to_csv", "rules", "chunking", "dataset", "llm")
+
+
+def current_rss():
+    """RSS atual do processo em bytes (Linux), ou None."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Pico de RSS do processo em bytes, ou None sem o módulo `resource`."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Preparação (não medida) de cada etapa: devolve a função medida e a lista de (item, bytes)
+
+
+def _parsed_pages(fixtures, parser_name):
+    html_parser = get_parser(parser_name)
+    return [(patent_id, html_parser.parse_patent_page(html)) for patent_id, html in fixtures["pages"]]
+
+
+def setup_parse(fixtures, options):
+    html_parser = get_parser(options["parser"])
+    return html_parser.parse_patent_page, [(html, len(html)) for _, html in fixtures["pages"]]
+
+
+def setup_format_table(fixtures, options):
+    tables = [table for _, parsed in _parsed_pages(fixtures, options["parser"]) for table in parsed["tables_html"]]
+    return table_text, [(table, len(table)) for table in tables]
+
+
+def setup_table_to_csv(fixtures, options):
+    return table_to_csv, [(text, len(text)) for _, text in fixtures["tables"]]
+
+
+def setup_rules(fixtures, options):
+    return interpret_table, [(text, len(text)) for _, text in fixtures["tables"]]
+
+
+def setup_chunking(fixtures, options):
+    matcher = get_matcher()
+    chunks, _ = document_chunks({"description_html": PROSE_PROBE}, matcher=matcher)
+    if chunks:
+        raise RuntimeError(f"O filtro de trechos manteve parágrafos só de prosa: {chunks}")
+    records = [
+        {"claims": parsed["claims"], "description_html": parsed["description"], "tables_text": parsed["tables_text"]}
+        for _, parsed in _parsed_pages(fixtures, options["parser"])
+    ]
+    size = lambda record: sum(len(value) for value in record.values() if isinstance(value, str))  # noqa: E731
+    return lambda record: document_chunks(record, matcher=matcher), [(record, size(record)) for record in records]
+
+
+def setup_dataset(fixtures, options):
+    """Leitura, transposição e alinhamento dos CSVs de cada patente e concatenação, como no `generate_dataset`."""
+    import pandas as pd
+
+    matcher = get_matcher()
+
+    def build(tables):
+        frames = [frame for frame in (load_table(table, matcher) for table in tables) if frame is not None]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    groups = [list(tables) for _, tables in groupby(fixtures["csvs"], key=lambda table: table.patent_id)]
+    return build, [(tables, sum(len(table.text) for table in tables)) for tables in groups]
+
+
+def setup_llm(fixtures, options):
+    _, base_url, _ = start_fake_llm(FakeLLM(options["prefill_ms"], options["decode_ms"]))
+    runner = make_runner(base_url=base_url, max_concurrency=options["llm_concurrency"], max_retries=1)
+    tables = [table for _, parsed in _parsed_pages(fixtures, options["parser"]) for table in parsed["tables_html"]]
+    tables = tables[: options["llm_limit"]]
+    return lambda table: run_llm(table, runner), [(table, len(table)) for table in tables]
+
+
+SETUPS = {
+    "parse": setup_parse,
+    "format_table": setup_format_table,
+    "table_to_csv": setup_table_to_csv,
+    "rules": setup_rules,
+    "chunking": setup_chunking,
+    "dataset": setup_dataset,
+    "llm": setup_llm,
+}
+
+
+def _timed(func, item):
+    start = time.perf_counter()
+    func(item)
+    return time.perf_counter() - start
+
+
+def measure_stage(name, fixtures_dir, options):
+    """Roda a etapa `options['repeat']` vezes sobre o corpus e devolve as métricas (executado em um processo novo)."""
+    import numpy as np
+
+    start_rss = current_rss()
+    fixtures = load_fixtures(fixtures_dir)
+    func, items = SETUPS[name](fixtures, options)
+    if not items:
+        return None
+
+    # Uma passada de aquecimento (imports, caches de compilação) fora da medição
+    func(items[0][0])
+
+    # O LLM é medido com requisições concorrentes e uma única passada, como nos executores
+    concurrency = options["llm_concurrency"] if name == "llm" else 1
+    repeat = 1 if name == "llm" else options["repeat"]
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as executor:
+                latencies += list(executor.map(lambda item: _timed(func, item[0]), items))
+        else:
+            latencies += [_timed(func, item) for item, _ in items]
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    total_bytes = sum(size for _, size in items) * repeat
+    peak = peak_rss()
+    return {
+        "items": len(items),
+        "repeat": repeat,
+        "seconds": elapsed,
+        "items_per_s": len(latencies) / elapsed,
+        "mb_per_s": total_bytes / 1024**2 / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "peak_rss_mb": peak / 1024**2 if peak else None,
+        "rss_growth_mb": (peak - start_rss) / 1024**2 if peak and start_rss else None,
+    }
+
+
+def run_suite(stages, fixtures_dir, options):
+    results = {}
+    context = multiprocessing.get_context("fork" if sys.platform != "win32" else "spawn")
+    for name in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(measure_stage, name, fixtures_dir, options).result()
+        print(f"{name}: ok" if results[name] else f"{name}: sem itens no corpus")
+    return {name: metrics for name, metrics in results.items() if metrics}
+
+
+def compare(results, baseline, tolerance):
+    """Variações contra o baseline; uma etapa regride se perde vazão ou ganha latência p50 além de `tolerance`."""
+    rows = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append({"stage": name, "throughput": None, "p50": None, "regression": False})
+            continue
+        throughput = metrics["items_per_s"] / base["items_per_s"] - 1
+        p50 = metrics["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        rows.append(
+            {
+                "stage": name,
+                "throughput": throughput,
+                "p50": p50,
+                "regression": throughput < -tolerance or p50 > tolerance,
+            }
+        )
+    return rows
+
+
+def print_results(results, comparison=None):
+    print(
+        f"\n{'etapa':<13} {'itens':>6} {'itens/s':>9} {'MB/s':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+        f"{'RSS MB':>7}" + (f" {'Δ vazão':>8} {'Δ p50':>7}" if comparison else "")
+    )
+    deltas = {row["stage"]: row for row in comparison or []}
+    for name, m in results.items():
+        line = (
+            f"{name:<13} {m['items'] * m['repeat']:>6} {m['items_per_s']:>9.1f} {m['mb_per_s']:>7.2f} "
+            f"{m['p50_ms']:>8.2f} {m['p90_ms']:>8.2f} {m['p99_ms']:>8.2f} "
+            f"{m['peak_rss_mb'] or 0:>7.0f}"
+        )
+        if comparison:
+            row = deltas.get(name, {})
+            if row.get("throughput") is None:
+                line += f" {'novo':>8} {'':>7}"
+            else:
+                line += f" {row['throughput']:>+8.0%} {row['p50']:>+7.0%}" + (
+                    "  REGRESSÃO" if row["regression"] else ""
+                )
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do pipeline sobre o corpus fixo.")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help=f"Corpus (padrão: {FIXTURES_DIR})")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Etapas a medir")
+    parser.add_argument("--repeat", type=int, default=3, help="Passadas pelo corpus por etapa (padrão: 3)")
+    parser.add_argument("--parser", default=None, help=f"Backend de parsing (padrão: {default_parser_name()})")
+    parser.add_argument("--llm_concurrency", type=int, default=4, help="Requisições simultâneas ao LLM (padrão: 4)")
+    parser.add_argument("--llm_limit", type=int, default=200, help="Tabelas enviadas ao LLM falso (padrão: 200)")
+    parser.add_argument("--prefill_ms", type=float, default=0.05, help="LLM falso: ms por token de entrada")
+    parser.add_argument("--decode_ms", type=float, default=2.0, help="LLM falso: ms por token gerado")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help=f"Baseline (padrão: {BASELINE_PATH})")
+    parser.add_argument("--save_baseline", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--compare", action="store_true", help="Compara os resultados com o baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="Variação tolerada antes de apontar regressão (padrão: 0.1)"
+    )
+    parser.add_argument("--fail_on_regression", action="store_true", help="Sai com código 1 se houver regressão")
+    parser.add_argument("--output", type=Path, default=None, help="Grava os resultados em JSON")
+    args = parser.parse_args()
+
+    if not (args.fixtures / "pages").exists():
+        print(f"Corpus não encontrado em {args.fixtures}; gerando o corpus sintético padrão.")
+        synthetic_fixtures(args.fixtures)
+
+    options = {
+        "repeat": args.repeat,
+        "parser": args.parser or default_parser_name(),
+        "llm_concurrency": args.llm_concurrency,
+        "llm_limit": args.llm_limit,
+        "prefill_ms": args.prefill_ms,
+        "decode_ms": args.decode_ms,
+    }
+    results = run_suite(args.stages, args.fixtures, options)
+    run = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "options": options,
+        "stages": results,
+    }
+
+    comparison = None
+    if args.compare:
+        if not args.baseline.exists():
+            raise SystemExit(f"Baseline {args.baseline} não encontrado; rode antes com --save_baseline.")
+        comparison = compare(results, json.loads(args.baseline.read_text())["stages"], args.tolerance)
+    print_results(results, comparison)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(run, indent=2))
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(run, indent=2))
+        print(f"\nBaseline salvo em {args.baseline}.")
+    if comparison and args.fail_on_regression and any(row["regression"] for row in comparison):
+        raise SystemExit(1)
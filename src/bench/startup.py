@@ -0,0 +1,98 @@
+"""Tempo de partida a frio de cada subcomando de `python -m src`.
+
+Cada medida roda em um interpretador novo, sem nada importado antes: o tempo de importar o módulo do subcomando,
+quantos módulos ele carrega e quais dependências pesadas (pandas, langchain, llama.cpp etc.) entram já no import,
+e o tempo total de `python -m src <comando> --help`, incluindo a partida do Python. É a mediana de `--repeat`
+execuções.
+
+    python -m src.bench.startup
+    python -m src.bench.startup --commands dataset tllama pipeline --repeat 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from src.cli import COMMANDS
+
+HEAVY_MODULES = [
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "langchain_core",
+    "langchain_ollama",
+    "langchain_community",
+    "langsmith",
+    "llama_cpp",
+    "bs4",
+    "lxml",
+]
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "modules": len(sys.modules), "heavy": heavy}}))
+"""
+
+
+def measure_import(module, repeat=5):
+    """Mediana do tempo de import do módulo em interpretadores novos, com o número de módulos carregados."""
+    runs = []
+    for _ in range(repeat):
+        probe = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+        output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return {
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "modules": runs[-1]["modules"],
+        "heavy": runs[-1]["heavy"],
+    }
+
+
+def measure_help(command=None, repeat=5):
+    """Mediana do tempo total de `python -m src [comando] --help`, com a partida do interpretador."""
+    args = [sys.executable, "-m", "src"] + ([command] if command else []) + ["--help"]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_startup(commands, repeat=5):
+    results = {"python -m src": {"help_seconds": measure_help(None, repeat)}}
+    for command in commands:
+        result = measure_import(COMMANDS[command][0], repeat)
+        result["help_seconds"] = measure_help(command, repeat)
+        results[command] = result
+    return results
+
+
+def print_results(results):
+    print(f"{'comando':<15} {'import ms':>10} {'módulos':>8} {'--help ms':>10}  dependências pesadas no import")
+    for command, result in results.items():
+        if "seconds" not in result:
+            print(f"{command:<15} {'-':>10} {'-':>8} {1000 * result['help_seconds']:>10.0f}")
+            continue
+        print(
+            f"{command:<15} {1000 * result['seconds']:>10.0f} {result['modules']:>8} "
+            f"{1000 * result['help_seconds']:>10.0f}  {', '.join(result['heavy']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de partida a frio de cada subcomando.")
+    parser.add_argument(
+        "--commands", nargs="+", choices=COMMANDS, default=list(COMMANDS), help="Comandos medidos (padrão: todos)"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções por medida (padrão: 5)")
+    args = parser.parse_args()
+
+    print_results(run_startup(args.commands, args.repeat))
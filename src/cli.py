@@ -0,0 +1,71 @@
+"""Linha de comando única do projeto, com um subcomando para cada etapa.
+
+    python -m src --help
+    python -m src harvest --keyword "glass composition" --page_max 10
+    python -m src dataset --unit mol%
+    python -m src cppllama serve
+
+Cada subcomando roda o script correspondente de `src/` exatamente como `python -m <módulo>`, com as mesmas opções
+(`python -m src <comando> --help` mostra as do script). Só o módulo do subcomando escolhido é importado, e os
+módulos só carregam pandas, langchain e o modelo quando a função que precisa deles é chamada, de modo que
+`python -m src --help` não importa nada além de `argparse` e o `--help` de cada script não paga o carregamento do
+LLM. `python -m src startup` mede o tempo de partida a frio de cada subcomando.
+"""
+
+import argparse
+import runpy
+import sys
+
+# subcomando: (módulo, descrição)
+COMMANDS = {
+    "harvest": ("src.scraping.harvest_patents", "Baixa as patentes e extrai claims, descrição e tabelas"),
+    "claims": ("src.scraping.get_patent_claims", "Extrai só as claims das patentes"),
+    "description": ("src.scraping.get_patent_description", "Extrai só as descrições das patentes"),
+    "tables": ("src.scraping.get_patent_tables", "Extrai só as tabelas das patentes"),
+    "frontier": ("src.scraping.frontier", "Consulta ou limpa a fronteira de crawl"),
+    "store": ("src.data.patent_store", "Importa os arquivos antigos ou mostra o conteúdo do banco de patentes"),
+    "csv": ("src.data.process_table_to_csv", "Converte as tabelas salvas em CSVs"),
+    "dedup": ("src.data.dedup", "Detecta patentes e tabelas quase duplicadas"),
+    "dataset": ("src.data.generate_dataset", "Gera o dataset de vidros a partir dos CSVs"),
+    "similarity": ("src.data.similarity", "Busca vidros por similaridade de composição e por faixas"),
+    "grammar": ("src.llm.grammar", "Gera a gramática GBNF a partir do properties.json"),
+    "llama": ("src.llm.run_llama", "Extrai composições dos documentos com o Ollama"),
+    "tllama": ("src.llm.run_tllama", "Converte as tabelas em CSV com regras e o Ollama"),
+    "cppllama": ("src.llm.run_cppllama", "Extrai composições com llama.cpp (servidor ou local)"),
+    "pipeline": ("src.pipeline.run_pipeline", "Roda busca, download, extração e dataset como um único pipeline"),
+    "fixtures": ("src.bench.fixtures", "Grava ou gera o corpus fixo dos benchmarks"),
+    "bench": ("src.bench.run_bench", "Benchmark das etapas sobre o corpus fixo"),
+    "fake-llm": ("src.bench.fake_llm", "Servidor Ollama falso para os benchmarks"),
+    "startup": ("src.bench.startup", "Mede o tempo de partida a frio de cada subcomando"),
+    "bench-fetch": ("src.scraping.bench_fetch", "Compara taxa fixa e adaptativa contra o servidor de testes"),
+    "bench-parsers": ("src.scraping.bench_parsers", "Compara os backends de parsing de HTML"),
+    "bench-grammar": ("src.llm.bench_grammar", "Compara tokens e latência entre as gramáticas"),
+    "fault-server": ("src.scraping.fault_server", "Servidor local de patentes com injeção de falhas"),
+}
+
+
+def build_parser():
+    commands = "\n".join(f"  {name:<15} {description}" for name, (_, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="Coleta de patentes de vidros, processamento das tabelas, extração com LLM e dataset.",
+        epilog=f"comandos:\n{commands}\n\nUse 'python -m src <comando> --help' para as opções de cada comando.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="comando", help="Etapa a executar (lista abaixo)")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Opções do comando")
+    return parser
+
+
+def run_command(command, args):
+    """Roda o módulo do comando como `__main__`, com `args` na linha de comando."""
+    module = COMMANDS[command][0]
+    sys.argv = [module, *args]
+    # alter_sys: o módulo vira o `__main__` durante a execução, como em `python -m`, para que as funções dele
+    # possam ser enviadas aos processos dos pools
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    run_command(args.command, args.args)
@@ -0,0 +1,160 @@
+"""Interpretação determinística de tabelas de composição, sem LLM.
+
+A maioria das tabelas de vidros das patentes é uma grade simples de óxidos por exemplo: a primeira coluna traz os
+óxidos e as demais os exemplos (ou o contrário, com os óxidos no cabeçalho). Essas tabelas são lidas aqui a partir
+do texto separado por vírgula de `format_table_as_text`, com os cabeçalhos associados aos compostos do
+`properties.json`. Só as tabelas que não puderem ser lidas com segurança precisam ir para o LLM.
+"""
+
+import re
+
+from src.data.compounds import map_header, strip_label_units
+from src.scraping.patent_page import format_table_as_text
+
+MIN_OXIDES = 2
+MIN_NUMERIC_RATIO = 0.9
+MIN_CLOSED_RATIO = 0.8
+TOTAL_RANGE = (95.0, 105.0)
+
+_MISSING = {"", "-", "--", "—", "–", "n.d.", "nd"}
+_NUMBER_RE = re.compile(r"^[-+]?\d+(?:[.,]\d+)?$")
+_UNIT_RE = re.compile(r"(mol|wt|mass|weight|cat(?:ion)?)\s*\.?\s*%|%\s*(?:by\s+)?(mol|wt|mass|weight)", re.IGNORECASE)
+
+
+def table_text(table):
+    """Texto separado por vírgula da tabela, aceitando tanto `tables_text` quanto o HTML de `tables`."""
+    if "<" not in table:
+        return table
+    # bs4 só é carregado quando a tabela vem em HTML
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(table, "html.parser")
+    return format_table_as_text(soup)
+
+
+def parse_value(cell):
+    """Converte uma célula em número: 0.0 para célula vazia ou traço, None quando não é numérica."""
+    cell = cell.strip().replace("−", "-").replace(" ", "")
+    if cell.lower() in _MISSING:
+        return 0.0
+    if not _NUMBER_RE.match(cell):
+        return None
+    return float(cell.replace(",", "."))
+
+
+def detect_unit(text):
+    """Unidade das composições citada na tabela ('mol%' ou 'wt%'), ou None."""
+    match = _UNIT_RE.search(text)
+    if not match:
+        return None
+    unit = (match.group(1) or match.group(2)).lower()
+    return "mol%" if unit.startswith(("mol", "cat")) else "wt%"
+
+
+def compound_label(label):
+    """Composto de um rótulo de linha/coluna, ignorando unidades (ex.: 'SiO2 (mol%)', 'B2O3 [wt%]').
+
+    Mais estrito que `map_header`: o rótulo inteiro precisa ser o composto, para que 'Tg (C)' não vire carbono.
+    """
+    cleaned = strip_label_units(label)
+    compound = map_header(cleaned) if cleaned else None
+    return compound if compound and compound.lower() == cleaned.lower() else None
+
+
+def _grid(text):
+    rows = [[cell.strip() for cell in line.split(",")] for line in text.splitlines() if line.strip()]
+    width = max((len(row) for row in rows), default=0)
+    return [row + [""] * (width - len(row)) for row in rows]
+
+
+def _transpose(rows):
+    return [list(column) for column in zip(*rows)]
+
+
+def _read_oxide_rows(rows):
+    """Lê uma grade com os óxidos na primeira coluna e os exemplos nas demais.
+
+    Retorna (nomes dos exemplos, {óxido: valores}, {propriedade: células}, células numéricas, células de óxidos).
+    """
+    header = rows[0]
+    names = header[1:]
+    oxides = {}
+    properties = {}
+    numeric = total = 0
+    for row in rows[1:]:
+        compound = compound_label(row[0])
+        if compound is None:
+            if row[0]:
+                properties[row[0]] = row[1:]
+            continue
+        if compound in oxides:
+            continue
+        values = [parse_value(cell) for cell in row[1:]]
+        numeric += sum(value is not None for value in values)
+        total += len(values)
+        oxides[compound] = values
+    return names, oxides, properties, numeric, total
+
+
+def interpret_table(table):
+    """Interpreta uma tabela de composição.
+
+    Retorna um dict com `confident`, `reason`, `orientation`, `unit` e `compositions` (uma por exemplo, com
+    `name`, `composition` e `properties`). `confident` só é verdadeiro quando há pelo menos `MIN_OXIDES` óxidos,
+    quase todas as células de óxidos são numéricas e a maioria dos exemplos soma perto de 100.
+    """
+    text = table_text(table)
+    rows = _grid(text)
+    result = {"confident": False, "reason": "", "orientation": None, "unit": detect_unit(text), "compositions": []}
+    if len(rows) < 2 or len(rows[0]) < 2:
+        result["reason"] = "tabela vazia ou com uma só linha/coluna"
+        return result
+
+    # Óxidos nas linhas (primeira coluna) ou nas colunas (cabeçalho): vale a orientação com mais óxidos
+    candidates = [("rows", _read_oxide_rows(rows)), ("columns", _read_oxide_rows(_transpose(rows)))]
+    orientation, (names, oxides, properties, numeric, total) = max(candidates, key=lambda c: len(c[1][1]))
+    result["orientation"] = orientation
+
+    if len(oxides) < MIN_OXIDES:
+        result["reason"] = f"{len(oxides)} óxido(s) reconhecido(s)"
+        return result
+    if numeric < MIN_NUMERIC_RATIO * total:
+        result["reason"] = f"só {numeric}/{total} células de óxidos numéricas"
+        return result
+
+    compositions = []
+    for idx, name in enumerate(names):
+        composition = {compound: values[idx] for compound, values in oxides.items() if values[idx]}
+        if not composition:
+            continue
+        compositions.append(
+            {
+                "name": name or f"Example {idx + 1}",
+                "composition": composition,
+                "properties": {label: cells[idx] for label, cells in properties.items() if cells[idx]},
+            }
+        )
+    result["compositions"] = compositions
+
+    if not compositions:
+        result["reason"] = "nenhum exemplo com composição"
+        return result
+    closed = sum(TOTAL_RANGE[0] <= sum(c["composition"].values()) <= TOTAL_RANGE[1] for c in compositions)
+    if closed < MIN_CLOSED_RATIO * len(compositions):
+        result["reason"] = f"só {closed}/{len(compositions)} exemplos somam perto de 100"
+        return result
+
+    result["confident"] = True
+    return result
+
+
+def compositions_to_csv(compositions):
+    """CSV (um exemplo por linha) equivalente ao que o LLM devolve para a mesma tabela."""
+    compounds = []
+    for entry in compositions:
+        compounds += [compound for compound in entry["composition"] if compound not in compounds]
+    lines = [",".join(["Example"] + compounds)]
+    for entry in compositions:
+        values = [entry["composition"].get(compound, 0.0) for compound in compounds]
+        lines.append(",".join([entry["name"]] + [f"{value:g}" for value in values]))
+    return "\n".join(lines)
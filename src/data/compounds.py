@@ -0,0 +1,158 @@
+"""Lista de compostos de `json/properties.json` e busca simultânea de todos eles em um texto.
+
+O `CompoundMatcher` compila os padrões uma única vez em um autômato de Aho-Corasick e encontra todas as
+ocorrências em uma única passada pelo texto, em vez de testar `compound in text` para cada composto. As
+ocorrências só valem em fronteiras de token: `SnO` não casa dentro de `SnO2`, nem `CaO` dentro de `CaOH`.
+Se o pacote `pyahocorasick` estiver instalado, o autômato em C é usado no lugar da implementação em Python.
+
+Os matchers usados para filtrar tabelas e trechos deixam de fora os símbolos de elementos isolados de
+`all_compounds` ('C', 'K', 'In', 'As', 'I'...), que aparecem em qualquer texto ('Tg (C)', 'In another embodiment');
+só o mapeamento de cabeçalhos os considera, e apenas quando o rótulo inteiro é o elemento.
+"""
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+PROPERTIES_PATH = Path("json/properties.json")
+COMPOUND_LIST = "all_compounds"
+
+_ELEMENT_RE = re.compile(r"^[A-Z][a-z]?$")
+_LABEL_UNITS_RE = re.compile(r"\(.*?\)|\[.*?\]|\b(?:mol|wt|mass)\b\.?|%", re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def load_properties(path=PROPERTIES_PATH):
+    """Carrega `properties.json` (uma única vez por caminho)."""
+    with open(path, "r") as json_file:
+        return json.load(json_file)
+
+
+def _is_boundary(text, start, end):
+    """Verifica se a ocorrência em text[start:end] não está colada a letras ou dígitos."""
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+class CompoundMatcher:
+    """Autômato de Aho-Corasick sobre uma lista de compostos."""
+
+    def __init__(self, compounds):
+        self.compounds = list(dict.fromkeys(compounds))
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for compound in self.compounds:
+                self._automaton.add_word(compound, compound)
+            self._automaton.make_automaton()
+        else:
+            self._build()
+
+    def _build(self):
+        # Cada estado tem suas transições, o estado de falha e os compostos que terminam nele
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for compound in self.compounds:
+            state = 0
+            for char in compound:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(compound)
+
+        # Busca em largura para calcular as falhas e herdar as saídas dos sufixos
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0) if self._goto[fail].get(char) != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _iter_raw(self, text):
+        if ahocorasick is not None:
+            for end, compound in self._automaton.iter(text):
+                yield end + 1 - len(compound), end + 1, compound
+            return
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for compound in out[state]:
+                yield i + 1 - len(compound), i + 1, compound
+
+    def finditer(self, text):
+        """Devolve (início, fim, composto) para cada ocorrência em fronteira de token, em ordem de posição."""
+        for start, end, compound in self._iter_raw(text):
+            if _is_boundary(text, start, end):
+                yield start, end, compound
+
+    def find_all(self, text):
+        """Lista todas as ocorrências como tuplas (início, fim, composto)."""
+        return list(self.finditer(text))
+
+    def matched(self, text):
+        """Conjunto de compostos distintos presentes no texto."""
+        return {compound for _, _, compound in self.finditer(text)}
+
+    def contains_any(self, text):
+        """Verifica se o texto contém algum dos compostos."""
+        return next(self.finditer(text), None) is not None
+
+
+@lru_cache(maxsize=None)
+def get_matcher(compound_list=COMPOUND_LIST, path=PROPERTIES_PATH, elements=False):
+    """Devolve o matcher compartilhado para uma das listas de `properties.json` (compilado uma única vez).
+
+    Sem `elements`, os símbolos de elementos isolados ficam de fora e só óxidos e fórmulas são procurados.
+    """
+    compounds = load_properties(path)[compound_list]
+    if not elements:
+        compounds = [compound for compound in compounds if not _ELEMENT_RE.match(compound)]
+    return CompoundMatcher(compounds)
+
+
+def strip_label_units(label):
+    """Rótulo sem unidades, parênteses e espaços: 'SiO2 (mol%)' → 'SiO2', 'Tg (°C)' → 'Tg'."""
+    return _LABEL_UNITS_RE.sub("", label).replace(" ", "")
+
+
+@lru_cache(maxsize=None)
+def _header_lookup():
+    compounds = load_properties()["all_compounds"]
+    # Comparação sem caixa só para fórmulas com mais de um elemento: 'nd' (índice de refração) não é 'Nd'
+    lowercase = {compound.lower(): compound for compound in compounds if sum(c.isupper() for c in compound) > 1}
+    return frozenset(compounds), lowercase
+
+
+def map_header(label):
+    """Associa o cabeçalho de uma coluna (ex.: 'SiO2', 'sio2', 'SiO2 (mol%)') a um composto de `all_compounds`."""
+    label = str(label).strip()
+    compounds, lowercase = _header_lookup()
+    if label in compounds:
+        return label
+
+    if label.lower() in lowercase:
+        return lowercase[label.lower()]
+
+    matches = get_matcher(elements=True).matched(label)
+    if len(matches) != 1:
+        return None
+    compound = matches.pop()
+    # Um elemento isolado só vale se for o rótulo inteiro: 'Tg (°C)' e 'CTE (10-7/K)' não são carbono e potássio
+    if _ELEMENT_RE.match(compound) and strip_label_units(label) != compound:
+        return None
+    return compound
@@ -0,0 +1,359 @@
+"""Esquema fixo do dataset de vidros e escrita incremental em Parquet, Arrow e CSV.
+
+Cada linha do dataset é um vidro (uma coluna de uma tabela transposta). As colunas de óxidos seguem a lista
+`all_compounds` de `json/properties.json`, sempre na mesma ordem e como float32, de modo que tabelas diferentes
+podem ser empilhadas sem o `concat(join="outer")` sobre centenas de colunas. As colunas que não são compostos
+(número do exemplo, propriedades etc.) são guardadas como JSON em `extra_columns`.
+
+Os valores das células são normalizados por `src/data/normalize.py` ("0-2", "<0.1", "—", notas de rodapé). A coluna
+`unit` traz a unidade dos valores da linha ('mol%', 'wt%' ou vazia se a tabela não diz), e `ranges` traz, em JSON,
+o mínimo e o máximo das células que eram faixas ou desigualdades.
+
+pandas e pyarrow só são importados dentro das funções que os usam, para que os comandos que importam este módulo
+(e o `--help` deles) não paguem o carregamento.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+
+from src.data.compounds import load_properties, map_header
+from src.data.normalize import UNITS, convert_units, molar_masses, parse_cells
+
+DATASET_DIR = Path("data/processed/dataset")
+ARROW_PATH = Path("data/processed/dataset.arrow")
+FINAL_CSV = Path("data/processed/final_filtered_concatenated.csv")
+
+# Número de partições Parquet; cada patente cai sempre na mesma partição (hash do csv_id)
+N_PARTITIONS = 32
+
+ID_COLUMNS = ["csv_id", "table_name"]
+EXTRA_COLUMN = "extra_columns"
+UNIT_COLUMN = "unit"
+RANGES_COLUMN = "ranges"
+TEXT_COLUMNS = ID_COLUMNS + [EXTRA_COLUMN, UNIT_COLUMN, RANGES_COLUMN]
+
+# Versão das colunas do dataset; o manifesto guarda a versão para refazer o build quando ela muda
+SCHEMA_VERSION = 2
+
+
+def has_pyarrow():
+    """Verifica se o pyarrow está instalado, sem importá-lo."""
+    return find_spec("pyarrow") is not None
+
+
+def compound_columns():
+    """Colunas de óxidos do dataset, na ordem de `all_compounds`."""
+    return load_properties()["all_compounds"]
+
+
+def dataset_columns():
+    return compound_columns() + TEXT_COLUMNS
+
+
+@lru_cache(maxsize=None)
+def arrow_schema():
+    """Esquema Arrow do dataset: óxidos em float32 e identificadores como texto."""
+    import pyarrow as pa
+
+    fields = [pa.field(compound, pa.float32()) for compound in compound_columns()]
+    fields += [pa.field(column, pa.string()) for column in TEXT_COLUMNS]
+    return pa.schema(fields)
+
+
+@lru_cache(maxsize=None)
+def _compound_positions():
+    return {compound: idx for idx, compound in enumerate(compound_columns())}
+
+
+def _ranges_json(oxides, minimum, maximum):
+    """JSON por linha com {óxido: [mínimo, máximo]} das células que eram faixas ou desigualdades."""
+    import numpy as np
+
+    is_range = ~np.isnan(minimum) & ((minimum != maximum) | np.isnan(maximum))
+    ranges = [{} for _ in range(len(minimum))]
+    for row, col in zip(*np.nonzero(is_range)):
+        high = maximum[row, col]
+        ranges[row][oxides[col]] = [
+            round(float(minimum[row, col]), 6),
+            None if np.isnan(high) else round(float(high), 6),
+        ]
+    return [json.dumps(row) if row else "" for row in ranges]
+
+
+def align_to_schema(df, unit=None, target_unit=None):
+    """Converte uma tabela transposta (colunas = cabeçalhos) para o esquema fixo do dataset.
+
+    Colunas de óxidos viram float32 com `parse_cells` (valores não numéricos viram NaN); as demais vão para
+    `extra_columns`. Quando dois cabeçalhos apontam para o mesmo composto, vale o primeiro. `unit` é a unidade
+    citada na tabela; com `target_unit`, as linhas são convertidas para ela (as que não podem ser convertidas, por
+    composto de massa molar desconhecida, ficam na unidade original).
+    """
+    import numpy as np
+    import pandas as pd
+
+    oxide_columns = {}
+    extra_columns = {}
+    for label in df.columns:
+        if label in ID_COLUMNS:
+            continue
+        compound = map_header(label)
+        if compound is not None:
+            oxide_columns.setdefault(compound, label)
+        else:
+            extra_columns.setdefault(str(label).strip().lower(), label)
+
+    oxides = list(oxide_columns)
+    positions = [_compound_positions()[oxide] for oxide in oxides]
+    value, minimum, maximum = parse_cells(df[list(oxide_columns.values())])
+    units = np.full(len(df), unit or "", dtype=object)
+    if target_unit and unit in UNITS and unit != target_unit and oxides:
+        converted = convert_units(value, unit, target_unit, molar_masses()[positions])
+        ok = ~np.isnan(converted).all(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            factor = np.where(value > 0, converted / value, 1.0)
+        value[ok] = converted[ok]
+        minimum[ok] *= factor[ok]
+        maximum[ok] *= factor[ok]
+        units[ok] = target_unit
+
+    matrix = np.full((len(df), len(compound_columns())), np.nan, dtype="float32")
+    matrix[:, positions] = value
+    aligned = pd.DataFrame(matrix, columns=compound_columns())
+
+    for column in ID_COLUMNS:
+        aligned[column] = df[column].astype(str).values if column in df else None
+
+    extras = df[list(extra_columns.values())]
+    extras.columns = list(extra_columns)
+    aligned[EXTRA_COLUMN] = [
+        json.dumps({key: value for key, value in row.items() if pd.notna(value)}) for row in extras.to_dict("records")
+    ]
+    aligned[UNIT_COLUMN] = units
+    aligned[RANGES_COLUMN] = _ranges_json(oxides, minimum, maximum)
+    return aligned.reset_index(drop=True)
+
+
+def frame_to_table(frame):
+    """Converte um DataFrame no esquema do dataset para uma tabela Arrow.
+
+    O bloco de óxidos é convertido como uma única matriz float32, evitando a conversão coluna a coluna do pandas,
+    que domina o tempo com centenas de colunas. NaN vira nulo.
+    """
+    import pyarrow as pa
+
+    values = frame[compound_columns()].to_numpy(dtype="float32")
+    arrays = [pa.array(values[:, i], from_pandas=True) for i in range(values.shape[1])]
+    arrays += [pa.array(frame[column].astype(str).tolist(), pa.string()) for column in TEXT_COLUMNS]
+    return pa.Table.from_arrays(arrays, schema=arrow_schema())
+
+
+class DatasetWriter:
+    """Escreve os arquivos consolidados do dataset, um grupo de linhas (ex.: uma patente) por vez.
+
+    Cada chamada de `write` acrescenta as linhas ao arquivo Arrow IPC (que pode ser aberto por memory-map com
+    `open_arrow_dataset`) e ao CSV final. Sem `pyarrow` instalado, apenas o CSV é gerado.
+    """
+
+    def __init__(self, arrow_path=ARROW_PATH, csv_path=FINAL_CSV):
+        self.arrow_path = Path(arrow_path)
+        self.csv_path = Path(csv_path)
+        self.rows = 0
+
+        self.csv_path.parent.mkdir(parents=True, exist_ok=True)
+        self._csv_header = True
+        self._arrow_writer = None
+        if not has_pyarrow():
+            print("Aviso: pyarrow não está instalado; apenas o CSV será gerado.")
+            return
+
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        self._arrow_sink = pa.OSFile(str(self.arrow_path), "wb")
+        self._arrow_writer = pa.ipc.new_file(self._arrow_sink, arrow_schema())
+        self._csv_writer = pacsv.CSVWriter(str(self.csv_path), arrow_schema())
+
+    def write(self, frame):
+        """Acrescenta um DataFrame no esquema do dataset."""
+        if self._arrow_writer is None:
+            frame = frame[dataset_columns()]
+            frame.to_csv(self.csv_path, mode="w" if self._csv_header else "a", header=self._csv_header, index=False)
+            self._csv_header = False
+            self.rows += len(frame)
+        else:
+            self.write_table(frame_to_table(frame))
+
+    def write_table(self, table):
+        """Acrescenta uma tabela Arrow já no esquema do dataset."""
+        self._arrow_writer.write_table(table)
+        self._csv_writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+            self._arrow_sink.close()
+            self._csv_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def partition_for(csv_id):
+    """Nome da partição Parquet de uma patente."""
+    return f"part-{zlib.crc32(str(csv_id).encode()) % N_PARTITIONS:03d}"
+
+
+def partition_path(name, dataset_dir=DATASET_DIR):
+    return Path(dataset_dir) / f"{name}.parquet"
+
+
+def write_partition(name, frame, dataset_dir=DATASET_DIR):
+    """Grava (ou substitui) a partição Parquet `dataset_dir/{name}.parquet`."""
+    import pyarrow.parquet as pq
+
+    Path(dataset_dir).mkdir(parents=True, exist_ok=True)
+    pq.write_table(frame_to_table(frame), partition_path(name, dataset_dir))
+
+
+def read_partition(name, dataset_dir=DATASET_DIR):
+    """Lê uma partição como DataFrame, ou devolve None se ela não existir."""
+    import pyarrow.parquet as pq
+
+    path = partition_path(name, dataset_dir)
+    return pq.read_table(path, schema=arrow_schema()).to_pandas() if path.exists() else None
+
+
+def _combined_is_current(layout, arrow_path, csv_path):
+    """Verifica se o Arrow e o CSV final são os descritos pelo layout da última exportação."""
+    import pyarrow as pa
+
+    if not layout or not Path(arrow_path).exists() or not Path(csv_path).exists():
+        return False
+    segments = layout["segments"]
+    if Path(csv_path).stat().st_size != layout["header_bytes"] + sum(segment["bytes"] for segment in segments):
+        return False
+    try:
+        batches = pa.ipc.open_file(pa.memory_map(str(arrow_path), "r")).num_record_batches
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return batches == sum(segment["batches"] for segment in segments)
+
+
+def _copy_range(source, target, start, size, block=1 << 20):
+    source.seek(start)
+    while size > 0:
+        data = source.read(min(block, size))
+        if not data:
+            raise OSError("CSV final menor que o registrado no manifesto")
+        target.write(data)
+        size -= len(data)
+
+
+def export_combined(dataset_dir=DATASET_DIR, arrow_path=ARROW_PATH, csv_path=FINAL_CSV, layout=None, rewritten=()):
+    """Atualiza o arquivo Arrow e o CSV final a partir das partições Parquet e devolve (linhas, layout).
+
+    O layout (guardado no manifesto) lista as partições na ordem em que aparecem nos dois arquivos, com as linhas,
+    os bytes do CSV e os lotes do Arrow de cada uma. Com o layout da exportação anterior e as partições reescritas
+    desde ela (`rewritten`), só as partições reescritas ou novas são lidas do Parquet e vão para o fim dos arquivos:
+
+    - no CSV, os trechos das partições inalteradas ficam onde estão; só os que estavam depois de um trecho removido
+      são copiados byte a byte, e quando só há partições novas o arquivo só recebe um acréscimo;
+    - o Arrow é regravado só quando alguma partição entrou ou saiu, com os lotes das inalteradas copiados do arquivo
+      anterior por memory-map.
+
+    Sem layout, ou com arquivos que não batem com ele, os dois arquivos são regravados por inteiro, uma partição por
+    vez. Devolve (None, layout) quando nada mudou.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+
+    arrow_path, csv_path = Path(arrow_path), Path(csv_path)
+    names = sorted(path.stem for path in Path(dataset_dir).glob("*.parquet"))
+    if not _combined_is_current(layout, arrow_path, csv_path):
+        layout = None
+    segments = layout["segments"] if layout else []
+    gone = set(rewritten) | {segment["partition"] for segment in segments if segment["partition"] not in names}
+    kept = [segment for segment in segments if segment["partition"] not in gone]
+    added = [name for name in names if name not in {segment["partition"] for segment in kept}]
+    if layout and len(kept) == len(segments) and not added:
+        return None, layout
+
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    if layout is None:
+        header = io.BytesIO()
+        pacsv.write_csv(arrow_schema().empty_table(), header)
+        csv_file = open(csv_path, "wb")
+        csv_file.write(header.getvalue())
+        layout = {"header_bytes": len(header.getvalue())}
+    else:
+        # Corta o CSV no primeiro trecho que saiu e recoloca depois dele os trechos inalterados seguintes
+        csv_file = open(csv_path, "r+b")
+        offsets, offset = [], layout["header_bytes"]
+        for segment in segments:
+            offsets.append(offset)
+            offset += segment["bytes"]
+        first = next((idx for idx, segment in enumerate(segments) if segment["partition"] in gone), len(segments))
+        with tempfile.TemporaryFile() as tail:
+            for idx in range(first, len(segments)):
+                if segments[idx]["partition"] not in gone:
+                    _copy_range(csv_file, tail, offsets[idx], segments[idx]["bytes"])
+            csv_file.seek(offsets[first] if first < len(segments) else offset)
+            csv_file.truncate()
+            tail.seek(0)
+            shutil.copyfileobj(tail, csv_file)
+
+    old_arrow = pa.ipc.open_file(pa.memory_map(str(arrow_path), "r")) if segments and kept else None
+    tmp_arrow = arrow_path.with_name(arrow_path.name + ".tmp")
+    with csv_file, pa.OSFile(str(tmp_arrow), "wb") as sink, pa.ipc.new_file(sink, arrow_schema()) as writer:
+        batch = 0
+        old_starts = {}
+        for segment in segments:
+            old_starts[segment["partition"]] = batch
+            batch += segment["batches"]
+        for segment in kept:
+            start = old_starts[segment["partition"]]
+            for idx in range(start, start + segment["batches"]):
+                writer.write_batch(old_arrow.get_batch(idx))
+
+        new_segments = []
+        for name in added:
+            table = pq.read_table(partition_path(name, dataset_dir), schema=arrow_schema())
+            batches = table.to_batches()
+            for record_batch in batches:
+                writer.write_batch(record_batch)
+            data = io.BytesIO()
+            pacsv.write_csv(table, data, pacsv.WriteOptions(include_header=False))
+            csv_file.write(data.getvalue())
+            new_segments.append(
+                {"partition": name, "rows": table.num_rows, "bytes": len(data.getvalue()), "batches": len(batches)}
+            )
+    os.replace(tmp_arrow, arrow_path)
+
+    layout["segments"] = kept + new_segments
+    return sum(segment["rows"] for segment in layout["segments"]), layout
+
+
+def open_arrow_dataset(path=ARROW_PATH):
+    """Abre o dataset Arrow por memory-map: as colunas só são lidas do disco quando acessadas."""
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def open_parquet_dataset(dataset_dir=DATASET_DIR):
+    """Abre as partições Parquet como um `pyarrow.dataset.Dataset`, que aceita filtros e projeção de colunas."""
+    import pyarrow.dataset as pads
+
+    return pads.dataset(str(dataset_dir), format="parquet", schema=arrow_schema())
@@ -0,0 +1,275 @@
+"""Detecção de patentes e tabelas quase duplicadas com MinHash e LSH.
+
+Buscas por palavras-chave diferentes e famílias de patentes (continuações, divisionais) trazem patentes com as
+mesmas claims e as mesmas tabelas de exemplos. Sem detecção, cada cópia passa de novo pela conversão em CSV, pelo
+LLM e entra repetida no dataset.
+
+Cada item recebe uma assinatura MinHash de `NUM_PERM` valores sobre seus shingles: sequências de 5 palavras para as
+claims e linhas normalizadas para as tabelas (minúsculas, espaços colapsados, números em forma canônica, de modo que
+'1.50' e '1.5' coincidem). A assinatura é dividida em `BANDS` faixas gravadas como baldes no banco de patentes.
+Itens que dividem algum balde são candidatos, e a fração de valores iguais nas assinaturas estima a similaridade de
+Jaccard. Conteúdo normalizado idêntico é encontrado direto pelo resumo SHA-1; para tabelas, o resumo é calculado
+sobre as linhas ordenadas, de modo que a mesma tabela com as linhas em outra ordem também coincide.
+
+Para tabelas, o LSH só propõe candidatos: a estimativa do MinHash dá 1.0 para tabelas diferentes com frequência
+(cerca de 7% das vezes com Jaccard 0.98), e reaproveitar o resultado de outra tabela por engano é silencioso. As
+linhas normalizadas de cada tabela ficam gravadas com a assinatura, e a similaridade com o canônico de cada
+candidato é a de Jaccard exata entre as linhas das duas tabelas.
+
+Um item acima do limiar aponta para o item canônico (o primeiro visto). As etapas seguintes reaproveitam o resultado
+do canônico: os CSVs em `process_table_to_csv`, a saída do LLM em `run_tllama` e no pipeline, e `generate_dataset`
+deixa as tabelas duplicadas de fora. Para tabelas, o limiar padrão é 1.0 (mesmas linhas, talvez em outra ordem ou
+formatação), porque uma tabela só parecida pode ter valores diferentes. Para claims, 0.9 marca a patente como da
+mesma família (`duplicate_of` no registro), sem pular nada.
+
+    python -m src.data.dedup scan        # assina as claims e tabelas já salvas no banco
+    python -m src.data.dedup stats
+"""
+
+import argparse
+import hashlib
+import re
+import time
+import zlib
+from collections import Counter, namedtuple
+from pathlib import Path
+
+from src.data.patent_store import STORE_PATH, Fingerprint, PatentStore
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_WORDS = 5
+CLAIMS_THRESHOLD = 0.9
+TABLE_THRESHOLD = 1.0
+
+# Primo acima de 2**32: com a < 2**31 e hashes de 32 bits, a * x + b cabe em uint64
+_PRIME = 4294967311
+
+_WORD_RE = re.compile(r"\w+")
+_TAG_RE = re.compile(r"<[^>]*>")
+_CELL_END_RE = re.compile(r"</t[dh]\s*>", re.IGNORECASE)
+_ROW_END_RE = re.compile(r"</tr\s*>", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+Match = namedtuple("Match", ["canonical", "similarity"])
+
+
+def table_key(patent_id, table_idx):
+    """Chave de uma tabela (índice a partir de 1, como em `tables`)."""
+    return f"{patent_id}/{table_idx}"
+
+
+def split_table_key(key):
+    patent_id, table_idx = key.rsplit("/", 1)
+    return patent_id, int(table_idx)
+
+
+def _normalize_cell(cell):
+    cell = _SPACE_RE.sub(" ", cell).strip().lower()
+    try:
+        return format(float(cell), "g")
+    except ValueError:
+        return cell
+
+
+def table_rows(text):
+    """Linhas normalizadas de uma tabela em texto separado por vírgula (ou HTML), sem células vazias."""
+    if "<" in text:
+        text = _TAG_RE.sub("", _ROW_END_RE.sub("\n", _CELL_END_RE.sub(",", text)))
+    rows = []
+    for line in text.splitlines():
+        cells = [cell for cell in map(_normalize_cell, line.split(",")) if cell]
+        if cells:
+            rows.append("|".join(cells))
+    return rows
+
+
+def claim_shingles(text, size=SHINGLE_WORDS):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(window) for window in zip(*(words[offset:] for offset in range(size)))]
+
+
+def _jaccard(rows, other):
+    """Similaridade de Jaccard entre dois multiconjuntos de linhas (`Counter`)."""
+    union = sum((rows | other).values())
+    return sum((rows & other).values()) / union if union else 0.0
+
+
+class MinHasher:
+    """Assinaturas MinHash com permutações (a * x + b) mod p calculadas de uma vez com NumPy."""
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        import numpy as np
+
+        if num_perm % bands:
+            raise ValueError("num_perm precisa ser múltiplo de bands")
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2**31, size=num_perm).astype("uint64")
+        self.b = rng.randint(0, 2**31, size=num_perm).astype("uint64")
+        self.bands = bands
+
+    def signature(self, shingles):
+        import numpy as np
+
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in set(shingles)), dtype="uint64")
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+    def buckets(self, signature):
+        """[(faixa, balde)]: o balde é um hash de 64 bits dos valores da faixa."""
+        import numpy as np
+
+        return [
+            (band, int.from_bytes(hashlib.blake2b(rows.tobytes(), digest_size=8).digest(), "little", signed=True))
+            for band, rows in enumerate(np.split(signature, self.bands))
+        ]
+
+
+class Deduplicator:
+    """Assina claims e tabelas no banco de patentes e aponta cada quase duplicata para o item canônico."""
+
+    def __init__(self, store, claims_threshold=CLAIMS_THRESHOLD, table_threshold=TABLE_THRESHOLD, hasher=None):
+        self.store = store
+        self.thresholds = {"claims": claims_threshold, "table": table_threshold}
+        self.hasher = hasher or MinHasher()
+        self.counts = {"claims": 0, "claims_duplicates": 0, "table": 0, "table_duplicates": 0}
+
+    def check(self, kind, item_key, shingles, digest_text, content=None):
+        """Assina o item (se ainda não foi assinado com este conteúdo) e devolve `Match` se ele é uma duplicata.
+
+        Com `content` (linhas separadas por quebra de linha), a similaridade com os candidatos do LSH é a exata
+        entre os conteúdos, e não a estimativa do MinHash.
+        """
+        if not shingles:
+            return None
+        digest = hashlib.sha1(digest_text.encode("utf-8")).hexdigest()
+        self.counts[kind] += 1
+        current = self.store.get_fingerprint(kind, item_key)
+        if current is None or current.digest != digest:
+            current = self._register(kind, item_key, shingles, digest, content)
+        if current.canonical == item_key:
+            return None
+        self.counts[f"{kind}_duplicates"] += 1
+        return Match(current.canonical, current.similarity)
+
+    def _register(self, kind, item_key, shingles, digest, content=None):
+        import numpy as np
+
+        signature = self.hasher.signature(shingles)
+        buckets = self.hasher.buckets(signature)
+        best = self.store.find_fingerprint(kind, digest, exclude=item_key)
+        similarity = best.similarity if best is not None else 0.0
+        if best is None and content is None:
+            for candidate in self.store.lsh_candidates(kind, buckets, exclude=item_key):
+                estimate = float(np.mean(np.frombuffer(candidate.signature, dtype="uint64") == signature))
+                if estimate > similarity:
+                    best, similarity = candidate, estimate
+        elif best is None:
+            # Com o conteúdo, a estimativa não decide: compara as linhas com as do canônico de cada candidato
+            rows = Counter(content.split("\n"))
+            canonicals = {candidate.canonical for candidate in self.store.lsh_candidates(kind, buckets, item_key)}
+            for canonical in sorted(canonicals - {item_key}):
+                canonical_content = self.store.get_fingerprint_content(kind, canonical)
+                if canonical_content is None:
+                    continue
+                exact = _jaccard(rows, Counter(canonical_content.split("\n")))
+                if exact > similarity:
+                    best, similarity = self.store.get_fingerprint(kind, canonical), exact
+
+        if best is not None and similarity >= self.thresholds[kind]:
+            # O canônico de uma duplicata é o canônico do item encontrado, não o próprio item
+            fingerprint = Fingerprint(item_key, digest, signature.tobytes(), best.canonical, similarity)
+        else:
+            fingerprint = Fingerprint(item_key, digest, signature.tobytes(), item_key, 1.0)
+        self.store.put_fingerprint(kind, fingerprint, buckets, content)
+        return fingerprint
+
+    def check_claims(self, patent_id, claims):
+        if isinstance(claims, list):
+            claims = " ".join(claims)
+        text = " ".join(_WORD_RE.findall((claims or "").lower()))
+        return self.check("claims", patent_id, claim_shingles(text), text)
+
+    def check_table(self, patent_id, table_idx, text):
+        rows = "\n".join(sorted(table_rows(text or "")))
+        return self.check("table", table_key(patent_id, table_idx), rows.split("\n") if rows else [], rows, rows)
+
+    def report(self):
+        counts = self.counts
+        return (
+            f"Duplicatas: {counts['claims_duplicates']} de {counts['claims']} patentes com claims quase iguais "
+            f"a outra, {counts['table_duplicates']} de {counts['table']} tabelas iguais a outra."
+        )
+
+
+def canonical_table_result(store, match, runner=None):
+    """Resultado já calculado da tabela canônica: CSVs e, com `runner`, saída do LLM, rota e composições.
+
+    Campos ainda não calculados vêm None (por exemplo, quando o canônico está sendo processado agora); nesse caso a
+    duplicata é processada normalmente.
+    """
+    patent_id, table_idx = split_table_key(match.canonical)
+    result = {"duplicate_of": match.canonical, "csv_texts": store.get_csv_texts(patent_id, table_idx)}
+    output = store.get_output(patent_id, runner) if runner else None
+    for field, key in (("llm_output", "llm_output"), ("route", "table_routes"), ("compositions", "table_compositions")):
+        values = (output or {}).get(key) or []
+        result[field] = values[table_idx - 1] if table_idx <= len(values) else None
+    return result
+
+
+def fingerprint_record(dedup, patent_id, record, table_indexes=None):
+    """Assina as claims e as tabelas (todas ou só os índices dados, a partir de 1) de um registro de patente."""
+    match = dedup.check_claims(patent_id, record.get("claims"))
+    tables = record.get("tables_text") or record.get("tables") or []
+    for table_idx in table_indexes if table_indexes is not None else range(1, len(tables) + 1):
+        if table_idx <= len(tables):
+            dedup.check_table(patent_id, table_idx, tables[table_idx - 1])
+    return match
+
+
+def add_dedup_arguments(parser):
+    parser.add_argument("--no_dedup", action="store_true", help="Não detecta nem reaproveita duplicatas")
+    parser.add_argument(
+        "--claims_threshold",
+        type=float,
+        default=CLAIMS_THRESHOLD,
+        help=f"Similaridade mínima das claims para marcar a patente como duplicata (padrão: {CLAIMS_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--table_threshold",
+        type=float,
+        default=TABLE_THRESHOLD,
+        help=f"Similaridade mínima para reaproveitar o resultado de outra tabela (padrão: {TABLE_THRESHOLD})",
+    )
+
+
+def dedup_from_args(args, store):
+    if args.no_dedup:
+        return None
+    return Deduplicator(store, args.claims_threshold, args.table_threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detecta patentes e tabelas quase duplicadas no banco.")
+    parser.add_argument("command", choices=["scan", "stats"], help="Operação")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help=f"Banco de patentes (padrão: {STORE_PATH})")
+    add_dedup_arguments(parser)
+    args = parser.parse_args()
+
+    with PatentStore(args.store) as store:
+        if args.command == "scan":
+            dedup = Deduplicator(store, args.claims_threshold, args.table_threshold)
+            start = time.perf_counter()
+            with store.batch():
+                for patent_id, record in store.iter_patents():
+                    match = dedup.check_claims(patent_id, record.get("claims"))
+                    if match is not None and record.get("duplicate_of") != match.canonical:
+                        store.put_patent(patent_id, {"duplicate_of": match.canonical})
+                for patent_id, table_idx, text in store.iter_tables():
+                    dedup.check_table(patent_id, table_idx, text)
+            print(f"{dedup.report()} ({time.perf_counter() - start:.2f}s)")
+        else:
+            claims = store.duplicates("claims")
+            tables = store.duplicates("table")
+            print(f"{len(claims)} patentes e {len(tables)} tabelas marcadas como duplicatas de outras.")
@@ -1,76 +1,253 @@
-import json
+import argparse
+import io
+import time
+from itertools import groupby
 from pathlib import Path
 
-import pandas as pd
+from src.data.composition_tables import detect_unit
+from src.data.compounds import get_matcher
+from src.data.dataset import (
+    DATASET_DIR,
+    FINAL_CSV,
+    SCHEMA_VERSION,
+    DatasetWriter,
+    align_to_schema,
+    export_combined,
+    has_pyarrow,
+    partition_for,
+    partition_path,
+    read_partition,
+    write_partition,
+)
+from src.data.dedup import table_key as dedup_key
+from src.data.manifest import Manifest, table_key
+from src.data.normalize import UNITS
+from src.data.patent_store import STORE_PATH, PatentStore
+from src.instrumentation import add_instrumentation_arguments, count, instrumentation_from_args, span
+
+manifest_path = DATASET_DIR / "manifest.json"
+
+
+def load_table(table, matcher, target_unit=None):
+    """Lê um CSV de tabela do banco, transpõe e alinha ao esquema do dataset; devolve None se for descartado.
+
+    A unidade (mol% ou wt%) é detectada no texto da tabela; com `target_unit`, os valores são convertidos para ela.
+    """
+    # pandas só é carregado quando há tabelas a ler, e não no `--help`
+    import pandas as pd
 
-# Caminhos das pastas
-csv_folder = Path("data/processed")
-json_file = Path("json/properties.json")
-
-# Carregar o JSON contendo os compostos desejados
-with open(json_file, "r") as file:
-    properties = json.load(file)
-
-desired_compounds = set(properties["desired_compounds"])  # Usar set para acelerar busca
-
-# Inicializar uma lista para armazenar os DataFrames que serão concatenados
-dfs = []
-
-# Processar todos os arquivos CSV na pasta
-for csv_file in csv_folder.rglob("*.csv"):
     try:
-        df = pd.read_csv(csv_file, header=None)
-    except pd.errors.ParserError:
-        print("Erro ao processar: ", csv_file)
-        continue
+        with span("dataset.read_csv"):
+            df = pd.read_csv(io.StringIO(table.text), header=None)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        print("Erro ao processar: ", table_key(table))
+        count("dataset_tables", result="error")
+        return None
 
     # Eliminar colunas que estão completamente vazias
     df.dropna(axis=1, how="all", inplace=True)
 
     # Obter a primeira coluna e verificar se há ao menos 2 compostos desejados
     first_column = df.iloc[:, 0].astype(str)
-    matches = [compound for compound in desired_compounds if compound in first_column.to_string()]
+    matches = matcher.matched("\n".join(first_column))
 
     if len(matches) < 2:
-        continue
+        count("dataset_tables", result="dropped")
+        return None
+    count("dataset_tables", result="kept")
 
     # Transpor o DataFrame
-    df = df.T
-
-    # Verificar e remover colunas duplicadas após a transposição
-    if not df.iloc[0].is_unique:
-        df = df.loc[:, ~df.iloc[0].duplicated()]
-
-    # Renomear as colunas após a transposição, convertendo para minúsculas
-    df.columns = df.iloc[0].str.lower()
-
-    # Verificar e remover colunas duplicadas após a renomeação
-    if not df.columns.is_unique:
-        df = df.loc[:, ~df.columns.duplicated()]
-
-    # Remover a primeira linha, que agora é o cabeçalho
-    df = df[1:]
-
-    # Adicionar uma coluna com o ID (extraído do diretório pai) e o nome da tabela (nome do arquivo CSV)
-    csv_id = csv_file.parent.stem  # Diretório pai (ID)
-    table_name = csv_file.stem  # Nome do arquivo CSV sem extensão
-
-    df["csv_id"] = csv_id
-    df["table_name"] = table_name
-
-    dfs.append(df)
-
-# Concatenar todos os DataFrames, unindo colunas compartilhadas
-if dfs:
-    final_df = pd.concat(dfs, join="outer", ignore_index=True)
-
-    # Verificar e remover colunas duplicadas após a concatenação
-    if not final_df.columns.is_unique:
-        final_df = final_df.loc[:, ~final_df.columns.duplicated()]
-
-    final_df.reset_index(drop=True, inplace=True)
-    final_df.to_csv("data/processed/final_filtered_concatenated.csv", index=False)
-
-    print("Concatenação completa. O arquivo final foi salvo em 'data/processed/final_filtered_concatenated.csv'.")
-else:
-    print("Nenhuma tabela correspondente foi encontrada.")
+    with span("dataset.transpose"):
+        df = df.T
+
+        # Verificar e remover colunas duplicadas após a transposição
+        if not df.iloc[0].is_unique:
+            df = df.loc[:, ~df.iloc[0].duplicated()]
+
+        # Usar a primeira linha como cabeçalho e removê-la
+        df.columns = df.iloc[0].astype(str)
+        df = df[1:]
+
+        # Verificar e remover colunas duplicadas após a renomeação
+        if not df.columns.is_unique:
+            df = df.loc[:, ~df.columns.duplicated()]
+
+    # Adicionar uma coluna com o ID da patente e o nome da tabela
+    df["csv_id"] = table.patent_id
+    df["table_name"] = table.table_name
+
+    # Óxidos em float32 nas colunas fixas de all_compounds, demais colunas em extra_columns
+    with span("dataset.align"):
+        return align_to_schema(df, detect_unit(table.text), target_unit)
+
+
+def csv_partition(table):
+    return partition_for(table.patent_id)
+
+
+def build_incremental(tables, matcher, manifest, store, target_unit=None):
+    """Atualiza apenas as partições com CSVs novos, alterados ou removidos desde o último build.
+
+    Nas partições afetadas, as linhas de tabelas inalteradas são copiadas da partição Parquet existente usando
+    o intervalo de linhas do manifesto; só os CSVs novos ou alterados são lidos do banco e transpostos. Uma partição
+    do manifesto cujo arquivo sumiu é refeita do zero a partir do banco. Devolve (CSVs relidos, CSVs removidos,
+    partições reescritas ou apagadas).
+    """
+    import pandas as pd
+
+    unchanged, changed, removed = manifest.diff(tables)
+    changed = set(changed)
+
+    # Partições com linhas no manifesto mas sem o arquivo Parquet: todas as tabelas delas são relidas do banco
+    lost = {
+        csv_partition(table)
+        for table in unchanged
+        if manifest.rows(table)[0] != manifest.rows(table)[1] and not partition_path(csv_partition(table)).exists()
+    }
+    if lost:
+        print(f"{len(lost)} partições do manifesto sem arquivo; refazendo: {', '.join(sorted(lost))}.")
+        changed |= {table for table in unchanged if csv_partition(table) in lost}
+
+    affected = {csv_partition(table) for table in changed}
+    for key in removed:
+        affected.add(manifest.partition(key))
+        manifest.forget(key)
+
+    tables = sorted(tables, key=lambda table: (csv_partition(table), table.patent_id, table.table_name))
+    for partition, partition_tables in groupby(tables, key=csv_partition):
+        if partition not in affected:
+            continue
+
+        existing = None
+        frames = []
+        row = 0
+        for table in partition_tables:
+            if table in changed:
+                frame = load_table(store.get_csv_table(table.patent_id, table.table_name), matcher, target_unit)
+            else:
+                row_start, row_stop = manifest.rows(table)
+                if row_start == row_stop:
+                    # Tabela descartada no build anterior: não há linhas a copiar (e a partição pode nem existir)
+                    frame = None
+                else:
+                    if existing is None:
+                        existing = read_partition(partition)
+                    frame = existing.iloc[row_start:row_stop]
+
+            n_rows = 0 if frame is None else len(frame)
+            manifest.record(table, partition, row, row + n_rows)
+            row += n_rows
+            if n_rows:
+                frames.append(frame)
+
+        if frames:
+            with span("dataset.write_partition"):
+                write_partition(partition, pd.concat(frames, ignore_index=True))
+        else:
+            partition_path(partition).unlink(missing_ok=True)
+
+    # Partições cujos CSVs foram todos removidos
+    for partition in affected - {csv_partition(table) for table in tables}:
+        partition_path(partition).unlink(missing_ok=True)
+
+    manifest.save()
+    return len(changed), len(removed), affected
+
+
+def is_duplicate(table, duplicates):
+    """Verifica se o CSV vem de uma tabela marcada como duplicata de outra por `src/data/dedup.py`."""
+    return dedup_key(table.patent_id, int(table.table_name.split("_")[1])) in duplicates
+
+
+def build_csv_only(store, matcher, duplicates=frozenset(), target_unit=None):
+    """Build completo sem pyarrow: gera apenas o CSV final, uma patente por vez."""
+    import pandas as pd
+
+    tables = (table for table in store.iter_csv_tables() if not is_duplicate(table, duplicates))
+    with DatasetWriter() as writer:
+        for _, patent_tables in groupby(tables, key=lambda table: table.patent_id):
+            frames = [load_table(table, matcher, target_unit) for table in patent_tables]
+            frames = [frame for frame in frames if frame is not None]
+            if frames:
+                writer.write(pd.concat(frames, ignore_index=True))
+    return writer.rows
+
+
+def build_dataset(store, matcher=None, full=False, skip_duplicates=True, unit=None):
+    """Atualiza o dataset a partir dos CSVs do banco e devolve o número de linhas, ou None se nada mudou.
+
+    Com `skip_duplicates`, os CSVs de tabelas iguais a outra (as mesmas linhas) ficam de fora, para que os mesmos
+    vidros não entrem repetidos. Com `unit` ('mol%' ou 'wt%'), as tabelas com unidade conhecida são convertidas
+    para ela.
+    """
+    # Matcher compilado uma única vez com a lista de compostos de properties.json
+    matcher = matcher or get_matcher()
+    duplicates = frozenset(store.duplicates("table")) if skip_duplicates else frozenset()
+
+    if not has_pyarrow():
+        return build_csv_only(store, matcher, duplicates, unit)
+
+    # Outra versão do esquema ou outra unidade: as partições existentes não servem mais
+    manifest = Manifest(manifest_path)
+    settings = {"schema": SCHEMA_VERSION, "unit": unit}
+    if manifest.tables and manifest.settings != settings:
+        print(f"Opções do build mudaram ({manifest.settings} → {settings}); reconstruindo o dataset do zero.")
+        full = True
+
+    if full:
+        manifest_path.unlink(missing_ok=True)
+        for old_partition in DATASET_DIR.glob("*.parquet"):
+            old_partition.unlink()
+
+    # Só os metadados dos CSVs (patente, nome e SHA-256); o conteúdo é lido do banco apenas se mudou
+    tables = list(store.iter_csv_tables(with_text=False))
+    n_duplicates = len(tables)
+    tables = [table for table in tables if not is_duplicate(table, duplicates)]
+    n_duplicates -= len(tables)
+    if n_duplicates:
+        print(f"{n_duplicates} CSVs de tabelas duplicadas deixados de fora.")
+    manifest = Manifest(manifest_path)
+    manifest.settings = settings
+    n_changed, n_removed, partitions = build_incremental(tables, matcher, manifest, store, unit)
+    print(
+        f"{n_changed} CSVs novos ou alterados, {n_removed} removidos, {len(partitions)} partições reescritas "
+        f"({len(tables) - n_changed} CSVs reaproveitados)."
+    )
+    # Só as partições reescritas são relidas; o restante do Arrow e do CSV final é aproveitado
+    with span("dataset.export"):
+        rows, manifest.export = export_combined(layout=manifest.export, rewritten=partitions)
+    manifest.save()
+    return rows
+
+
+def report_build(rows, elapsed):
+    if rows is None:
+        print(f"Nenhuma alteração desde o último build ({elapsed:.2f}s).")
+    elif rows:
+        print(f"Concatenação completa: {rows} linhas em {elapsed:.2f}s. O arquivo final foi salvo em '{FINAL_CSV}'.")
+    else:
+        print("Nenhuma tabela correspondente foi encontrada.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o dataset de vidros a partir dos CSVs de tabelas.")
+    parser.add_argument("--full", action="store_true", help="Descarta o manifesto e reconstrói o dataset do zero")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help=f"Banco de patentes (padrão: {STORE_PATH})")
+    parser.add_argument(
+        "--keep_duplicates", action="store_true", help="Inclui também as tabelas marcadas como duplicatas de outras"
+    )
+    parser.add_argument(
+        "--unit",
+        choices=UNITS,
+        default=None,
+        help="Converte as tabelas com unidade conhecida para mol%% ou wt%% (padrão: mantém a unidade de cada tabela)",
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
+
+    start = time.perf_counter()
+    store = PatentStore(args.store)
+    rows = build_dataset(store, full=args.full, skip_duplicates=not args.keep_duplicates, unit=args.unit)
+    store.close()
+    report_build(rows, time.perf_counter() - start)
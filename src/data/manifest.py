@@ -0,0 +1,77 @@
+"""Manifesto dos CSVs de tabelas já incorporados ao dataset.
+
+Para cada CSV do banco de patentes (chave `patent_id/table_name`) o manifesto guarda o SHA-256 do conteúdo, além
+da partição do dataset e do intervalo de linhas [row_start, row_stop) que ele ocupa nela. Assim um novo build só
+relê os CSVs novos ou alterados e sabe quais linhas remover quando uma tabela muda ou é apagada. As opções do build
+(versão do esquema, unidade) ficam em `settings`: se mudarem, o dataset precisa ser refeito do zero. Em `export`
+fica o layout do Arrow e do CSV final (a ordem das partições neles e o tamanho de cada trecho), para que a próxima
+exportação só reescreva as partições que mudaram.
+"""
+
+import json
+from pathlib import Path
+
+
+def table_key(table):
+    return f"{table.patent_id}/{table.table_name}"
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tables = {}
+        self.settings = {}
+        self.export = None
+        if self.path.exists():
+            with open(self.path, "r") as manifest_file:
+                data = json.load(manifest_file)
+            self.tables = data["tables"]
+            self.settings = data.get("settings", {})
+            self.export = data.get("export")
+
+    def diff(self, tables):
+        """Compara os CSVs atuais (`CsvTable`) com o manifesto e devolve (inalterados, novos ou alterados, removidos).
+
+        O SHA-256 de cada CSV já vem do banco, então nenhum conteúdo precisa ser lido para a comparação. Os
+        removidos são devolvidos como chaves.
+        """
+        unchanged, changed = [], []
+        current = set()
+        for table in tables:
+            key = table_key(table)
+            current.add(key)
+            entry = self.tables.get(key)
+            if entry is not None and entry.get("sha256") == table.sha256:
+                unchanged.append(table)
+            else:
+                changed.append(table)
+
+        removed = [key for key in self.tables if key not in current]
+        return unchanged, changed, removed
+
+    def record(self, table, partition, row_start, row_stop):
+        self.tables[table_key(table)] = {
+            "sha256": table.sha256,
+            "partition": partition,
+            "row_start": row_start,
+            "row_stop": row_stop,
+        }
+
+    def forget(self, key):
+        self.tables.pop(key, None)
+
+    def partition(self, key):
+        return self.tables[key]["partition"]
+
+    def rows(self, table):
+        entry = self.tables[table_key(table)]
+        return entry["row_start"], entry["row_stop"]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(
+                {"settings": self.settings, "export": self.export, "tables": self.tables}, manifest_file, indent=1
+            )
+        tmp_path.replace(self.path)
@@ -0,0 +1,149 @@
+"""Normalização vetorizada dos valores de óxidos e conversão entre mol% e wt%.
+
+Depois da transposição, as células de óxidos são textos como "12.5", "0-2", "<0.1", "—", "12.5*" ou "3.0 (a)".
+Em vez de limpar célula por célula, todas as células de uma tabela são tratadas de uma vez com operações de string
+do pandas, e só sobre os valores distintos (`pd.factorize`), que se repetem muito ("0", "—", "1.0"). Cada célula vira
+um valor numérico e um intervalo [mínimo, máximo]:
+
+- número: valor = mínimo = máximo;
+- faixa "0-2": mínimo 0, máximo 2, valor no ponto médio;
+- "<0.1" / "≤0.1": mínimo 0, máximo 0.1, valor no ponto médio; ">5" / "≥5": mínimo 5, sem máximo, valor 5;
+- traço, "n.d.", "tr." (ausente): 0;
+- marcas de nota ("*", "†", "a)", "(1)", sobrescritos) e "±" são ignoradas; texto não numérico vira NaN.
+
+A conversão entre mol% e wt% usa o vetor de massas molares de todos os compostos de `properties.json`, calculado uma
+vez a partir das fórmulas, e é uma única operação de matriz por lote de linhas na mesma unidade:
+wt_i = x_i·M_i / Σ x_j·M_j e x_i = (wt_i / M_i) / Σ wt_j / M_j (em %). Linhas com algum composto de massa
+desconhecida não são convertidas (NaN).
+"""
+
+import re
+from functools import lru_cache
+
+from src.data.compounds import load_properties
+
+UNITS = ("mol%", "wt%")
+
+# Massas atômicas padrão (IUPAC), em g/mol
+# fmt: off
+ATOMIC_MASSES = {
+    "H": 1.008, "He": 4.0026, "Li": 6.94, "Be": 9.0122, "B": 10.81, "C": 12.011, "N": 14.007, "O": 15.999,
+    "F": 18.998, "Ne": 20.180, "Na": 22.990, "Mg": 24.305, "Al": 26.982, "Si": 28.085, "P": 30.974, "S": 32.06,
+    "Cl": 35.45, "Ar": 39.948, "K": 39.098, "Ca": 40.078, "Sc": 44.956, "Ti": 47.867, "V": 50.942, "Cr": 51.996,
+    "Mn": 54.938, "Fe": 55.845, "Co": 58.933, "Ni": 58.693, "Cu": 63.546, "Zn": 65.38, "Ga": 69.723, "Ge": 72.630,
+    "As": 74.922, "Se": 78.971, "Br": 79.904, "Kr": 83.798, "Rb": 85.468, "Sr": 87.62, "Y": 88.906, "Zr": 91.224,
+    "Nb": 92.906, "Mo": 95.95, "Tc": 98.0, "Ru": 101.07, "Rh": 102.91, "Pd": 106.42, "Ag": 107.87, "Cd": 112.41,
+    "In": 114.82, "Sn": 118.71, "Sb": 121.76, "Te": 127.60, "I": 126.90, "Xe": 131.29, "Cs": 132.91, "Ba": 137.33,
+    "La": 138.91, "Ce": 140.12, "Pr": 140.91, "Nd": 144.24, "Pm": 145.0, "Sm": 150.36, "Eu": 151.96, "Gd": 157.25,
+    "Tb": 158.93, "Dy": 162.50, "Ho": 164.93, "Er": 167.26, "Tm": 168.93, "Yb": 173.05, "Lu": 174.97, "Hf": 178.49,
+    "Ta": 180.95, "W": 183.84, "Re": 186.21, "Os": 190.23, "Ir": 192.22, "Pt": 195.08, "Au": 196.97, "Hg": 200.59,
+    "Tl": 204.38, "Pb": 207.2, "Bi": 208.98, "Po": 209.0, "At": 210.0, "Rn": 222.0, "Fr": 223.0, "Ra": 226.0,
+    "Ac": 227.0, "Th": 232.04, "Pa": 231.04, "U": 238.03, "Np": 237.0, "Pu": 244.0,
+}
+# fmt: on
+
+_FORMULA_TOKEN_RE = re.compile(r"([A-Z][a-z]?|\(|\))(\d*(?:\.\d+)?)")
+
+_FOOTNOTE_RE = r"(?:\s*(?:\(\w{1,2}\)|\b[a-z]\)|\*+|[†‡§¶#]|[⁰¹²³⁴-⁹]+))+$|(?<=\d)[a-z]$|\s*±.*$"
+_MISSING_RE = r"^(?:[-–—]+|n\.?d\.?|n/?a|nil|none|tr\.?|trace)$"
+_CELL_RE = (
+    r"^(?P<op><=|>=|≤|≥|<|>|~|≈|ca\.?|about)?\s*(?P<low>\d*\.?\d+)"
+    r"(?:\s*(?:-|–|—|~|to)\s*(?P<high>\d*\.?\d+))?\s*(?:(?:mol|wt|mass)?\s*%)?$"
+)
+
+
+def formula_mass(formula):
+    """Massa molar de uma fórmula ('Al2O3', '(NH4)2SO4', 'GeTe4.3'), ou NaN com elemento desconhecido."""
+    stack = [0.0]
+    position = 0
+    for match in _FORMULA_TOKEN_RE.finditer(formula):
+        if match.start() != position:
+            return float("nan")
+        position = match.end()
+        token, count = match.group(1), float(match.group(2) or 1)
+        if token == "(":
+            stack.append(0.0)
+        elif token == ")":
+            if len(stack) < 2:
+                return float("nan")
+            group = stack.pop()
+            stack[-1] += group * count
+        elif token in ATOMIC_MASSES:
+            stack[-1] += ATOMIC_MASSES[token] * count
+        else:
+            return float("nan")
+    if position != len(formula) or len(stack) != 1:
+        return float("nan")
+    return stack[0]
+
+
+@lru_cache(maxsize=None)
+def molar_masses(compounds=None):
+    """Vetor (float64) das massas molares dos compostos, por padrão `all_compounds` de `properties.json`."""
+    import numpy as np
+
+    compounds = compounds or tuple(load_properties()["all_compounds"])
+    masses = np.array([formula_mass(compound) for compound in compounds], dtype="float64")
+    masses.flags.writeable = False
+    return masses
+
+
+def parse_cells(values):
+    """Converte uma matriz de células (DataFrame ou array) em três matrizes float32: valor, mínimo e máximo."""
+    import numpy as np
+    import pandas as pd
+
+    array = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(array.ravel(), use_na_sentinel=True)
+
+    cells = pd.Series(uniques, dtype="string").str.strip().str.lower()
+    cells = cells.str.replace("−", "-", regex=False).str.replace(",", ".", regex=False)
+    cells = cells.str.replace(_FOOTNOTE_RE, "", regex=True).str.strip()
+    parts = cells.str.extract(_CELL_RE)
+    low = pd.to_numeric(parts["low"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    high = pd.to_numeric(parts["high"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    op = parts["op"].fillna("").to_numpy(dtype=str)
+
+    value = low.copy()
+    minimum = low.copy()
+    maximum = np.where(np.isnan(high), low, high)
+    ranged = ~np.isnan(high)
+    value[ranged] = (low[ranged] + high[ranged]) / 2
+    below = np.isin(op, ["<", "<=", "≤"])
+    value[below], minimum[below], maximum[below] = low[below] / 2, 0.0, low[below]
+    above = np.isin(op, [">", ">=", "≥"])
+    maximum[above] = np.nan
+    missing = cells.str.contains(_MISSING_RE, regex=True).fillna(False).to_numpy(dtype=bool)
+    value[missing] = minimum[missing] = maximum[missing] = 0.0
+
+    def expand(parsed):
+        # Código -1 (célula vazia/NaN) vira NaN
+        out = np.append(parsed, np.nan).astype("float32")[codes]
+        return out.reshape(array.shape)
+
+    return expand(value), expand(minimum), expand(maximum)
+
+
+def convert_units(matrix, from_unit, to_unit, masses=None):
+    """Converte as linhas de `matrix` (linhas x compostos, em %) de `from_unit` para `to_unit`.
+
+    NaN conta como ausente na soma e continua NaN. O resultado soma 100 em cada linha; linhas com composto presente
+    de massa molar desconhecida, ou sem nenhum composto, viram NaN.
+    """
+    import numpy as np
+
+    if from_unit == to_unit:
+        return np.asarray(matrix, dtype="float32")
+    if {from_unit, to_unit} != set(UNITS):
+        raise ValueError(f"Conversão não suportada: {from_unit} → {to_unit}")
+    masses = molar_masses() if masses is None else masses
+    matrix = np.asarray(matrix, dtype="float64")
+
+    weighted = matrix * masses if from_unit == "mol%" else matrix / masses
+    present = np.nan_to_num(matrix) > 0
+    unknown = (present & np.isnan(masses)).any(axis=1)
+    total = np.nansum(np.where(present, weighted, 0.0), axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        converted = weighted / total * 100
+    converted[unknown | (total[:, 0] == 0)] = np.nan
+    return converted.astype("float32")
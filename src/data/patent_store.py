@@ -0,0 +1,474 @@
+"""Armazenamento das patentes, tabelas e saídas do LLM em um único banco SQLite.
+
+Antes cada patente virava `data/patents/{id}.json`, `data/patents/{id}/table_N.txt` e `metadata.txt`, e cada etapa
+seguinte redescobria tudo com `glob`/`rglob` e checagens de `exists()`. Com dezenas de milhares de arquivos pequenos,
+varrer diretórios e fazer backup ficava lento. Aqui tudo vai para tabelas indexadas de um SQLite em modo WAL, com
+inserção em lote, e as etapas seguintes leem por iteradores:
+
+- `patents`: o registro JSON de cada patente (claims, descrição, tabelas, metadados);
+- `tables`: o texto das tabelas com compostos desejados (o antigo `table_N.txt`);
+- `csv_tables`: os CSVs gerados por `process_table_to_csv` a partir de cada tabela;
+- `llm_outputs`: a saída de cada executor do LLM por patente;
+- `fingerprints` e `lsh_buckets`: as assinaturas MinHash de claims e tabelas de `src/data/dedup.py`;
+- `fingerprint_contents`: as linhas normalizadas das tabelas assinadas, para confirmar as duplicatas.
+
+    python -m src.data.patent_store import     # importa data/patents e data/llm_output do formato antigo
+    python -m src.data.patent_store stats
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+STORE_PATH = Path("data/patents.sqlite")
+LEGACY_PATENTS_DIR = Path("data/patents")
+LEGACY_OUTPUT_DIR = Path("data/llm_output")
+PAGE_SIZE = 500
+
+CsvTable = namedtuple("CsvTable", ["patent_id", "table_name", "text", "sha256"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patents (
+    patent_id TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tables (
+    patent_id TEXT NOT NULL,
+    table_idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    processed_at REAL,
+    PRIMARY KEY (patent_id, table_idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS csv_tables (
+    patent_id TEXT NOT NULL,
+    table_idx INTEGER NOT NULL,
+    part INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (patent_id, table_idx, part)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS llm_outputs (
+    patent_id TEXT NOT NULL,
+    runner TEXT NOT NULL,
+    output TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (patent_id, runner)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fingerprints (
+    kind TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    canonical TEXT NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (kind, item_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fingerprints_digest ON fingerprints (kind, digest);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    item_key TEXT NOT NULL,
+    PRIMARY KEY (kind, band, bucket, item_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fingerprint_contents (
+    kind TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (kind, item_key)
+) WITHOUT ROWID;
+"""
+
+Fingerprint = namedtuple("Fingerprint", ["item_key", "digest", "signature", "canonical", "similarity"])
+
+
+class PatentStore:
+    """Banco de patentes; cada método de escrita faz commit, exceto dentro de `with store.batch():`."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    @contextmanager
+    def batch(self):
+        """Agrupa várias escritas em uma única transação.
+
+        O commit só acontece quando o lote mais externo termina normalmente; uma exceção que sai dele desfaz todas as
+        escritas do lote.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            completed = False
+            try:
+                yield self
+                completed = True
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    if completed:
+                        self._db.commit()
+                    else:
+                        self._db.rollback()
+
+    def _commit(self):
+        if self._batch_depth == 0:
+            self._db.commit()
+
+    def _paged(self, columns, table, key_columns, where="", params=()):
+        """Lê a consulta em páginas de `PAGE_SIZE` linhas, retomando pela chave, sem carregar tudo na memória.
+
+        As colunas da chave precisam ser as primeiras de `columns`.
+        """
+        keys = ", ".join(key_columns)
+        last = None
+        while True:
+            conditions = [where] if where else []
+            args = list(params)
+            if last is not None:
+                conditions.append(f"({keys}) > ({', '.join('?' * len(key_columns))})")
+                args += last
+            query = f"SELECT {columns} FROM {table}"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            with self._lock:
+                rows = self._db.execute(f"{query} ORDER BY {keys} LIMIT {PAGE_SIZE}", args).fetchall()
+            yield from rows
+            if len(rows) < PAGE_SIZE:
+                return
+            last = list(rows[-1][: len(key_columns)])
+
+    # Patentes
+
+    def get_patent(self, patent_id):
+        """Registro da patente, ou um dicionário vazio."""
+        with self._lock:
+            row = self._db.execute("SELECT record FROM patents WHERE patent_id = ?", (patent_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def put_patent(self, patent_id, fields):
+        """Atualiza o registro da patente com os campos dados, preservando os que já existem."""
+        with self._lock:
+            record = self.get_patent(patent_id)
+            record.update(fields)
+            self._db.execute(
+                "INSERT OR REPLACE INTO patents (patent_id, record, updated_at) VALUES (?, ?, ?)",
+                (patent_id, json.dumps(record, ensure_ascii=False), time.time()),
+            )
+            self._commit()
+        return record
+
+    def put_patents(self, records):
+        """Inserção em lote de registros completos {patent_id: registro} (substitui os existentes)."""
+        now = time.time()
+        rows = [(patent_id, json.dumps(record, ensure_ascii=False), now) for patent_id, record in records.items()]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO patents (patent_id, record, updated_at) VALUES (?, ?, ?)", rows
+            )
+            self._commit()
+
+    def has_field(self, patent_id, field):
+        """Verifica se o registro da patente já tem o campo com um valor não nulo, sem decodificar o JSON em Python.
+
+        Um campo gravado como `null` (seção não encontrada na página) conta como ausente, para que a patente seja
+        tentada de novo.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM patents WHERE patent_id = ? AND json_type(record, ?) NOT IN ('null')",
+                (patent_id, f"$.{field}"),
+            ).fetchone()
+        return row is not None
+
+    def iter_patents(self, without_output=None):
+        """Itera (patent_id, registro) em ordem de id; com `without_output`, só as patentes sem saída desse executor."""
+        where, params = "", ()
+        if without_output is not None:
+            where = "NOT EXISTS (SELECT 1 FROM llm_outputs o WHERE o.patent_id = patents.patent_id AND o.runner = ?)"
+            params = (without_output,)
+        for patent_id, record in self._paged("patent_id, record", "patents", ["patent_id"], where, params):
+            yield patent_id, json.loads(record)
+
+    # Tabelas
+
+    def put_tables(self, patent_id, tables):
+        """Substitui as tabelas salvas da patente por {índice: texto}; tabelas com o mesmo texto ficam intactas."""
+        now = time.time()
+        with self._lock:
+            current = dict(
+                self._db.execute("SELECT table_idx, text FROM tables WHERE patent_id = ?", (patent_id,)).fetchall()
+            )
+            for table_idx in current.keys() - tables.keys():
+                self._db.execute("DELETE FROM tables WHERE patent_id = ? AND table_idx = ?", (patent_id, table_idx))
+                self._db.execute("DELETE FROM csv_tables WHERE patent_id = ? AND table_idx = ?", (patent_id, table_idx))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tables (patent_id, table_idx, text, updated_at) VALUES (?, ?, ?, ?)",
+                [(patent_id, idx, text, now) for idx, text in tables.items() if current.get(idx) != text],
+            )
+            self._commit()
+
+    def has_tables(self, patent_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM tables WHERE patent_id = ?", (patent_id,)).fetchone() is not None
+
+    def iter_tables(self, pending_only=False):
+        """Itera (patent_id, índice, texto); com `pending_only`, só as tabelas novas ou alteradas desde o último CSV."""
+        where = "processed_at IS NULL OR processed_at < updated_at" if pending_only else ""
+        yield from self._paged(
+            "patent_id, table_idx, text", "tables", ["patent_id", "table_idx"], f"({where})" if where else ""
+        )
+
+    def put_csv_tables(self, patent_id, table_idx, csv_texts):
+        """Substitui os CSVs gerados de uma tabela e a marca como processada."""
+        with self._lock:
+            self._db.execute("DELETE FROM csv_tables WHERE patent_id = ? AND table_idx = ?", (patent_id, table_idx))
+            self._db.executemany(
+                "INSERT INTO csv_tables (patent_id, table_idx, part, text, sha256) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (patent_id, table_idx, part, text, hashlib.sha256(text.encode("utf-8")).hexdigest())
+                    for part, text in enumerate(csv_texts)
+                ],
+            )
+            self._db.execute(
+                "UPDATE tables SET processed_at = ? WHERE patent_id = ? AND table_idx = ?",
+                (time.time(), patent_id, table_idx),
+            )
+            self._commit()
+
+    def iter_csv_tables(self, with_text=True):
+        """Itera os CSVs de tabelas como `CsvTable`, em ordem de patente; sem `with_text`, o texto vem None."""
+        columns = "patent_id, table_idx, part, sha256" + (", text" if with_text else "")
+        for row in self._paged(columns, "csv_tables", ["patent_id", "table_idx", "part"]):
+            patent_id, table_idx, part, sha256 = row[:4]
+            yield CsvTable(patent_id, f"table_{table_idx}_{part}", row[4] if with_text else None, sha256)
+
+    def get_csv_table(self, patent_id, table_name):
+        _, table_idx, part = table_name.split("_")
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text, sha256 FROM csv_tables WHERE patent_id = ? AND table_idx = ? AND part = ?",
+                (patent_id, int(table_idx), int(part)),
+            ).fetchone()
+        return CsvTable(patent_id, table_name, *row) if row else None
+
+    def get_csv_texts(self, patent_id, table_idx):
+        """CSVs gerados de uma tabela, em ordem de parte, ou None se ela ainda não foi convertida (ou mudou depois)."""
+        with self._lock:
+            converted = self._db.execute(
+                "SELECT 1 FROM tables WHERE patent_id = ? AND table_idx = ? AND processed_at >= updated_at",
+                (patent_id, table_idx),
+            ).fetchone()
+            if converted is None:
+                return None
+            rows = self._db.execute(
+                "SELECT text FROM csv_tables WHERE patent_id = ? AND table_idx = ? ORDER BY part",
+                (patent_id, table_idx),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # Saídas do LLM
+
+    def put_output(self, patent_id, runner, output):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_outputs (patent_id, runner, output, updated_at) VALUES (?, ?, ?, ?)",
+                (patent_id, runner, json.dumps(output, ensure_ascii=False), time.time()),
+            )
+            self._commit()
+
+    def get_output(self, patent_id, runner):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT output FROM llm_outputs WHERE patent_id = ? AND runner = ?", (patent_id, runner)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_outputs(self, runner):
+        """Itera (patent_id, saída) de um executor."""
+        rows = self._paged("patent_id, output", "llm_outputs", ["patent_id"], "runner = ?", (runner,))
+        for patent_id, output in rows:
+            yield patent_id, json.loads(output)
+
+    # Assinaturas para detecção de quase duplicatas
+
+    def get_fingerprint(self, kind, item_key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT item_key, digest, signature, canonical, similarity FROM fingerprints "
+                "WHERE kind = ? AND item_key = ?",
+                (kind, item_key),
+            ).fetchone()
+        return Fingerprint(*row) if row else None
+
+    def find_fingerprint(self, kind, digest, exclude=None):
+        """Primeiro item com o mesmo resumo do conteúdo normalizado (exceto `exclude`), ou None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT item_key, digest, signature, canonical, similarity FROM fingerprints "
+                "WHERE kind = ? AND digest = ? AND item_key != ? LIMIT 1",
+                (kind, digest, exclude or ""),
+            ).fetchone()
+        return Fingerprint(*row) if row else None
+
+    def lsh_candidates(self, kind, buckets, exclude=None):
+        """Itens que caem em pelo menos um dos baldes [(faixa, balde)] do LSH, com suas assinaturas."""
+        if not buckets:
+            return []
+        values = ", ".join("(?, ?)" for _ in buckets)
+        params = [kind, kind] + [value for bucket in buckets for value in bucket] + [exclude or ""]
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT item_key, digest, signature, canonical, similarity FROM fingerprints WHERE kind = ? AND "
+                "item_key IN (SELECT item_key FROM lsh_buckets WHERE kind = ? AND (band, bucket) IN "
+                f"(VALUES {values})) AND item_key != ?",
+                params,
+            ).fetchall()
+        return [Fingerprint(*row) for row in rows]
+
+    def get_fingerprint_content(self, kind, item_key):
+        """Conteúdo normalizado gravado com a assinatura do item, ou None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content FROM fingerprint_contents WHERE kind = ? AND item_key = ?", (kind, item_key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_fingerprint(self, kind, fingerprint, buckets, content=None):
+        """Grava (ou substitui) a assinatura de um item, seus baldes do LSH e, se dado, o conteúdo normalizado."""
+        with self._lock:
+            self._db.execute("DELETE FROM lsh_buckets WHERE kind = ? AND item_key = ?", (kind, fingerprint.item_key))
+            self._db.execute(
+                "DELETE FROM fingerprint_contents WHERE kind = ? AND item_key = ?", (kind, fingerprint.item_key)
+            )
+            if content is not None:
+                self._db.execute(
+                    "INSERT INTO fingerprint_contents (kind, item_key, content) VALUES (?, ?, ?)",
+                    (kind, fingerprint.item_key, content),
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (kind, item_key, digest, signature, canonical, similarity) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, *fingerprint),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (kind, band, bucket, item_key) VALUES (?, ?, ?, ?)",
+                [(kind, band, bucket, fingerprint.item_key) for band, bucket in buckets],
+            )
+            self._commit()
+
+    def duplicates(self, kind):
+        """{item: canônico} dos itens marcados como quase duplicatas de outro."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT item_key, canonical FROM fingerprints WHERE kind = ? AND canonical != item_key", (kind,)
+            ).fetchall()
+        return dict(rows)
+
+    def stats(self):
+        with self._lock:
+            counts = {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("patents", "tables", "csv_tables", "llm_outputs")
+            }
+        size_mb = sum(path.stat().st_size for path in self.path.parent.glob(self.path.name + "*")) / 1024**2
+        return (
+            f"{counts['patents']} patentes, {counts['tables']} tabelas, {counts['csv_tables']} CSVs, "
+            f"{counts['llm_outputs']} saídas do LLM ({size_mb:.1f} MB em '{self.path}')."
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@lru_cache(maxsize=None)
+def get_store(path=STORE_PATH):
+    """Banco compartilhado pelo processo (aberto uma única vez por caminho)."""
+    return PatentStore(path)
+
+
+def import_legacy(store, patents_dir=LEGACY_PATENTS_DIR, output_dir=LEGACY_OUTPUT_DIR):
+    """Importa o formato antigo de arquivos: registros JSON, `table_N.txt` e saídas de `data/llm_output`."""
+    n_patents = n_tables = n_outputs = 0
+    with store.batch():
+        records = {}
+        for json_file in sorted(Path(patents_dir).glob("*.json")):
+            with open(json_file, "r", encoding="utf-8") as f:
+                records[json_file.stem] = json.load(f)
+        store.put_patents(records)
+        n_patents = len(records)
+
+        patent_dirs = Path(patents_dir).iterdir() if Path(patents_dir).exists() else []
+        for patent_dir in sorted(path for path in patent_dirs if path.is_dir()):
+            tables = {
+                int(table_file.stem.split("_")[1]): table_file.read_text()
+                for table_file in patent_dir.glob("table_*.txt")
+            }
+            if tables:
+                store.put_tables(patent_dir.name, tables)
+                n_tables += len(tables)
+
+        # data/llm_output/{id}.txt tem o registro com `llm_output`; data/llm_output/cppllama/{id}.json o resultado
+        for runner, pattern in (("llama", "*.txt"), ("cppllama", "cppllama/*.json")):
+            for output_file in sorted(Path(output_dir).glob(pattern)):
+                with open(output_file, "r", encoding="utf-8") as f:
+                    output = json.load(f)
+                output_runner = runner
+                if runner == "llama":
+                    output_runner = "tllama" if isinstance(output.get("llm_output"), list) else "llama"
+                    output = {key: output[key] for key in output if key.startswith(("llm_", "table_"))}
+                store.put_output(output_file.stem, output_runner, output)
+                n_outputs += 1
+    return n_patents, n_tables, n_outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerencia o banco de patentes.")
+    parser.add_argument("command", choices=["import", "stats"], help="Comando a executar")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help=f"Arquivo do banco (padrão: {STORE_PATH})")
+    parser.add_argument(
+        "--patents_dir",
+        type=Path,
+        default=LEGACY_PATENTS_DIR,
+        help=f"Pasta de patentes no formato antigo (padrão: {LEGACY_PATENTS_DIR})",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=Path,
+        default=LEGACY_OUTPUT_DIR,
+        help=f"Pasta de saídas do LLM no formato antigo (padrão: {LEGACY_OUTPUT_DIR})",
+    )
+    args = parser.parse_args()
+
+    with PatentStore(args.store) as store:
+        if args.command == "import":
+            start = time.perf_counter()
+            n_patents, n_tables, n_outputs = import_legacy(store, args.patents_dir, args.output_dir)
+            print(
+                f"{n_patents} patentes, {n_tables} tabelas e {n_outputs} saídas do LLM importadas "
+                f"em {time.perf_counter() - start:.2f}s."
+            )
+        print(store.stats())
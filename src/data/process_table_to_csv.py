@@ -1,55 +1,119 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
-# Caminhos das pastas
-input_folder = Path("/home/thiagorr/Projects/llm-glass/data/patents")
-output_folder = Path("data/processed")
+from src.data.dedup import add_dedup_arguments, dedup_from_args, split_table_key
+from src.data.patent_store import STORE_PATH, PatentStore
+from src.instrumentation import add_instrumentation_arguments, count, instrumentation_from_args, span
 
-# Certifique-se de que a pasta de saída existe
-output_folder.mkdir(parents=True, exist_ok=True)
+# Tabelas enviadas aos processos de cada vez
+BLOCK_SIZE = 2000
 
 
-# Função para processar um único arquivo de tabelas
-def process_file(filepath):
-    with filepath.open("r") as file:
-        content = file.read()
+def iter_tables(file):
+    """Lê as linhas (de um arquivo ou lista) e devolve as tabelas separadas por linha em branco."""
+    lines = []
+    for line in file:
+        line = line.rstrip("\n")
+        if line:
+            lines.append(line)
+        elif lines:
+            yield lines
+            lines = []
+    if lines:
+        yield lines
 
-    # Quebra o conteúdo em seções de tabelas
-    tables = content.split("\n\n")  # Separação por linha em branco
 
-    # Extrair o ID da patente da subpasta do arquivo
-    patent_id = filepath.parent.name
-    table_number = filepath.stem.split("_")[1]
-    table_count = 0
-
-    # Criar subpasta de saída com o ID da patente
-    patent_output_folder = output_folder / patent_id
-    patent_output_folder.mkdir(parents=True, exist_ok=True)
+# Função para processar uma única tabela salva
+def table_to_csv(table_text):
+    """Converte o texto de uma tabela salva (antigo `table_N.txt`) nos CSVs das tabelas válidas que ele contém."""
+    csv_texts = []
 
     # Processar cada tabela separadamente
-    for table in tables:
-        lines = table.strip().split("\n")
-
+    for lines in iter_tables(table_text.splitlines()):
         # Verifica se tem mais de 10 linhas (para garantir que seja uma tabela válida)
-        if len(lines) > 10:
-            # Conta a quantidade de vírgulas em cada linha
-            # comma_counts = [line.count(",") for line in lines]
+        if len(lines) <= 10:
+            continue
+
+        # Mantém apenas as linhas com mais de duas vírgulas
+        filtered_lines = [line for line in lines if line.count(",") > 2]
+
+        # Verifica se ainda existem linhas válidas após a filtragem
+        if filtered_lines:
+            csv_texts.append("".join(line + "\n" for line in filtered_lines))
+
+    return csv_texts
+
+
+def _convert(item):
+    patent_id, table_idx, table_text = item
+    return patent_id, table_idx, len(table_text.encode("utf-8")), table_to_csv(table_text)
 
-            # Identifica a linha que deve ser removida, se tiver menos vírgulas que as outras
-            # max_commas = max(comma_counts)
-            filtered_lines = [line for line in lines if line.count(",") > 2]
 
-            # Verifica se ainda existem linhas válidas após a filtragem
-            if filtered_lines:
-                output_filepath = patent_output_folder / f"table_{table_number}_{table_count}.csv"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converte as tabelas salvas das patentes em CSVs.")
+    parser.add_argument("--store", type=Path, default=STORE_PATH, help=f"Banco de patentes (padrão: {STORE_PATH})")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Número de processos (padrão: número de CPUs)"
+    )
+    parser.add_argument("--force", action="store_true", help="Reprocessa tabelas mesmo que os CSVs estejam em dia")
+    add_dedup_arguments(parser)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
 
-                # Escreve diretamente no arquivo CSV
-                with output_filepath.open("w") as csv_file:
-                    for line in filtered_lines:
-                        csv_file.write(line + "\n")  # Escreve cada linha diretamente no arquivo CSV
+    store = PatentStore(args.store)
+    dedup = dedup_from_args(args, store)
 
-                table_count += 1
+    # Só as tabelas novas ou alteradas desde a última conversão, lidas do banco em blocos
+    tables = store.iter_tables(pending_only=not args.force)
 
+    start = time.perf_counter()
+    processed = tables_written = total_bytes = reused = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        while True:
+            block = list(islice(tables, BLOCK_SIZE))
+            if not block:
+                break
+            # Tabelas iguais a outra já convertida copiam os CSVs dela em vez de ir para os processos; as iguais a
+            # outra do mesmo bloco esperam a conversão do bloco e então copiam
+            duplicates = []
+            if dedup is not None:
+                pending = []
+                for item in block:
+                    match = dedup.check_table(*item)
+                    (duplicates if match is not None else pending).append((item, match))
+                block = [item for item, _ in pending]
+            chunksize = max(1, len(block) // (4 * args.workers))
+            with span("csv.block", tables=len(block) + len(duplicates)), store.batch():
+                for patent_id, table_idx, n_bytes, csv_texts in executor.map(_convert, block, chunksize=chunksize):
+                    store.put_csv_tables(patent_id, table_idx, csv_texts)
+                    processed += 1
+                    tables_written += len(csv_texts)
+                    total_bytes += n_bytes
+                for item, match in duplicates:
+                    csv_texts = store.get_csv_texts(*split_table_key(match.canonical))
+                    if csv_texts is None:
+                        patent_id, table_idx, n_bytes, csv_texts = _convert(item)
+                        processed += 1
+                        total_bytes += n_bytes
+                    else:
+                        reused += 1
+                    store.put_csv_tables(item[0], item[1], csv_texts)
+                    tables_written += len(csv_texts)
+    elapsed = time.perf_counter() - start
+    store.close()
+    count("tables_converted", processed)
+    count("csv_written", tables_written)
+    count("csv_reused", reused)
+    count("table_bytes", total_bytes)
 
-# Processar todos os arquivos em subpastas da pasta de entrada
-for txt_file in input_folder.rglob("table_*.txt"):
-    process_file(txt_file)
+    print(
+        f"{processed} tabelas salvas convertidas, {tables_written} CSVs escritos em {elapsed:.2f}s: "
+        f"{processed / elapsed:.1f} tabelas/s, {total_bytes / 1024**2 / elapsed:.2f} MB/s."
+    )
+    if dedup is not None:
+        print(f"{reused} tabelas duplicadas copiaram os CSVs da tabela canônica sem conversão. {dedup.report()}")
@@ -0,0 +1,423 @@
+"""Índice de similaridade de composições sobre o dataset de vidros.
+
+As colunas de óxidos do dataset (esquema `all_compounds`) são gravadas uma única vez como uma matriz float32 densa
+em `data/processed/similarity/` e abertas por memory-map, sem passar pelo pandas a cada consulta. Óxido ausente vale
+0, e as linhas sem nenhum óxido ficam de fora. O índice guarda também:
+
+- a norma de cada linha, para calcular distâncias euclidianas e de cosseno como um produto de matrizes;
+- para cada óxido, a ordem das linhas pelo teor (`order`) e os teores ordenados (`sorted`), para que uma faixa
+  ("SiO2 60-70") seja resolvida com `searchsorted` em vez de varrer a coluna;
+- `csv_id` e `table_name` de cada linha, para voltar à tabela de origem.
+
+Os valores são os do dataset (mol% ou wt%, conforme a tabela). O índice é refeito automaticamente quando o arquivo
+de origem muda.
+
+    python -m src.data.similarity build
+    python -m src.data.similarity knn "SiO2 70, Na2O 15, CaO 10" -k 5
+    python -m src.data.similarity range "SiO2 60-70, Na2O < 15"
+    python -m src.data.similarity bench
+"""
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from src.data.dataset import ARROW_PATH, FINAL_CSV, ID_COLUMNS, compound_columns, has_pyarrow, map_header
+
+INDEX_DIR = Path("data/processed/similarity")
+
+# Linhas por bloco no cálculo de distâncias: limita a memória temporária a block_rows x consultas
+BLOCK_ROWS = 65536
+
+METRICS = ("euclidean", "cosine")
+
+_CONDITION_RE = re.compile(r"^\s*(.+?)\s*(<=|>=|<|>|=)?\s*(\d+(?:\.\d+)?)\s*(?:[-–]\s*(\d+(?:\.\d+)?))?\s*$")
+
+
+def default_source():
+    """Arquivo Arrow do dataset se existir (leitura mais rápida), senão o CSV final."""
+    return ARROW_PATH if has_pyarrow() and ARROW_PATH.exists() else FINAL_CSV
+
+
+def _source_signature(source):
+    stat = Path(source).stat()
+    return {"source": str(source), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def read_compositions(source):
+    """Lê as colunas de óxidos (float32, NaN como 0) e os identificadores do arquivo Arrow ou do CSV final."""
+    import numpy as np
+
+    columns = compound_columns()
+    # pyarrow e pandas só são carregados quando o índice é (re)construído
+    if Path(source).suffix == ".arrow":
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(str(source), "r")).read_all()
+        matrix = np.column_stack([table[column].to_numpy(zero_copy_only=False) for column in columns])
+        ids = {column: np.asarray(table[column].to_pylist(), dtype=str) for column in ID_COLUMNS}
+    else:
+        import pandas as pd
+
+        frame = pd.read_csv(
+            source,
+            usecols=columns + ID_COLUMNS,
+            dtype={**dict.fromkeys(columns, "float32"), **dict.fromkeys(ID_COLUMNS, str)},
+        )
+        matrix = frame[columns].to_numpy(dtype="float32")
+        ids = {column: frame[column].fillna("").to_numpy(dtype=str) for column in ID_COLUMNS}
+    matrix = np.nan_to_num(matrix.astype("float32", copy=False), nan=0.0)
+    return matrix, ids
+
+
+def build_index(source=None, index_dir=INDEX_DIR):
+    """Grava a matriz, as normas, o índice ordenado por óxido e os identificadores em `index_dir`."""
+    import numpy as np
+
+    source = Path(source or default_source())
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    matrix, ids = read_compositions(source)
+    # Só os vidros com algum óxido e só os óxidos presentes em algum vidro (em geral uma fração das 600+ colunas)
+    keep = (matrix != 0).any(axis=1)
+    active = np.flatnonzero((matrix != 0).any(axis=0))
+    matrix = np.ascontiguousarray(matrix[np.ix_(keep, active)])
+    np.save(index_dir / "matrix.npy", matrix)
+    np.save(index_dir / "norms.npy", np.sqrt(np.einsum("ij,ij->i", matrix, matrix)))
+    for column in ID_COLUMNS:
+        np.save(index_dir / f"{column}.npy", ids[column][keep])
+
+    # Índice por óxido só com os teores não nulos, concatenados: as linhas do óxido j ficam em
+    # order[offsets[j]:offsets[j + 1]], em ordem crescente de teor, e sorted tem os teores nessa mesma ordem
+    orders = []
+    for j in range(matrix.shape[1]):
+        rows = np.flatnonzero(matrix[:, j])
+        orders.append(rows[np.argsort(matrix[rows, j], kind="stable")].astype("int32"))
+    order = np.concatenate(orders) if orders else np.empty(0, dtype="int32")
+    offsets = np.concatenate([[0], np.cumsum([len(rows) for rows in orders])]).astype("int64")
+    columns_of = np.repeat(np.arange(len(orders)), np.diff(offsets))
+    np.save(index_dir / "order.npy", order)
+    np.save(index_dir / "sorted.npy", matrix[order, columns_of])
+    np.save(index_dir / "offsets.npy", offsets)
+
+    compounds = compound_columns()
+    meta = dict(
+        _source_signature(source),
+        schema=compounds,
+        columns=[compounds[j] for j in active],
+        rows=int(matrix.shape[0]),
+    )
+    (index_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    return meta
+
+
+def _is_stale(source, index_dir):
+    meta_path = Path(index_dir) / "meta.json"
+    if not meta_path.exists():
+        return True
+    meta = json.loads(meta_path.read_text())
+    return meta.get("schema") != compound_columns() or {
+        key: meta.get(key) for key in ("source", "size", "mtime")
+    } != _source_signature(source)
+
+
+def parse_composition(text):
+    """'SiO2 70, Na2O 15' ou {'SiO2': 70, 'Na2O': 15} → dicionário óxido → teor, com os nomes do esquema."""
+    if isinstance(text, dict):
+        items = text.items()
+    else:
+        items = []
+        for part in filter(None, (part.strip() for part in text.split(","))):
+            match = _CONDITION_RE.match(part)
+            if match is None or match.group(2) or match.group(4):
+                raise ValueError(f"Composição inválida: '{part}' (esperado 'Óxido teor')")
+            items.append((match.group(1), float(match.group(3))))
+
+    composition = {}
+    for label, value in items:
+        oxide = map_header(label)
+        if oxide is None:
+            raise ValueError(f"Óxido desconhecido: '{label}'")
+        composition[oxide] = float(value)
+    return composition
+
+
+def parse_conditions(text):
+    """'SiO2 60-70, Na2O < 15, B2O3 >= 5' → dicionário óxido → (mínimo, máximo), inclusivos, None sem limite.
+
+    Limites estritos (< e >) viram o float32 imediatamente abaixo ou acima do valor.
+    """
+    import numpy as np
+
+    conditions = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        match = _CONDITION_RE.match(part)
+        if match is None:
+            raise ValueError(f"Condição inválida: '{part}' (ex.: 'SiO2 60-70', 'Na2O < 15')")
+        label, operator, value, upper = match.groups()
+        oxide = map_header(label)
+        if oxide is None:
+            raise ValueError(f"Óxido desconhecido: '{label}'")
+        value = np.float32(value)
+        if upper is not None:
+            bounds = (value, np.float32(upper))
+        elif operator == "<":
+            bounds = (None, np.nextafter(value, np.float32(-np.inf)))
+        elif operator == "<=":
+            bounds = (None, value)
+        elif operator == ">":
+            bounds = (np.nextafter(value, np.float32(np.inf)), None)
+        elif operator == ">=":
+            bounds = (value, None)
+        else:
+            bounds = (value, value)
+        conditions[oxide] = bounds
+    return conditions
+
+
+class SimilarityIndex:
+    """Consultas de vizinhos mais próximos e de faixas sobre o índice aberto por memory-map."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        import numpy as np
+
+        self.index_dir = Path(index_dir)
+        self.meta = json.loads((self.index_dir / "meta.json").read_text())
+        self.schema = self.meta["schema"]
+        self.columns = self.meta["columns"]
+        self.column_index = {column: idx for idx, column in enumerate(self.columns)}
+        # Posição de cada coluna do índice no esquema completo
+        self.positions = np.array([self.schema.index(column) for column in self.columns], dtype="int64")
+        self.matrix = np.load(self.index_dir / "matrix.npy", mmap_mode="r")
+        self.norms = np.load(self.index_dir / "norms.npy", mmap_mode="r")
+        self.order = np.load(self.index_dir / "order.npy", mmap_mode="r")
+        self.sorted = np.load(self.index_dir / "sorted.npy", mmap_mode="r")
+        self.offsets = np.load(self.index_dir / "offsets.npy")
+        self.ids = {column: np.load(self.index_dir / f"{column}.npy", mmap_mode="r") for column in ID_COLUMNS}
+
+    @classmethod
+    def open(cls, source=None, index_dir=INDEX_DIR, rebuild=False):
+        """Abre o índice, refazendo-o antes se o dataset de origem mudou desde o último build."""
+        source = Path(source or default_source())
+        if rebuild or _is_stale(source, index_dir):
+            start = time.perf_counter()
+            meta = build_index(source, index_dir)
+            print(
+                f"Índice de similaridade gerado: {meta['rows']} vidros, {len(meta['columns'])} óxidos presentes "
+                f"em {time.perf_counter() - start:.2f}s."
+            )
+        return cls(index_dir)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def vector(self, composition):
+        """Vetor float32 no esquema completo a partir de um dicionário óxido → teor (óxidos ausentes valem 0)."""
+        import numpy as np
+
+        vector = np.zeros(len(self.schema), dtype="float32")
+        for oxide, value in composition.items():
+            vector[self.schema.index(oxide)] = value
+        return vector
+
+    def knn(self, queries, k=10, metric="euclidean", oxides=None):
+        """Os `k` vidros mais próximos de cada consulta.
+
+        `queries` é uma composição (dicionário ou texto), uma lista delas ou uma matriz (consultas x esquema
+        completo). Com `oxides`, a distância considera só esses óxidos. Devolve duas matrizes (consultas x k): as
+        linhas do índice e as distâncias, em ordem crescente de distância.
+        """
+        import numpy as np
+
+        if isinstance(queries, (str, dict)):
+            queries = [queries]
+        if not isinstance(queries, np.ndarray):
+            queries = np.stack([self.vector(parse_composition(query)) for query in queries])
+        queries = np.asarray(queries, dtype="float32")
+        if oxides is not None:
+            queries = queries[:, [self.schema.index(oxide) for oxide in oxides]]
+            columns = [self.column_index[oxide] for oxide in oxides if oxide in self.column_index]
+            projected = queries[:, [idx for idx, oxide in enumerate(oxides) if oxide in self.column_index]]
+        else:
+            columns = None
+            projected = queries[:, self.positions]
+        # A norma da consulta inclui os óxidos que nenhum vidro do índice tem: eles só somam à distância
+        query_norms = np.sqrt(np.einsum("ij,ij->i", queries, queries))
+        k = min(k, len(self))
+
+        best_rows = np.empty((queries.shape[0], 0), dtype="int64")
+        best_dist = np.empty((queries.shape[0], 0), dtype="float32")
+        for start in range(0, len(self), BLOCK_ROWS):
+            stop = start + BLOCK_ROWS
+            block = self.matrix[start:stop]
+            if columns is None:
+                norms = self.norms[start:stop]
+            else:
+                block = block[:, columns]
+                norms = np.sqrt(np.einsum("ij,ij->i", block, block))
+            dot = projected @ block.T
+            if metric == "cosine":
+                dist = np.maximum(1 - dot / np.maximum(np.outer(query_norms, norms), 1e-12), 0)
+            else:
+                dist = np.sqrt(np.maximum(query_norms[:, None] ** 2 - 2 * dot + norms[None, :] ** 2, 0))
+
+            # Junta os candidatos do bloco aos melhores até aqui e mantém só os k menores
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(block)), dist.shape)], 1)
+            dist = np.concatenate([best_dist, dist.astype("float32", copy=False)], axis=1)
+            if dist.shape[1] > k:
+                keep = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                rows = np.take_along_axis(rows, keep, axis=1)
+                dist = np.take_along_axis(dist, keep, axis=1)
+            best_rows, best_dist = rows, dist
+
+        order = np.argsort(best_dist, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+    def _column(self, rows, oxide):
+        """Teores de um óxido nas linhas dadas (zeros se nenhum vidro do índice o tem)."""
+        import numpy as np
+
+        if oxide not in self.column_index:
+            return np.zeros(len(rows), dtype="float32")
+        return self.matrix[rows, self.column_index[oxide]]
+
+    def range_rows(self, conditions):
+        """Linhas que satisfazem todas as faixas (dicionário óxido → (mínimo, máximo) ou texto), em ordem crescente.
+
+        Uma faixa com mínimo acima de 0 vira um intervalo contíguo do índice ordenado daquele óxido. Parte-se da
+        mais seletiva delas e as demais faixas são verificadas só nas linhas candidatas. Faixas que aceitam 0
+        ("Na2O < 15") incluem os vidros sem o óxido; se só houver faixas assim, elas excluem as linhas fora da faixa.
+        """
+        import numpy as np
+
+        if isinstance(conditions, str):
+            conditions = parse_conditions(conditions)
+
+        spans = []
+        for oxide, (low, high) in conditions.items():
+            if low is None or low <= 0:
+                continue
+            if oxide not in self.column_index:
+                return np.empty(0, dtype="int64")
+            j = self.column_index[oxide]
+            first, last = self.offsets[j], self.offsets[j + 1]
+            values = self.sorted[first:last]
+            lo = np.searchsorted(values, np.float32(low), side="left")
+            hi = len(values) if high is None else np.searchsorted(values, np.float32(high), side="right")
+            spans.append((max(hi - lo, 0), oxide, first + lo, first + hi))
+
+        if spans:
+            _, seed, lo, hi = min(spans)
+            rows = np.sort(self.order[lo:hi]).astype("int64")
+        else:
+            seed = None
+            rows = np.arange(len(self))
+
+        for oxide, (low, high) in conditions.items():
+            if oxide == seed or not len(rows):
+                continue
+            values = self._column(rows, oxide)
+            mask = np.ones(len(rows), dtype=bool)
+            if low is not None:
+                mask &= values >= np.float32(low)
+            if high is not None:
+                mask &= values <= np.float32(high)
+            rows = rows[mask]
+        return rows
+
+    def results(self, rows, distances=None, oxides=None):
+        """DataFrame com `csv_id`, `table_name`, a distância (se houver) e os teores dos óxidos pedidos."""
+        import numpy as np
+        import pandas as pd
+
+        rows = np.asarray(rows, dtype="int64")
+        frame = pd.DataFrame({column: self.ids[column][rows] for column in ID_COLUMNS})
+        frame.insert(0, "row", rows)
+        if distances is not None:
+            frame["distance"] = distances
+        for oxide in oxides or []:
+            frame[oxide] = self._column(rows, oxide)
+        return frame
+
+    def query_knn(self, composition, k=10, metric="euclidean", oxides=None):
+        """Vizinhos de uma única composição como DataFrame."""
+        composition = parse_composition(composition)
+        rows, distances = self.knn([composition], k, metric, oxides)
+        return self.results(rows[0], distances[0], list(oxides or composition))
+
+    def query_range(self, conditions, limit=None):
+        """Vidros dentro das faixas como DataFrame (até `limit` linhas) e o total de vidros encontrados."""
+        if isinstance(conditions, str):
+            conditions = parse_conditions(conditions)
+        rows = self.range_rows(conditions)
+        return self.results(rows[:limit], oxides=list(conditions)), len(rows)
+
+
+def bench(index, n_queries=100, k=10, batch=32, seed=0):
+    """Mede kNN em lote e consultas de faixa com vidros do próprio índice como consultas."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(index), size=min(n_queries, len(index)), replace=False))
+    queries = np.zeros((len(sample), len(index.schema)), dtype="float32")
+    queries[:, index.positions] = index.matrix[sample]
+
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch):
+        stop = offset + batch
+        index.knn(queries[offset:stop], k)
+    knn_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+    # Faixas de ±5 em torno dos dois óxidos principais de cada vidro
+    timings = []
+    n_found = 0
+    for row in sample:
+        values = index.matrix[row]
+        top = np.argsort(values)[-2:]
+        conditions = {index.columns[j]: (values[j] - 5, values[j] + 5) for j in top}
+        start = time.perf_counter()
+        n_found += len(index.range_rows(conditions))
+        timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{len(index)} vidros x {len(index.columns)} óxidos presentes, {len(sample)} consultas\n"
+        f"kNN (k={k}, lotes de {batch}): {knn_ms:.3f} ms por consulta\n"
+        f"faixa (2 óxidos): p50 {np.percentile(timings, 50):.3f} ms, p99 {np.percentile(timings, 99):.3f} ms, "
+        f"{n_found / len(sample):.0f} vidros por consulta em média"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca de vidros por similaridade de composição e por faixas.")
+    parser.add_argument("command", choices=["build", "knn", "range", "bench"], help="Operação")
+    parser.add_argument("query", nargs="?", default="", help="Composição (knn) ou condições (range)")
+    parser.add_argument("-k", type=int, default=10, help="Número de vizinhos (padrão: 10)")
+    parser.add_argument("--metric", choices=METRICS, default="euclidean", help="Distância do kNN (padrão: euclidean)")
+    parser.add_argument("--oxides", nargs="+", default=None, help="Só esses óxidos entram na distância do kNN")
+    parser.add_argument("--limit", type=int, default=50, help="Máximo de linhas mostradas no range (padrão: 50)")
+    parser.add_argument("--source", type=Path, default=None, help="Dataset de origem (padrão: Arrow, senão CSV)")
+    parser.add_argument("--index_dir", type=Path, default=INDEX_DIR, help=f"Pasta do índice (padrão: {INDEX_DIR})")
+    parser.add_argument("--rebuild", action="store_true", help="Refaz o índice mesmo sem mudança no dataset")
+    args = parser.parse_args()
+
+    index = SimilarityIndex.open(args.source, args.index_dir, args.rebuild or args.command == "build")
+    oxides = [map_header(oxide) for oxide in args.oxides] if args.oxides else None
+    start = time.perf_counter()
+    if args.command == "knn":
+        result = index.query_knn(args.query, args.k, args.metric, oxides)
+        total = len(result)
+    elif args.command == "range":
+        result, total = index.query_range(args.query, args.limit)
+    else:
+        if args.command == "bench":
+            bench(index, k=args.k)
+        raise SystemExit(0)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    import pandas as pd
+
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(result.to_string(index=False))
+    print(f"{total} vidros em {elapsed:.2f} ms.")
@@ -0,0 +1,309 @@
+"""Instrumentação compartilhada por scraping, processamento e LLM: intervalos, contadores, trace e perfis.
+
+Cada trecho de interesse é medido com `span`, e quantidades (bytes baixados, tabelas mantidas ou descartadas, tokens,
+acertos de cache) com `count`:
+
+    with span("fetch.request", host=host) as attrs:
+        response = session.get(url)
+        attrs["status"] = response.status_code
+    count("fetch_bytes", len(response.content), host=host)
+
+Sem nenhuma opção, os intervalos e contadores só são somados em memória (um `perf_counter` e uma soma sob lock por
+intervalo). As opções de `add_instrumentation_arguments` ligam as saídas:
+
+- `--trace arquivo.jsonl`: uma linha JSON por intervalo (nome, início, duração, thread, intervalo pai e atributos) e,
+  no fim, uma linha com os totais;
+- `--metrics_file arquivo.prom`: tempos e contadores no formato texto do Prometheus, para o textfile collector do
+  node_exporter, regravado de forma atômica no fim da execução;
+- `--profile etapa [etapa ...]`: perfil com cProfile (ou pyinstrument, com `--profiler pyinstrument`) só dos
+  intervalos com esses nomes, acumulado entre as chamadas e salvo em `data/profiles/` (`.prof`, para `pstats` ou
+  snakeviz, ou `.html`). Só um intervalo é perfilado por vez; os que rodam em outros processos não entram;
+- `--timings`: imprime no fim o tempo por intervalo e os contadores.
+"""
+
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+PROFILE_DIR = Path("data/profiles")
+METRIC_PREFIX = "glass_"
+PROFILERS = ("cprofile", "pyinstrument")
+
+_METRIC_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Instrumentation:
+    """Totais dos intervalos e contadores do processo, e as saídas ligadas por `configure`."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+        self.trace = None
+        self.metrics_path = None
+        self.profile_stages = frozenset()
+        self.profiler = "cprofile"
+        self.profile_dir = PROFILE_DIR
+        self.profiles = {}
+        self.timings = False
+        self.started = time.time()
+        self._ids = itertools.count(1)
+        # Intervalo aberto no contexto atual (thread ou tarefa asyncio), pai dos intervalos abertos dentro dele
+        self._current = contextvars.ContextVar("span", default=None)
+        self._profiling = threading.Lock()
+
+    def configure(self, trace=None, metrics_file=None, profile=(), profiler="cprofile", timings=False):
+        if profiler == "pyinstrument" and pyinstrument is None:
+            print("pyinstrument não está instalado; usando cProfile.")
+            profiler = "cprofile"
+        if trace is not None:
+            Path(trace).parent.mkdir(parents=True, exist_ok=True)
+            self.trace = open(trace, "a", encoding="utf-8")
+        self.metrics_path = Path(metrics_file) if metrics_file is not None else None
+        self.profile_stages = frozenset(profile or ())
+        self.profiler = profiler
+        self.timings = timings
+        atexit.register(self.close)
+
+    def _start_profile(self, name):
+        # cProfile e pyinstrument não aceitam dois perfis ativos ao mesmo tempo
+        if name not in self.profile_stages or not self._profiling.acquire(blocking=False):
+            return None
+        profiler = self.profiles.get(name)
+        if profiler is None:
+            profiler = self.profiles[name] = self._new_profiler()
+        if self.profiler == "pyinstrument":
+            profiler.start()
+        else:
+            profiler.enable()
+        return profiler
+
+    def _new_profiler(self):
+        if self.profiler == "pyinstrument":
+            return pyinstrument.Profiler()
+        import cProfile
+
+        return cProfile.Profile()
+
+    def _stop_profile(self, profiler):
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        self._profiling.release()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span_id = next(self._ids)
+        parent = self._current.get()
+        token = self._current.set(span_id)
+        profiler = self._start_profile(name)
+        wall = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                self._stop_profile(profiler)
+            self._current.reset(token)
+            self._record(name, elapsed, wall, span_id, parent, attrs, error)
+
+    def _record(self, name, elapsed, wall, span_id, parent, attrs, error):
+        with self.lock:
+            totals = self.spans.get(name)
+            if totals is None:
+                totals = self.spans[name] = {"count": 0, "seconds": 0.0, "max": 0.0, "errors": 0}
+            totals["count"] += 1
+            totals["seconds"] += elapsed
+            totals["max"] = max(totals["max"], elapsed)
+            totals["errors"] += error is not None
+            if self.trace is not None:
+                event = {
+                    "type": "span",
+                    "name": name,
+                    "ts": round(wall, 6),
+                    "dur": round(elapsed, 6),
+                    "id": span_id,
+                    "parent": parent,
+                    "pid": os.getpid(),
+                    "thread": threading.current_thread().name,
+                }
+                if error is not None:
+                    event["error"] = error
+                if attrs:
+                    event["attrs"] = attrs
+                self.trace.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted((key, str(label)) for key, label in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        """Cópia dos totais: {"spans": {nome: totais}, "counters": {nome: [(rótulos, valor)]}}."""
+        with self.lock:
+            spans = {name: dict(totals) for name, totals in self.spans.items()}
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append((dict(labels), value))
+        return {"spans": spans, "counters": counters}
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            name = METRIC_PREFIX + _METRIC_NAME_RE.sub("_", name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                rendered = ",".join(f'{key}="{_escape_label(label)}"' for key, label in labels.items())
+                value = repr(float(value)) if isinstance(value, float) else str(value)
+                lines.append(f"{name}{{{rendered}}} {value}" if rendered else f"{name} {value}")
+
+        spans = sorted(snapshot["spans"].items())
+        if spans:
+            metric(
+                "span_seconds_total",
+                "counter",
+                "Tempo total gasto em cada intervalo.",
+                [({"span": name}, t["seconds"]) for name, t in spans],
+            )
+            metric(
+                "span_total",
+                "counter",
+                "Execuções de cada intervalo.",
+                [({"span": name}, t["count"]) for name, t in spans],
+            )
+            metric(
+                "span_errors_total",
+                "counter",
+                "Execuções de cada intervalo que terminaram em exceção.",
+                [({"span": name}, t["errors"]) for name, t in spans],
+            )
+            metric(
+                "span_max_seconds",
+                "gauge",
+                "Maior duração de cada intervalo.",
+                [({"span": name}, t["max"]) for name, t in spans],
+            )
+        for name, samples in snapshot["counters"].items():
+            metric(f"{name}_total", "counter", f"Contador {name}.", samples)
+        metric("run_start_timestamp_seconds", "gauge", "Início da execução.", [({}, self.started)])
+        metric("run_end_timestamp_seconds", "gauge", "Última gravação das métricas.", [({}, time.time())])
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path=None):
+        """Grava as métricas no formato texto do Prometheus, trocando o arquivo de uma vez."""
+        path = Path(path or self.metrics_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def write_profiles(self):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        for name, profiler in self.profiles.items():
+            stem = _METRIC_NAME_RE.sub("_", name)
+            if self.profiler == "pyinstrument":
+                path = self.profile_dir / f"{stem}.html"
+                path.write_text(profiler.output_html())
+            else:
+                path = self.profile_dir / f"{stem}.prof"
+                profiler.dump_stats(path)
+            print(f"Perfil de '{name}' salvo em '{path}'.")
+
+    def report(self):
+        """Tabela com o tempo por intervalo (do mais demorado ao mais rápido) e os contadores."""
+        snapshot = self.snapshot()
+        lines = [f"{'intervalo':<28} {'chamadas':>9} {'total s':>9} {'média ms':>9} {'máx ms':>9} {'erros':>6}"]
+        for name, t in sorted(snapshot["spans"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                f"{name:<28} {t['count']:>9} {t['seconds']:>9.2f} {1000 * t['seconds'] / t['count']:>9.2f} "
+                f"{1000 * t['max']:>9.2f} {t['errors']:>6}"
+            )
+        for name, samples in snapshot["counters"].items():
+            for labels, value in samples:
+                rendered = ", ".join(f"{key}={label}" for key, label in labels.items())
+                label = f"{name} ({rendered})" if rendered else name
+                lines.append(f"{label:<48} {value:>12.6g}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Grava as saídas ligadas; chamado no fim do processo."""
+        if self.profiles:
+            self.write_profiles()
+            self.profiles = {}
+        if self.metrics_path is not None:
+            self.write_metrics()
+        if self.trace is not None:
+            summary = json.dumps({"type": "summary", **self.snapshot()}, default=str)
+            with self.lock:
+                self.trace.write(summary + "\n")
+                self.trace.close()
+                self.trace = None
+        if self.timings:
+            print(self.report())
+            self.timings = False
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation():
+    return _instrumentation
+
+
+def span(name, **attrs):
+    """Mede o bloco `with` como um intervalo `name`; o dict devolvido recebe atributos extras para o trace."""
+    return _instrumentation.span(name, **attrs)
+
+
+def count(name, value=1, **labels):
+    """Soma `value` ao contador `name` com os rótulos dados."""
+    _instrumentation.count(name, value, **labels)
+
+
+def add_instrumentation_arguments(parser):
+    """Adiciona ao argparse as opções de trace, métricas e perfil."""
+    parser.add_argument("--trace", type=Path, default=None, help="Grava um intervalo por linha neste arquivo JSONL")
+    parser.add_argument(
+        "--metrics_file", type=Path, default=None, help="Grava tempos e contadores neste arquivo (formato Prometheus)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="+",
+        default=[],
+        metavar="INTERVALO",
+        help=f"Perfila os intervalos com estes nomes (ex.: parse, llm.extract) e salva em {PROFILE_DIR}",
+    )
+    parser.add_argument(
+        "--profiler", choices=PROFILERS, default="cprofile", help="Perfilador usado com --profile (padrão: cprofile)"
+    )
+    parser.add_argument("--timings", action="store_true", help="Imprime no fim o tempo por intervalo e os contadores")
+
+
+def instrumentation_from_args(args):
+    _instrumentation.configure(args.trace, args.metrics_file, args.profile, args.profiler, args.timings)
+    return _instrumentation
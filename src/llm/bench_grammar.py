@@ -0,0 +1,104 @@
+"""Compara a gramática original com a gramática esparsa (completa e restrita por documento).
+
+Sem modelo, mostra o tamanho das gramáticas, o tempo de compilação (com e sem o cache) e quantos tokens a menor
+resposta válida custa em cada uma. Com `--model`, roda a extração nos mesmos trechos com cada gramática e mostra
+tokens gerados e latência por vidro.
+
+    python -m src.llm.bench_grammar --static_only
+    python -m src.llm.bench_grammar --limit 10
+"""
+
+import argparse
+import time
+
+from src.llm.chunking import approx_token_count, count_glasses, document_chunks
+from src.llm.grammar import (
+    LEGACY_GRAMMAR_PATH,
+    compile_grammar,
+    default_compounds,
+    grammar_text,
+    has_llama_cpp,
+    minimal_output,
+    parse_grammar,
+)
+from src.llm.run_cppllama import CHUNK_TOKENS, Extractor, iter_documents, load_llm, local_model
+
+VARIANTS = ("original", "esparsa", "restrita")
+
+
+def static_report(count_tokens):
+    legacy = LEGACY_GRAMMAR_PATH.read_text()
+    print(f"Gramática original: {len(legacy)} bytes; esparsa: {len(grammar_text())} bytes\n")
+
+    if has_llama_cpp():
+        start = time.perf_counter()
+        parse_grammar(legacy)
+        legacy_ms = (time.perf_counter() - start) * 1000
+        compile_grammar.cache_clear()
+        start = time.perf_counter()
+        compile_grammar()
+        sparse_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        compile_grammar()
+        cached_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"Compilação: original {legacy_ms:.1f} ms, esparsa {sparse_ms:.1f} ms, "
+            f"esparsa em cache {cached_ms:.3f} ms\n"
+        )
+
+    print(f"{'óxidos':>7} {'tokens original':>16} {'tokens esparsa':>15} {'redução':>8}")
+    for n_components in (3, 5, 8, 12):
+        legacy_tokens = count_tokens(minimal_output(n_components, legacy=True))
+        sparse_tokens = count_tokens(minimal_output(n_components))
+        print(f"{n_components:>7} {legacy_tokens:>16} {sparse_tokens:>15} {legacy_tokens / sparse_tokens:>7.1f}x")
+
+
+def benchmark_variant(extractor, chunks):
+    results = [extractor.extract(chunk) for chunk in chunks]
+    glasses = sum(count_glasses(result["output"]) for result in results)
+    return {
+        "latency": sum(result["latency"] for result in results),
+        "completion_tokens": sum(result["completion_tokens"] for result in results),
+        "glasses": glasses,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara tokens gerados e latência por vidro entre as gramáticas.")
+    parser.add_argument("--model", type=str, default=local_model, help=f"Modelo GGUF (padrão: {local_model})")
+    parser.add_argument("--n_ctx", type=int, default=10000, help="Tamanho do contexto (padrão: 10000)")
+    parser.add_argument("--limit", type=int, default=10, help="Número de trechos usados (padrão: 10)")
+    parser.add_argument("--static_only", action="store_true", help="Só a comparação sem modelo")
+    args = parser.parse_args()
+
+    if args.static_only:
+        static_report(approx_token_count)
+        raise SystemExit
+
+    llm = load_llm(args.model, args.n_ctx)
+    static_report(lambda text: len(llm.client.tokenize(text.encode("utf-8"), add_bos=False)))
+
+    chunks = []
+    for _, record in iter_documents(force=True):
+        chunks += [chunk["text"] for chunk in document_chunks(record, CHUNK_TOKENS)[0]]
+        if len(chunks) >= args.limit:
+            break
+    chunks = chunks[: args.limit]
+    if not chunks:
+        raise SystemExit("Nenhum documento encontrado para o benchmark.")
+
+    extractors = {
+        "original": Extractor(llm, grammar_file=LEGACY_GRAMMAR_PATH),
+        "esparsa": Extractor(llm, narrow=False),
+        "restrita": Extractor(llm, narrow=True),
+    }
+    print(f"\n{len(chunks)} trechos, {len(default_compounds())} compostos na gramática completa\n")
+    print(f"{'gramática':<10} {'vidros':>7} {'tokens':>8} {'tokens/vidro':>13} {'s/vidro':>8} {'tokens/s':>9}")
+    for name in VARIANTS:
+        stats = benchmark_variant(extractors[name], chunks)
+        glasses = max(stats["glasses"], 1)
+        print(
+            f"{name:<10} {stats['glasses']:>7} {stats['completion_tokens']:>8} "
+            f"{stats['completion_tokens'] / glasses:>13.1f} {stats['latency'] / glasses:>8.2f} "
+            f"{stats['completion_tokens'] / stats['latency']:>9.1f}"
+        )
@@ -0,0 +1,213 @@
+"""Divisão dos documentos de patente em trechos por número de tokens e junção das extrações parciais.
+
+Descrições e reivindicações longas não cabem (ou custam caro) na janela de contexto do modelo. Aqui o texto é
+dividido em trechos de até `max_tokens` tokens, respeitando parágrafos e frases sempre que possível, e só seguem
+para o LLM os trechos que mencionam algum óxido ou fórmula do `properties.json` ou que são tabelas (símbolos de
+elementos isolados não contam: 'In another embodiment' e 'As shown in FIG. 1' são só prosa). As composições
+extraídas de cada trecho são depois juntadas em um único resultado por patente.
+"""
+
+import ast
+import json
+import re
+
+from src.data.compounds import get_matcher
+
+DEFAULT_CHUNK_TOKENS = 1500
+DEFAULT_OVERLAP = 64
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=\s*(?:\d+\.|[A-Z]))")
+_SENTENCE_RE = re.compile(r"(?<=[.;:])\s+")
+
+
+def approx_token_count(text):
+    """Estimativa de tokens sem tokenizador: palavras e sinais de pontuação (próxima do BPE do Llama em inglês)."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def _split_words(text, max_tokens, count_tokens):
+    # Último recurso para um trecho sem quebras de frase: corta em blocos de palavras
+    words = text.split()
+    pieces, current = [], []
+    for word in words:
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _units(text, max_tokens, count_tokens):
+    """Parágrafos do texto, com os que passam de `max_tokens` divididos em frases (ou palavras)."""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            if count_tokens(sentence) <= max_tokens:
+                yield sentence
+            else:
+                yield from _split_words(sentence, max_tokens, count_tokens)
+
+
+def split_text(
+    text, max_tokens=DEFAULT_CHUNK_TOKENS, overlap=DEFAULT_OVERLAP, count_tokens=approx_token_count, keep=None
+):
+    """Agrupa parágrafos em trechos de até `max_tokens` tokens.
+
+    Com `keep`, só entram os parágrafos (ou frases) para os quais `keep(texto)` é verdadeiro. Cada trecho repete a
+    última unidade do anterior quando ela tem até `overlap` tokens, para que uma composição dividida entre dois
+    parágrafos apareça inteira em pelo menos um dos trechos.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for unit in _units(text, max_tokens, count_tokens):
+        if keep is not None and not keep(unit):
+            continue
+        tokens = count_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            tail = current[-1]
+            tail_tokens = count_tokens(tail)
+            if tail_tokens <= overlap and tail_tokens + tokens <= max_tokens:
+                current, current_tokens = [tail], tail_tokens
+            else:
+                current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def document_chunks(
+    record,
+    max_tokens=DEFAULT_CHUNK_TOKENS,
+    overlap=DEFAULT_OVERLAP,
+    count_tokens=approx_token_count,
+    matcher=None,
+    sources=("claims", "description", "tables"),
+):
+    """Divide claims, descrição e tabelas de um registro de patente em trechos para o modelo.
+
+    Dos claims e da descrição só entram os parágrafos que mencionam algum óxido ou fórmula (o `matcher` padrão
+    ignora os símbolos de elementos isolados); as tabelas (`tables_text`)
+    entram sempre. Retorna (trechos, estatísticas); cada trecho é um dict com `source`, `text` e `tokens`, e as
+    estatísticas comparam os tokens do documento inteiro com os enviados ao modelo.
+    """
+    matcher = matcher or get_matcher()
+    texts = []
+    if "claims" in sources and record.get("claims"):
+        texts.append(("claims", record["claims"]))
+    if "description" in sources and record.get("description_html"):
+        texts.append(("description", record["description_html"]))
+    if "tables" in sources:
+        texts += [("table", table_text) for table_text in record.get("tables_text") or [] if table_text]
+
+    chunks = []
+    total_tokens = 0
+    for source, text in texts:
+        total_tokens += count_tokens(text)
+        if source == "table":
+            pieces = split_text(text, max_tokens, 0, count_tokens)
+        else:
+            pieces = split_text(text, max_tokens, overlap, count_tokens, keep=matcher.contains_any)
+        chunks += [{"source": source, "text": piece, "tokens": count_tokens(piece)} for piece in pieces]
+
+    stats = {
+        "chunks": len(chunks),
+        "tokens": total_tokens,
+        "kept_tokens": sum(chunk["tokens"] for chunk in chunks),
+    }
+    return chunks, stats
+
+
+def parse_llm_json(output):
+    """Interpreta a saída do modelo como dict ou lista, aceitando também o JSON com aspas simples pedido no prompt."""
+    if isinstance(output, (dict, list)):
+        return output
+    text = output.strip()
+    starts = [idx for idx in (text.find("{"), text.find("[")) if idx >= 0]
+    if not starts:
+        return {}
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]") + 1
+    if end <= start:
+        return {}
+    text = text[start:end]
+    for loads in (json.loads, ast.literal_eval):
+        try:
+            value = loads(text)
+        except (ValueError, SyntaxError, TypeError):
+            continue
+        return value if isinstance(value, (dict, list)) else {}
+    return {}
+
+
+def _glasses(partial):
+    """Lista os vidros (dicts com `composition`) de uma extração parcial, em qualquer nível do JSON."""
+    if isinstance(partial, dict):
+        if isinstance(partial.get("composition"), dict):
+            yield partial
+            return
+        for value in partial.values():
+            yield from _glasses(value)
+    elif isinstance(partial, list):
+        for value in partial:
+            yield from _glasses(value)
+
+
+def count_glasses(output):
+    """Número de vidros com composição em uma saída do modelo."""
+    return sum(1 for _ in _glasses(parse_llm_json(output)))
+
+
+def merge_compositions(partials):
+    """Junta as extrações parciais de uma patente em um único dict `glass1`, `glass2`, ...
+
+    Vidros com o mesmo nome (ignorando maiúsculas e espaços) são unidos: os componentes que faltam em um são
+    completados pelo outro e as propriedades são somadas sem repetição. Vidros sem composição são
+    descartados, assim como respostas "there is no information".
+    """
+    merged = {}
+    for partial in partials:
+        for glass in _glasses(parse_llm_json(partial)):
+            composition = {str(k).strip(): v for k, v in glass["composition"].items() if str(k).strip()}
+            if not composition:
+                continue
+            name = str(glass.get("name") or "").strip()
+            key = " ".join(name.lower().split()) or json.dumps(composition, sort_keys=True)
+
+            properties = glass.get("properties") or []
+            if not isinstance(properties, list):
+                properties = [properties]
+
+            entry = merged.setdefault(key, {"name": name, "composition": {}, "properties": []})
+            for compound, value in composition.items():
+                entry["composition"].setdefault(compound, value)
+            for prop in properties:
+                if prop not in entry["properties"]:
+                    entry["properties"].append(prop)
+
+    return {f"glass{idx}": entry for idx, entry in enumerate(merged.values(), start=1)}
+
+
+def add_chunk_arguments(parser, default_tokens=DEFAULT_CHUNK_TOKENS):
+    """Adiciona ao argparse as opções de divisão dos documentos em trechos."""
+    parser.add_argument(
+        "--chunk_tokens",
+        type=int,
+        default=default_tokens,
+        help=f"Máximo de tokens do documento por trecho enviado ao modelo (padrão: {default_tokens})",
+    )
+    parser.add_argument(
+        "--chunk_overlap",
+        type=int,
+        default=DEFAULT_OVERLAP,
+        help=f"Tokens repetidos entre trechos consecutivos (padrão: {DEFAULT_OVERLAP})",
+    )
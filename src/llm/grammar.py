@@ -0,0 +1,107 @@
+"""Geração das gramáticas GBNF usadas na decodificação restrita do llama.cpp.
+
+A gramática original (`grammars/glasses.gbnf`) obriga o modelo a escrever as 73 chaves de óxidos em ordem fixa para
+cada vidro, mesmo quando ele tem cinco componentes, e só aceita um vidro por resposta. Aqui a composição é esparsa:
+uma lista de pares `"óxido": número`, só com os óxidos presentes, e a raiz é uma lista de vidros. A gramática pode
+ainda ser restrita, por documento, aos compostos que o `CompoundMatcher` encontrou no texto.
+
+Compilar a gramática no llama.cpp é caro, então as gramáticas compiladas ficam em cache por conjunto de compostos. O
+`llama_cpp` (e a biblioteca nativa dele) só é importado na primeira compilação.
+
+    python -m src.llm.grammar                  # grava grammars/glasslist.gbnf com os compostos de properties.json
+"""
+
+import argparse
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+
+from src.data.compounds import get_matcher, load_properties
+
+GRAMMAR_PATH = Path("grammars/glasslist.gbnf")
+LEGACY_GRAMMAR_PATH = Path("grammars/glasses.gbnf")
+
+# Uma regra por linha; a de `Glass` é dividida em duas partes só para caber na largura de linha
+_COMMON_RULES = "\n".join(
+    [
+        r'Glasslist ::= "[]" | "["   ws   Glass   (","   ws   Glass)*   ws   "]"',
+        r'Glass ::= "{"   ws   "\"name\":"   ws   string   ","   ws   "\"composition\":"   ws   Composition   '
+        r'","   ws   "\"properties\":"   ws   Properties   ws   "}"',
+        r'Composition ::= "{"   ws   Component   (","   ws   Component)*   ws   "}"',
+        r'Component ::= Compound   ":"   ws   number',
+        r'Properties ::= "{}" | "{"   ws   "\"optical\":"   ws   OpticalProperties   ws   "}"',
+        r'OpticalProperties ::= "{"   ws   "\"refractiveIndex\":"   ws   number   "}"',
+        r'string ::= "\""   ([^"]*)   "\""',
+        r"ws ::= [ \t\n]*",
+        r'number ::= [0-9]+   "."?   [0-9]*',
+        "",
+    ]
+)
+
+
+def default_compounds():
+    """Compostos da gramática completa: os `desired_compounds` do `properties.json`, como na gramática original."""
+    return tuple(load_properties()["desired_compounds"])
+
+
+def narrow_compounds(text, matcher=None):
+    """Compostos citados no texto, na ordem de `default_compounds` e depois na de `all_compounds`.
+
+    Retorna None quando nenhum composto é encontrado, para que se use a gramática completa.
+    """
+    found = (matcher or get_matcher()).matched(text)
+    if not found:
+        return None
+    order = list(default_compounds()) + load_properties()["all_compounds"]
+    return tuple(sorted(found, key=lambda compound: order.index(compound) if compound in order else len(order)))
+
+
+@lru_cache(maxsize=256)
+def grammar_text(compounds=None):
+    """Texto GBNF com raiz `Glasslist` e composição esparsa restrita a `compounds` (padrão: gramática completa)."""
+    compounds = compounds or default_compounds()
+    alternatives = " | ".join(f'"\\"{compound}\\""' for compound in compounds)
+    return f"root ::= Glasslist\n{_COMMON_RULES}Compound ::= {alternatives}\n"
+
+
+def has_llama_cpp():
+    """Verifica se o llama-cpp-python está instalado, sem importá-lo."""
+    return find_spec("llama_cpp") is not None
+
+
+def parse_grammar(text):
+    """Compila um texto GBNF no llama.cpp."""
+    try:
+        from llama_cpp import LlamaGrammar
+    except ImportError:
+        raise ImportError("llama-cpp-python não está instalado.") from None
+    return LlamaGrammar.from_string(text, verbose=False)
+
+
+@lru_cache(maxsize=128)
+def compile_grammar(compounds=None):
+    """Gramática compilada pelo llama.cpp para o conjunto de compostos (compilada uma única vez por conjunto)."""
+    return parse_grammar(grammar_text(compounds))
+
+
+def minimal_output(n_components, compounds=None, legacy=False):
+    """Menor JSON que a gramática aceita para um vidro com `n_components` óxidos (usado na estimativa de tokens).
+
+    A gramática original exige todos os óxidos, com zero nos ausentes, e não tem nome nem lista.
+    """
+    compounds = compounds or default_compounds()
+    if legacy:
+        values = ", ".join(f'"{c}": {1 if i < n_components else 0}' for i, c in enumerate(compounds))
+        return '{"composition": {' + values + '}, "properties": {"optical": {"refractiveIndex": 1.5}}}'
+    values = ", ".join(f'"{c}": 1' for c in compounds[:n_components])
+    return '[{"name": "1", "composition": {' + values + '}, "properties": {}}]'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera a gramática GBNF esparsa a partir do properties.json.")
+    parser.add_argument("--output", type=Path, default=GRAMMAR_PATH, help=f"Arquivo de saída (padrão: {GRAMMAR_PATH})")
+    args = parser.parse_args()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(grammar_text())
+    print(f"Gramática com {len(default_compounds())} compostos gravada em {args.output}.")
@@ -0,0 +1,148 @@
+"""Cache persistente de respostas do LLM.
+
+A chave de cada entrada é o SHA-256 de (texto de entrada normalizado, hash do template de prompt, modelo,
+parâmetros de amostragem, hash da gramática). Assim, mudar o prompt, o modelo, a temperatura ou a gramática gera
+chaves novas, enquanto tabelas idênticas em patentes diferentes reaproveitam a mesma resposta. As entradas ficam
+em um SQLite e as menos acessadas são removidas quando o total passa de `max_bytes`.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.instrumentation import count
+
+CACHE_PATH = Path("data/cache/llm.sqlite")
+
+
+def normalize_text(value):
+    """Normaliza a entrada: espaços em branco colapsados; dicionários e listas serializados de forma estável."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return re.sub(r"\s+", " ", value).strip()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None
+
+
+def prompt_hash(prompt):
+    """Hash de um template do LangChain (ou de um texto), que muda sempre que o prompt é editado."""
+    return text_hash(prompt if isinstance(prompt, str) else prompt.pretty_repr())
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=512 * 1024**2):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._db.commit()
+        # Total das respostas, somado uma vez aqui e mantido por `put` e `_evict`
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(inputs, prompt, model, params=None, grammar=None):
+        """Chave da entrada a partir do que determina a resposta do modelo."""
+        parts = {
+            "input": text_hash(normalize_text(inputs)),
+            "prompt": prompt_hash(prompt),
+            "model": model,
+            "params": json.dumps(params or {}, sort_keys=True),
+            "grammar": text_hash(grammar),
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Devolve a resposta salva (qualquer valor serializável em JSON) ou None."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                count("llm_cache", result="miss")
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        count("llm_cache", result="hit")
+        return json.loads(row[0])
+
+    def put(self, key, model, value):
+        value = json.dumps(value, ensure_ascii=False)
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", (key, model, value, size, now, now)
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._db.commit()
+
+    def total_bytes(self):
+        """Tamanho das respostas armazenadas."""
+        with self._lock:
+            return self._bytes
+
+    def _evict(self):
+        """Remove as entradas acessadas há mais tempo até o total caber em `max_bytes`."""
+        if self._bytes <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if self._bytes <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = self._bytes
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0.0
+        return (
+            f"Cache do LLM: {self.hits} acertos, {self.misses} faltas ({hit_rate:.0f}% de acerto), "
+            f"{entries} entradas, {size / 1024**2:.1f} MB."
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def add_cache_arguments(parser):
+    """Adiciona ao argparse as opções do cache de respostas do LLM."""
+    parser.add_argument(
+        "--llm_cache", type=Path, default=CACHE_PATH, help=f"Arquivo do cache de respostas (padrão: {CACHE_PATH})"
+    )
+    parser.add_argument(
+        "--llm_cache_max_mb", type=int, default=512, help="Tamanho máximo do cache de respostas em MB (padrão: 512)"
+    )
+    parser.add_argument("--no_llm_cache", action="store_true", help="Não consulta nem grava o cache de respostas")
+
+
+def cache_from_args(args):
+    return None if args.no_llm_cache else LLMCache(args.llm_cache, max_bytes=args.llm_cache_max_mb * 1024**2)
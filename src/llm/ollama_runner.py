@@ -0,0 +1,109 @@
+"""Execução concorrente de prompts contra um servidor Ollama.
+
+Um único cliente `ChatOllama` é reaproveitado por todas as chamadas, e os pedidos são enviados de forma assíncrona
+mantendo até `max_concurrency` requisições em andamento, com novas tentativas e backoff exponencial com jitter.
+Com um `LLMCache`, respostas já obtidas para a mesma entrada, prompt, modelo e parâmetros não são pedidas de novo.
+Cada requisição é um intervalo `llm.request`, e os tokens e tempos de avaliação do prompt e de geração informados
+pelo Ollama vão para os contadores da instrumentação.
+"""
+
+import asyncio
+
+from src.instrumentation import count, span
+
+DEFAULT_MODEL = "llama3.1"
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+def record_usage(message, model):
+    """Soma aos contadores os tokens e tempos (em ns no Ollama) de uma resposta."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    count("llm_prompt_tokens", metadata.get("prompt_eval_count") or 0, model=model)
+    count("llm_completion_tokens", metadata.get("eval_count") or 0, model=model)
+    count("llm_prompt_eval_seconds", (metadata.get("prompt_eval_duration") or 0) / 1e9, model=model)
+    count("llm_generation_seconds", (metadata.get("eval_duration") or 0) / 1e9, model=model)
+    count("llm_load_seconds", (metadata.get("load_duration") or 0) / 1e9, model=model)
+
+
+class OllamaRunner:
+    def __init__(
+        self,
+        prompt,
+        model=DEFAULT_MODEL,
+        base_url=DEFAULT_BASE_URL,
+        max_concurrency=4,
+        max_retries=3,
+        cache=None,
+        **llm_kwargs,
+    ):
+        # Importado só aqui: langchain_ollama (com langsmith e httpx) leva mais de um segundo para carregar
+        from langchain_ollama import ChatOllama
+
+        self.llm = ChatOllama(model=model, base_url=base_url, **llm_kwargs)
+        self.chain = (prompt | self.llm).with_retry(stop_after_attempt=max_retries, wait_exponential_jitter=True)
+        self.max_concurrency = max_concurrency
+        self.prompt = prompt
+        self.model = model
+        self.params = llm_kwargs
+        self.cache = cache
+
+    def cache_key(self, inputs):
+        return self.cache.make_key(inputs, self.prompt, self.model, self.params)
+
+    def invoke(self, inputs):
+        key = self.cache_key(inputs) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with span("llm.request", model=self.model):
+            message = self.chain.invoke(inputs)
+        record_usage(message, self.model)
+        content = message.content
+        if key is not None:
+            self.cache.put(key, self.model, content)
+        return content
+
+    async def _run(self, inputs, callback):
+        # `abatch_as_completed` não passa pelas novas tentativas de `with_retry`, por isso cada pedido usa `ainvoke`
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(idx, item):
+            key = self.cache_key(item) if self.cache is not None else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return idx, cached
+
+            async with semaphore:
+                try:
+                    with span("llm.request", model=self.model):
+                        message = await self.chain.ainvoke(item)
+                except Exception as e:
+                    return idx, e
+            record_usage(message, self.model)
+            content = message.content
+
+            if key is not None:
+                self.cache.put(key, self.model, content)
+            return idx, content
+
+        for task in asyncio.as_completed([run_one(idx, item) for idx, item in enumerate(inputs)]):
+            callback(*await task)
+
+    def run(self, inputs, callback):
+        """Executa todos os `inputs` e chama `callback(índice, conteúdo ou exceção)` à medida que terminam."""
+        asyncio.run(self._run(list(inputs), callback))
+        if self.cache is not None:
+            print(self.cache.stats())
+
+
+def add_ollama_arguments(parser):
+    """Adiciona ao argparse as opções comuns de execução no Ollama."""
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help=f"Modelo do Ollama (padrão: {DEFAULT_MODEL})")
+    parser.add_argument(
+        "--base_url", type=str, default=DEFAULT_BASE_URL, help=f"URL do servidor Ollama (padrão: {DEFAULT_BASE_URL})"
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Requisições simultâneas ao Ollama (padrão: 4)")
+    parser.add_argument("--retries", type=int, default=3, help="Tentativas por requisição (padrão: 3)")
@@ -1,72 +1,341 @@
-import json
+"""Extração de composições com llama.cpp em um processo de longa duração.
+
+O modelo GGUF é carregado uma única vez e cada gramática é compilada uma única vez por conjunto de compostos. No
+modo `serve` o processo fica escutando em um socket local e atende pedidos de extração até ser encerrado; no modo
+`extract` um cliente envia todos os documentos de `data/patents` para o servidor; no modo `local` o corpus é
+processado no mesmo processo, sem servidor.
+"""
+
+import argparse
 import multiprocessing
+import time
+from functools import lru_cache
+from multiprocessing.connection import Client, Listener
 from pathlib import Path
 
-from langchain_community.chat_models import ChatLlamaCpp
-from langchain_core.prompts import ChatPromptTemplate
+from src.data.patent_store import get_store
+from src.instrumentation import add_instrumentation_arguments, count, instrumentation_from_args, span
+from src.llm.chunking import (
+    DEFAULT_OVERLAP,
+    add_chunk_arguments,
+    document_chunks,
+    merge_compositions,
+)
+from src.llm.grammar import LEGACY_GRAMMAR_PATH, compile_grammar, grammar_text, narrow_compounds, parse_grammar
+from src.llm.llm_cache import add_cache_arguments, cache_from_args
 
-grammar_path = "grammars/glasses.gbnf"
+local_model = "models/Hermes-2-Pro-Llama-3-8B-Q8_0.gguf"
 
-with open(grammar_path, "r") as file:
-    grammar = file.read()
+# Nome das saídas deste executor no banco de patentes
+RUNNER = "cppllama"
 
-json_directory = Path("data/patents")
-# Iterar por todos os arquivos JSON no diretório
-for json_file in json_directory.glob("*.json"):
-    with open(json_file, "r", encoding="utf-8") as f:
-        # Ler o conteúdo do arquivo JSON
-        data = json.load(f)
-        data = data["claims"]
-        # Adicionar o conteúdo à lista
+ADDRESS = ("localhost", 6010)
+AUTHKEY = b"llm-glass"
 
-        break
+# Trechos maiores que no Ollama, já que o contexto aqui é de 10000 tokens
+CHUNK_TOKENS = 4000
 
-local_model = "models/Hermes-2-Pro-Llama-3-8B-Q8_0.gguf"
+# O documento fica no fim do prompt: tudo antes dele é fixo e forma o prefixo que o llama.cpp mantém no contexto
+PROMPT_MESSAGES = [
+    (
+        "system",
+        "You are a knowledgeable assistant. Your task is to analyze the provided document "
+        "related to glass compositions. Extract the chemical composition of each glass described, "
+        "including the percentage of each chemical element and any relevant properties, and organize "
+        "the information in a structured JSON format.",
+    ),
+    (
+        "human",
+        "{input}\n\nBelow is the document content:\n\n----\n\n{document}.",
+    ),
+]
 
-llm = ChatLlamaCpp(
-    temperature=0.8,
-    model_path=local_model,
-    n_ctx=10000,
-    # n_gpu_layers=8,
-    # n_batch=10,  # Should be between 1 and n_ctx, consider the amount of VRAM in your GPU.
-    # max_tokens=10000,
-    n_threads=multiprocessing.cpu_count() - 2,
-    # repeat_penalty=1.5,
-    # top_p=0.5,
-    verbose=True,
-    grammar=grammar,
-)
+
+@lru_cache(maxsize=None)
+def get_prompt():
+    # langchain_core (com langsmith e pydantic) só é carregado quando o prompt é usado
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages(PROMPT_MESSAGES)
 
 
-prompt = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            "You are a knowledgeable assistant. Your task is to analyze the provided document "
-            "related to glass compositions. Extract the chemical composition of each glass described, "
-            "including the percentage of each chemical element and any relevant properties, and organize "
-            "the information in a structured JSON format. "
-            "Below is the document content:\n\n----\n\n{document}.",
-        ),
-        (
-            "human",
-            "{input}",
-        ),
-    ]
+INSTRUCTION = (
+    "List the chemical compositions of the glass mentioned in the document, along with any relevant properties."
 )
 
 
-chain = prompt | llm
+def load_llm(model_path=local_model, n_ctx=10000):
+    """Carrega o modelo (operação cara, feita uma única vez por processo); a gramática é passada a cada extração."""
+    # Importado só aqui, para que `--help`, o modo `extract` e `shutdown` não carreguem llama.cpp
+    from langchain_community.chat_models import ChatLlamaCpp
+
+    return ChatLlamaCpp(
+        temperature=0.8,
+        model_path=model_path,
+        n_ctx=n_ctx,
+        # n_gpu_layers=8,
+        # n_batch=10,  # Should be between 1 and n_ctx, consider the amount of VRAM in your GPU.
+        # max_tokens=10000,
+        n_threads=multiprocessing.cpu_count() - 2,
+        # repeat_penalty=1.5,
+        # top_p=0.5,
+        verbose=False,
+    )
+
+
+def common_prefix(a, b):
+    """Número de tokens iniciais iguais em duas sequências."""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class Extractor:
+    """Mantém o modelo carregado e executa extrações medindo latência e tokens gerados por segundo.
+
+    Sem `grammar_file`, usa a gramática esparsa gerada de `properties.json`, restrita (com `narrow`) aos compostos
+    citados em cada documento; as gramáticas compiladas ficam em cache entre as chamadas.
+    """
+
+    def __init__(self, llm, cache=None, grammar_file=None, narrow=True, prefix_cache=True):
+        self.llm = llm
+        self.cache = cache
+        self.prefix_cache = prefix_cache
+        self.model_id = Path(llm.model_path).name
+        self.params = {"temperature": llm.temperature, "n_ctx": llm.n_ctx}
+        self.narrow = narrow and grammar_file is None
+        self.fixed_grammar = None
+        if grammar_file is not None:
+            text = Path(grammar_file).read_text()
+            self.fixed_grammar = (text, parse_grammar(text))
+
+    def grammar_for(self, document):
+        """(texto, gramática compilada) a usar para o documento."""
+        if self.fixed_grammar is not None:
+            return self.fixed_grammar
+        compounds = narrow_compounds(document) if self.narrow else None
+        return grammar_text(compounds), compile_grammar(compounds)
+
+    def extract(self, document):
+        text, grammar = self.grammar_for(document)
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(document, get_prompt(), self.model_id, self.params, text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {**cached, "latency": 0.0, "tokens_per_second": 0.0, "cached": True}
+
+        # O `generate` do llama.cpp já reaproveita o maior prefixo em comum entre o contexto e o novo prompt (o
+        # prefixo fixo das instruções, de um documento para o outro); `reset` esvazia o contexto para medir sem ele
+        client = self.llm.client
+        if not self.prefix_cache:
+            client.reset()
+        before = list(client._input_ids)
+
+        # Com streaming, o tempo até o primeiro trecho é a avaliação do prompt e o restante é a geração
+        chain = get_prompt() | self.llm.bind(grammar=grammar)
+        parts = []
+        first_token = None
+        with span("llm.extract", runner=RUNNER) as attrs:
+            start = time.perf_counter()
+            for chunk in chain.stream({"document": document, "input": INSTRUCTION}):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(chunk.content)
+            latency = time.perf_counter() - start
+        content = "".join(parts)
+        first_token = latency if first_token is None else first_token
+
+        # Tokens do prompt que o llama.cpp não precisou avaliar por já estarem no contexto
+        after = list(client._input_ids)
+        completion_tokens = len(client.tokenize(content.encode("utf-8"), add_bos=False))
+        prompt_tokens = max(len(after) - completion_tokens, 0)
+        reused_tokens = min(common_prefix(before, after), prompt_tokens)
+        attrs.update(prompt_tokens=prompt_tokens, reused_tokens=reused_tokens, completion_tokens=completion_tokens)
+        count("llm_prompt_tokens", prompt_tokens, model=self.model_id)
+        count("llm_reused_prompt_tokens", reused_tokens, model=self.model_id)
+        count("llm_completion_tokens", completion_tokens, model=self.model_id)
+        count("llm_prompt_eval_seconds", first_token, model=self.model_id)
+        count("llm_generation_seconds", latency - first_token, model=self.model_id)
 
-ai_msg = chain.invoke(
-    {
-        "document": data,  # passa o pedaço do documento
-        "input": (
-            "List the chemical compositions of the glass mentioned in the document, "
-            "along with any relevant properties."
-        ),
+        if key is not None:
+            self.cache.put(key, self.model_id, {"output": content, "completion_tokens": completion_tokens})
+        return {
+            "output": content,
+            "latency": latency,
+            "prompt_eval_latency": first_token,
+            "completion_tokens": completion_tokens,
+            "tokens_per_second": completion_tokens / latency if latency > 0 else 0.0,
+            "prompt_tokens": prompt_tokens,
+            "reused_tokens": reused_tokens,
+            "cached": False,
+        }
+
+
+def serve(extractor, address=ADDRESS, authkey=AUTHKEY):
+    """Atende pedidos {"id", "document"} em um socket local até receber {"command": "shutdown"}.
+
+    Um pedido que falha é respondido com {"id", "error"}, e o servidor continua atendendo os seguintes.
+    """
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Servidor de extração pronto em {address[0]}:{address[1]}.")
+        while True:
+            with listener.accept() as conn:
+                while True:
+                    try:
+                        request = conn.recv()
+                    except EOFError:
+                        break
+                    if request.get("command") == "shutdown":
+                        print("Servidor encerrado.")
+                        return
+                    try:
+                        result = extractor.extract(request["document"])
+                    except Exception as e:
+                        print(f"Erro ao processar {request.get('id')}: {e}")
+                        result = {"error": f"{type(e).__name__}: {e}"}
+                    result["id"] = request.get("id")
+                    conn.send(result)
+
+
+def iter_documents(force=False):
+    """Lista (id, registro) de cada patente ainda sem saída deste executor no banco (ou de todas, com `force`)."""
+    for patent_id, data in get_store().iter_patents(without_output=None if force else RUNNER):
+        if data.get("claims") or data.get("description_html") or data.get("tables_text"):
+            yield patent_id, data
+
+
+def save_result(doc_id, result):
+    get_store().put_output(doc_id, RUNNER, result)
+    print(
+        f"{doc_id}: {result['chunks']['chunks']} trechos ({result['chunks']['kept_tokens']} de "
+        f"{result['chunks']['tokens']} tokens), "
+        f"{result['latency']:.2f}s, {result['completion_tokens']} tokens, {result['tokens_per_second']:.1f} tokens/s, "
+        f"prompt {result['prompt_tokens']} tokens ({result['reused_tokens']} reaproveitados do contexto)"
+    )
+
+
+def merge_results(partials, stats):
+    """Junta os resultados dos trechos de uma patente em um único resultado."""
+    latency = sum(partial["latency"] for partial in partials)
+    completion_tokens = sum(partial["completion_tokens"] for partial in partials)
+    return {
+        "output": merge_compositions([partial["output"] for partial in partials]),
+        "latency": latency,
+        "prompt_eval_latency": sum(partial.get("prompt_eval_latency", 0.0) for partial in partials),
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": completion_tokens / latency if latency > 0 else 0.0,
+        "prompt_tokens": sum(partial.get("prompt_tokens", 0) for partial in partials),
+        "reused_tokens": sum(partial.get("reused_tokens", 0) for partial in partials),
+        "chunks": stats,
     }
-)
-print(ai_msg.content)
 
-breakpoint()
+
+def report(results, elapsed, full_tokens, kept_tokens):
+    print(f"Tokens de documento: {kept_tokens} enviados ao modelo, de {full_tokens} no total.")
+    cached = sum(result.get("cached", False) for result in results)
+    generated = [result for result in results if not result.get("cached", False)]
+    if not generated:
+        print(f"Nenhum trecho gerado pelo modelo ({cached} vindos do cache).")
+        return
+    tokens = sum(result["completion_tokens"] for result in generated)
+    latencies = sorted(result["latency"] for result in generated)
+    prompt_eval = sum(result.get("prompt_eval_latency", 0.0) for result in generated)
+    generation = sum(latencies) - prompt_eval
+    print(
+        f"{len(generated)} trechos gerados em {elapsed:.1f}s ({cached} vindos do cache): "
+        f"latência média {sum(latencies) / len(latencies):.2f}s, mediana {latencies[len(latencies) // 2]:.2f}s, "
+        f"{prompt_eval:.1f}s avaliando prompts e {generation:.1f}s gerando "
+        f"({tokens / generation if generation > 0 else 0.0:.1f} tokens/s)."
+    )
+    prompt_tokens = sum(result["prompt_tokens"] for result in generated)
+    reused_tokens = sum(result["reused_tokens"] for result in generated)
+    if prompt_tokens:
+        print(
+            f"Prompt: {prompt_tokens} tokens, {reused_tokens} ({reused_tokens / prompt_tokens:.0%}) reaproveitados "
+            f"do contexto e {prompt_tokens - reused_tokens} avaliados."
+        )
+
+
+def run_corpus(extract, force=False, max_tokens=CHUNK_TOKENS, overlap=DEFAULT_OVERLAP):
+    """Processa todos os documentos pendentes, trecho a trecho, com a função `extract(doc_id, trecho)`."""
+    results = []
+    full_tokens = kept_tokens = 0
+    start = time.perf_counter()
+    for doc_id, record in iter_documents(force):
+        chunks, stats = document_chunks(record, max_tokens, overlap)
+        full_tokens += stats["tokens"]
+        kept_tokens += stats["kept_tokens"]
+
+        try:
+            partials = [extract(doc_id, chunk["text"]) for chunk in chunks]
+        except Exception as e:
+            # A patente fica sem saída e é refeita na próxima execução
+            print(f"Erro ao processar {doc_id}: {e}")
+            continue
+        save_result(doc_id, merge_results(partials, stats))
+        results.extend(partials)
+    report(results, time.perf_counter() - start, full_tokens, kept_tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai composições de vidros das patentes com llama.cpp.")
+    parser.add_argument("mode", choices=["serve", "extract", "local", "shutdown"], help="Modo de execução")
+    parser.add_argument("--model", type=str, default=local_model, help=f"Modelo GGUF (padrão: {local_model})")
+    parser.add_argument(
+        "--grammar",
+        type=str,
+        default=None,
+        help=f"Arquivo GBNF fixo, ex.: {LEGACY_GRAMMAR_PATH} (padrão: gramática esparsa gerada de properties.json)",
+    )
+    parser.add_argument(
+        "--no_prefix_cache",
+        action="store_true",
+        help="Avalia o prompt inteiro a cada documento, sem reaproveitar o prefixo já no contexto",
+    )
+    parser.add_argument(
+        "--no_narrow", action="store_true", help="Não restringe a gramática aos compostos citados em cada documento"
+    )
+    parser.add_argument("--n_ctx", type=int, default=10000, help="Tamanho do contexto (padrão: 10000)")
+    parser.add_argument("--port", type=int, default=ADDRESS[1], help=f"Porta do servidor local (padrão: {ADDRESS[1]})")
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocessa documentos que já têm saída (respostas em cache são reusadas)"
+    )
+    add_cache_arguments(parser)
+    add_chunk_arguments(parser, CHUNK_TOKENS)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
+
+    address = (ADDRESS[0], args.port)
+
+    if args.mode in ("serve", "local"):
+        cache = cache_from_args(args)
+        extractor = Extractor(
+            load_llm(args.model, args.n_ctx), cache, args.grammar, not args.no_narrow, not args.no_prefix_cache
+        )
+        if args.mode == "serve":
+            serve(extractor, address)
+        else:
+            run_corpus(
+                lambda doc_id, document: extractor.extract(document), args.force, args.chunk_tokens, args.chunk_overlap
+            )
+        if cache is not None:
+            print(cache.stats())
+    else:
+        with Client(address, authkey=AUTHKEY) as conn:
+            if args.mode == "shutdown":
+                conn.send({"command": "shutdown"})
+            else:
+
+                def remote_extract(doc_id, document):
+                    conn.send({"id": doc_id, "document": document})
+                    result = conn.recv()
+                    if "error" in result:
+                        raise RuntimeError(result["error"])
+                    return result
+
+                run_corpus(remote_extract, args.force, args.chunk_tokens, args.chunk_overlap)
@@ -1,128 +1,186 @@
+import argparse
 import json
-from pathlib import Path
-
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import ChatOllama
-
-
-def run_llm(data):
-    # Define o prompt template
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are a knowledgeable assistant. Given the following document related to glass compositions, "
-                "your task is to extract the chemical composition of each glass mentioned, "
-                "detailing the percentage of each element using their chemical symbols (e.g., Si for Silicon, O for Oxygen), "
-                "and listing the key properties associated with each glass. "
-                "Return the information in the following structured JSON format:\n\n"
-                "{{\n"
-                "  'glass1': {{\n"
-                "    'name': 'Glass Name',\n"
-                "    'composition': {{\n"
-                "      'Element 1': 'percentage',\n"
-                "      'Element 2': 'percentage',\n"
-                "      ...\n"
-                "    }},\n"
-                "    'properties': [\n"
-                "      'Property 1',\n"
-                "      'Property 2'\n"
-                "    ]\n"
-                "  }},\n"
-                "  'glass2': {{\n"
-                "    'name': 'Glass Name',\n"
-                "    'composition': {{\n"
-                "      'Element 1': 'percentage',\n"
-                "      'Element 2': 'percentage',\n"
-                "      ...\n"
-                "    }},\n"
-                "    'properties': [\n"
-                "      'Property 1',\n"
-                "      'Property 2'\n"
-                "    ]\n"
-                "  }}\n"
-                "}}\n\n"
-                "If no relevant information is found for a glass, respond with 'there is no information'."
-                "Here are the contents of the document:\n\n----\n\n{document}.",
-            ),
-            ("human", "{input}"),
-        ]
-    )
+from functools import lru_cache
+
+from src.data.patent_store import get_store
+from src.instrumentation import add_instrumentation_arguments, instrumentation_from_args
+from src.llm.chunking import add_chunk_arguments, approx_token_count, document_chunks, merge_compositions
+from src.llm.llm_cache import add_cache_arguments, cache_from_args
+from src.llm.ollama_runner import DEFAULT_BASE_URL, DEFAULT_MODEL, OllamaRunner, add_ollama_arguments
+
+# Mensagens do prompt (o template é construído uma única vez, no primeiro uso). O documento fica no fim, para que as
+# instruções formem um prefixo fixo que o servidor reaproveita do cache de KV entre documentos
+PROMPT_MESSAGES = [
+    (
+        "system",
+        "You are a knowledgeable assistant. Given the following document related to glass compositions, "
+        "your task is to extract the chemical composition of each glass mentioned, "
+        "detailing the percentage of each element using their chemical symbols (e.g., Si for Silicon, O for Oxygen), "
+        "and listing the key properties associated with each glass. "
+        "Return the information in the following structured JSON format:\n\n"
+        "{{\n"
+        "  'glass1': {{\n"
+        "    'name': 'Glass Name',\n"
+        "    'composition': {{\n"
+        "      'Element 1': 'percentage',\n"
+        "      'Element 2': 'percentage',\n"
+        "      ...\n"
+        "    }},\n"
+        "    'properties': [\n"
+        "      'Property 1',\n"
+        "      'Property 2'\n"
+        "    ]\n"
+        "  }},\n"
+        "  'glass2': {{\n"
+        "    'name': 'Glass Name',\n"
+        "    'composition': {{\n"
+        "      'Element 1': 'percentage',\n"
+        "      'Element 2': 'percentage',\n"
+        "      ...\n"
+        "    }},\n"
+        "    'properties': [\n"
+        "      'Property 1',\n"
+        "      'Property 2'\n"
+        "    ]\n"
+        "  }}\n"
+        "}}\n\n"
+        "If no relevant information is found for a glass, respond with 'there is no information'.",
+    ),
+    ("human", "{input}\n\nHere are the contents of the document:\n\n----\n\n{document}."),
+]
+
+
+@lru_cache(maxsize=None)
+def get_prompt():
+    # langchain_core (com langsmith e pydantic) só é carregado quando o prompt é usado
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages(PROMPT_MESSAGES)
+
 
+INSTRUCTION = (
+    "Respond in JSON format. For each glass mentioned in the document, list the glass name followed by "
+    "its chemical composition, with each element and its percentage on separate lines, "
+    "formatted as:\n\n"
+    "{{\n"
+    "  'glass1': {{\n"
+    "    'name': 'Glass Name',\n"
+    "    'composition': {{\n"
+    "      'Element 1': 'percentage',\n"
+    "      'Element 2': 'percentage',\n"
+    "      ...\n"
+    "    }},\n"
+    "    'properties': [\n"
+    "      'Property 1',\n"
+    "      'Property 2'\n"
+    "    ]\n"
+    "  }},\n"
+    "  'glass2': {{\n"
+    "    'name': 'Glass Name',\n"
+    "    'composition': {{\n"
+    "      'Element 1': 'percentage',\n"
+    "      'Element 2': 'percentage',\n"
+    "      ...\n"
+    "    }},\n"
+    "    'properties': [\n"
+    "      'Property 1',\n"
+    "      'Property 2'\n"
+    "    ]\n"
+    "  }}\n"
+    "}}\n\n"
+    "If there is no information about a specific glass, return 'there is no information'."
+)
+
+# Nome das saídas deste executor no banco de patentes
+RUNNER = "llama"
+
+
+def make_runner(model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, max_concurrency=4, max_retries=3, cache=None):
     # Ajustar o tamanho da janela de contexto
-    llm = ChatOllama(model="llama3.1", temperature=0.8, format="json", context_window_size=4096)
-
-    # Combine o prompt com a LLM
-    chain = prompt | llm
-
-    ai_msg = chain.invoke(
-        {
-            "document": data,  # Pass the document chunk
-            "input": (
-                "Respond in JSON format. For each glass mentioned in the document, list the glass name followed by "
-                "its chemical composition, with each element and its percentage on separate lines, "
-                "formatted as:\n\n"
-                "{{\n"
-                "  'glass1': {{\n"
-                "    'name': 'Glass Name',\n"
-                "    'composition': {{\n"
-                "      'Element 1': 'percentage',\n"
-                "      'Element 2': 'percentage',\n"
-                "      ...\n"
-                "    }},\n"
-                "    'properties': [\n"
-                "      'Property 1',\n"
-                "      'Property 2'\n"
-                "    ]\n"
-                "  }},\n"
-                "  'glass2': {{\n"
-                "    'name': 'Glass Name',\n"
-                "    'composition': {{\n"
-                "      'Element 1': 'percentage',\n"
-                "      'Element 2': 'percentage',\n"
-                "      ...\n"
-                "    }},\n"
-                "    'properties': [\n"
-                "      'Property 1',\n"
-                "      'Property 2'\n"
-                "    ]\n"
-                "  }}\n"
-                "}}\n\n"
-                "If there is no information about a specific glass, return 'there is no information'."
-            ),
-        }
+    return OllamaRunner(
+        get_prompt(),
+        model=model,
+        base_url=base_url,
+        max_concurrency=max_concurrency,
+        max_retries=max_retries,
+        cache=cache,
+        temperature=0.8,
+        format="json",
+        num_ctx=4096,
     )
 
-    return ai_msg.content
 
+def run_llm(data, runner=None):
+    runner = runner or make_runner()
+    return runner.invoke({"document": data, "input": INSTRUCTION})
 
-# Directory paths
-json_directory = Path("data/patents")
-output_directory = Path("data/llm_output")
-output_directory.mkdir(parents=True, exist_ok=True)
 
-# Iterar por todos os arquivos JSON no diretório
-for json_file in json_directory.glob("*.json"):
-    output_file = output_directory / f"{json_file.stem}.txt"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai composições de vidros dos documentos com o Ollama.")
+    add_ollama_arguments(parser)
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocessa documentos que já têm saída (respostas em cache são reusadas)"
+    )
+    add_cache_arguments(parser)
+    add_chunk_arguments(parser)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
 
-    # Verificar se o arquivo de saída já existe
-    if not output_file.exists():
-        with open(json_file, "r", encoding="utf-8") as f:
-            # Ler o conteúdo do arquivo JSON
-            data = json.load(f)
+    store = get_store()
 
-            # Rodar o modelo LLM se a key "llm_output" não existir
-            if "llm_output" not in data:
-                # Chamar o LLM e obter a saída
-                llm_output = run_llm(data)
+    # Documentos ainda sem saída, divididos em trechos; os trechos de todas as patentes vão no mesmo lote, e `owners`
+    # guarda a patente e a posição de cada trecho no documento
+    patents = []
+    inputs = []
+    owners = []
+    full_tokens = kept_tokens = 0
+    for patent_id, data in store.iter_patents(without_output=None if args.force else RUNNER):
+        chunks, stats = document_chunks(data, args.chunk_tokens, args.chunk_overlap)
+        full_tokens += approx_token_count(json.dumps(data))
+        kept_tokens += stats["kept_tokens"]
+        patents.append(
+            {
+                "patent_id": patent_id,
+                "stats": stats,
+                "partials": [None] * len(chunks),
+                "pending": len(chunks),
+                "failed": False,
+            }
+        )
+        for chunk_idx, chunk in enumerate(chunks):
+            inputs.append({"document": chunk["text"], "input": INSTRUCTION})
+            owners.append((len(patents) - 1, chunk_idx))
 
-                # Adicionar a saída ao JSON
-                data["llm_output"] = llm_output
+    def save_patent(patent):
+        # Junta as composições parciais na ordem dos trechos no documento (não na ordem em que terminaram, para que
+        # a numeração glass1, glass2... não mude entre execuções) e salva a saída da patente no banco
+        output = {"llm_output": merge_compositions(patent["partials"]), "llm_chunks": patent["stats"]}
+        store.put_output(patent["patent_id"], RUNNER, output)
+        print(f"LLM output saved for {patent['patent_id']}.")
 
-                # Salvar a saída em um novo arquivo de texto na pasta de output
-                with open(output_file, "w", encoding="utf-8") as out_f:
-                    out_f.write(json.dumps(data, indent=4))
+    def save_output(idx, llm_output):
+        patent_idx, chunk_idx = owners[idx]
+        patent = patents[patent_idx]
+        if isinstance(llm_output, Exception):
+            print(f"Erro ao processar {patent['patent_id']}: {llm_output}")
+            patent["failed"] = True
+        else:
+            patent["partials"][chunk_idx] = llm_output
+        patent["pending"] -= 1
 
-                print(f"LLM output saved for {json_file.name}.")
-    else:
-        print(f"Output for {json_file.name} already exists.")
+        # Salva a patente quando todos os seus trechos terminaram (sem falhas, para que seja refeita depois)
+        if patent["pending"] == 0 and not patent["failed"]:
+            save_patent(patent)
+
+    # Patentes sem nenhum trecho relevante não precisam do modelo
+    for patent in patents:
+        if patent["pending"] == 0:
+            save_patent(patent)
+
+    print(
+        f"{len(inputs)} trechos de {len(patents)} patentes: {kept_tokens} tokens enviados ao modelo "
+        f"(o documento inteiro teria {full_tokens})."
+    )
+    runner = make_runner(args.model, args.base_url, args.concurrency, args.retries, cache_from_args(args))
+    runner.run(inputs, save_output)
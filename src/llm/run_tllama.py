@@ -1,72 +1,161 @@
-import json
-from pathlib import Path
+import argparse
+from functools import lru_cache
 
-from bs4 import BeautifulSoup
-from langchain.prompts import PromptTemplate
-from langchain_ollama import ChatOllama
+from src.data.composition_tables import compositions_to_csv, interpret_table
+from src.data.dedup import add_dedup_arguments, canonical_table_result, dedup_from_args
+from src.data.patent_store import get_store
+from src.instrumentation import add_instrumentation_arguments, instrumentation_from_args
+from src.llm.llm_cache import add_cache_arguments, cache_from_args
+from src.llm.ollama_runner import DEFAULT_BASE_URL, DEFAULT_MODEL, OllamaRunner, add_ollama_arguments
 
+# Template de prompt para o modelo Ollama
+TABLE_TEMPLATE = """
+    I will provide you with an HTML table. Your task is to extract all data as a csv. \
+Do not return any extra text, only the csv table.
+
+    Table content:
+    {table_text}
+    """
+
+
+@lru_cache(maxsize=None)
+def get_prompt():
+    # langchain_core (com langsmith e pydantic) só é carregado quando o prompt é usado
+    from langchain_core.prompts import PromptTemplate
+
+    return PromptTemplate(input_variables=["table_text"], template=TABLE_TEMPLATE)
+
+
+# Nome das saídas deste executor no banco de patentes
+RUNNER = "tllama"
 
-def run_llm(document):
-    # Parse o HTML para extrair o texto da tabela
-    soup = BeautifulSoup(document, "html.parser")
-    table_text = soup.get_text()
 
+def make_runner(model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, max_concurrency=4, max_retries=3, cache=None):
     # Inicialize o modelo Ollama
-    llm = ChatOllama(
-        model="llama3.1",
+    return OllamaRunner(
+        get_prompt(),
+        model=model,
+        base_url=base_url,
+        max_concurrency=max_concurrency,
+        max_retries=max_retries,
+        cache=cache,
         temperature=0.8,
         # format="json",
     )
 
-    # Template de prompt para o modelo Ollama
-    prompt_template = PromptTemplate(
-        input_variables=["table_text"],
-        template="""
-        I will provide you with an HTML table. Your task is to extract all data as a csv. Do not return any extra text, only the csv table.
-
-        Table content:
-        {table_text}
-        """,
-    )
-    # Formata o prompt com o conteúdo da tabela
-    prompt = prompt_template.format(table_text=table_text)
-
-    # Executa o modelo com o prompt
-    response = llm.invoke(prompt)  # Usa invoke para processar o prompt diretamente
-
-    print(response.content)
-    breakpoint()
-    return response.content  # Retorna o conteúdo gerado pelo modelo
 
+def table_input(document):
+    # Parse o HTML para extrair o texto da tabela (bs4 só é carregado quando há tabela para o LLM)
+    from bs4 import BeautifulSoup
 
-# Directory paths
-json_directory = Path("data/patents")
-output_directory = Path("data/llm_output")
-output_directory.mkdir(parents=True, exist_ok=True)
+    soup = BeautifulSoup(document, "html.parser")
+    return {"table_text": soup.get_text()}
 
-# Iterar por todos os arquivos JSON no diretório
-for json_file in json_directory.glob("*.json"):
-    output_file = output_directory / f"{json_file.stem}.txt"
 
-    # Verificar se o arquivo de saída já existe
-    if not output_file.exists():
-        with open(json_file, "r", encoding="utf-8") as f:
-            # Ler o conteúdo do arquivo JSON
-            data = json.load(f)
+def rule_based_output(table):
+    """CSV e composições lidos pelas regras de `composition_tables`, ou None se a tabela precisa ir para o LLM."""
+    parsed = interpret_table(table)
+    if not parsed["confident"]:
+        return None
+    return compositions_to_csv(parsed["compositions"]), {"unit": parsed["unit"], "glasses": parsed["compositions"]}
 
-            # Rodar o modelo LLM se a key "llm_output" não existir
-            if "llm_output" not in data:
-                # Iterar por todas as tabelas no arquivo JSON e passar cada uma para o LLM
-                for tab in data["tables"]:
-                    llm_output = run_llm(tab)  # Passar o HTML da tabela diretamente para o LLM
 
-                    # Adicionar a saída ao JSON
-                    data.setdefault("llm_output", []).append(llm_output)
+def run_llm(document, runner=None):
+    runner = runner or make_runner()
+    return runner.invoke(table_input(document))  # Retorna o conteúdo gerado pelo modelo
 
-                # Salvar a saída em um novo arquivo de texto na pasta de output
-                with open(output_file, "w", encoding="utf-8") as out_f:
-                    out_f.write(json.dumps(data, indent=4))
 
-                print(f"LLM output saved for {json_file.name}.")
-    else:
-        print(f"Output for {json_file.name} already exists.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converte as tabelas das patentes em CSV com o Ollama.")
+    add_ollama_arguments(parser)
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocessa patentes que já têm saída (respostas em cache são reusadas)"
+    )
+    add_cache_arguments(parser)
+    add_dedup_arguments(parser)
+    parser.add_argument(
+        "--llm_only", action="store_true", help="Envia todas as tabelas ao LLM, sem o interpretador por regras"
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
+
+    store = get_store()
+    dedup = dedup_from_args(args, store)
+
+    # Patentes ainda sem saída, com todas as suas tabelas enviadas juntas no mesmo lote. Tabelas de composição bem
+    # formadas são lidas pelas regras de `composition_tables` e só as demais vão para o LLM. Tabelas iguais a outra
+    # que já tem saída reaproveitam essa saída
+    patents = []
+    inputs = []
+    owners = []
+    routed = {"duplicate": 0, "rules": 0, "llm": 0}
+    for patent_id, data in store.iter_patents(without_output=None if args.force else RUNNER):
+        if not data.get("tables"):
+            continue
+
+        n_tables = len(data["tables"])
+        output = {
+            "llm_output": [None] * n_tables,
+            "table_routes": [None] * n_tables,
+            "table_compositions": [None] * n_tables,
+        }
+        patents.append({"patent_id": patent_id, "output": output, "pending": 0, "failed": False})
+        tables_text = data.get("tables_text") or []
+        for table_idx, tab in enumerate(data["tables"]):
+            text = tables_text[table_idx] if table_idx < len(tables_text) else tab
+            match = dedup.check_table(patent_id, table_idx + 1, text) if dedup is not None else None
+            if match is not None:
+                reuse = canonical_table_result(store, match, RUNNER)
+                if reuse["llm_output"] is not None:
+                    output["llm_output"][table_idx] = reuse["llm_output"]
+                    output["table_compositions"][table_idx] = reuse["compositions"]
+                    output["table_routes"][table_idx] = "duplicate"
+                    routed["duplicate"] += 1
+                    continue
+            if not args.llm_only:
+                rules = rule_based_output(text)
+                if rules is not None:
+                    output["llm_output"][table_idx], output["table_compositions"][table_idx] = rules
+                    output["table_routes"][table_idx] = "rules"
+                    routed["rules"] += 1
+                    continue
+            output["table_routes"][table_idx] = "llm"
+            routed["llm"] += 1
+            patents[-1]["pending"] += 1
+            inputs.append(table_input(tab))
+            owners.append((len(patents) - 1, table_idx))
+
+    def save_patent(patent):
+        store.put_output(patent["patent_id"], RUNNER, patent["output"])
+        print(f"LLM output saved for {patent['patent_id']}.")
+
+    def save_output(idx, llm_output):
+        patent_idx, table_idx = owners[idx]
+        patent = patents[patent_idx]
+        if isinstance(llm_output, Exception):
+            print(f"Erro na tabela {table_idx} de {patent['patent_id']}: {llm_output}")
+            patent["failed"] = True
+        else:
+            patent["output"]["llm_output"][table_idx] = llm_output
+        patent["pending"] -= 1
+
+        # Salva a patente quando todas as suas tabelas terminaram (sem falhas, para que seja refeita depois)
+        if patent["pending"] == 0 and not patent["failed"]:
+            save_patent(patent)
+
+    # Patentes com todas as tabelas lidas pelas regras não precisam esperar o LLM
+    for patent in patents:
+        if patent["pending"] == 0:
+            save_patent(patent)
+
+    n_tables = sum(routed.values())
+    if n_tables:
+        print(
+            f"{n_tables} tabelas: {routed['duplicate']} reaproveitadas de duplicatas "
+            f"({routed['duplicate'] / n_tables:.0%}), {routed['rules']} interpretadas por regras "
+            f"({routed['rules'] / n_tables:.0%}), {routed['llm']} enviadas ao LLM ({routed['llm'] / n_tables:.0%})."
+        )
+
+    runner = make_runner(args.model, args.base_url, args.concurrency, args.retries, cache_from_args(args))
+    runner.run(inputs, save_output)
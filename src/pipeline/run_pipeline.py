@@ -0,0 +1,379 @@
+"""Pipeline completo em um único processo: busca → download → parsing → tabelas → filtro → extração → gravação.
+
+Em vez de rodar `harvest_patents`, `process_table_to_csv`, `run_tllama` e `generate_dataset` um depois do outro,
+cada um esperando o anterior terminar, as etapas rodam ao mesmo tempo ligadas por filas limitadas
+(`src/pipeline/stages.py`):
+
+- `fetch` (threads): baixa as páginas das patentes descobertas pela fronteira de crawl;
+- `parse` (processos): extrai claims, descrição e tabelas do HTML;
+- `split` (thread): divide a patente em uma tarefa por tabela; uma tabela igual a outra já gravada
+  (`src/data/dedup.py`) reaproveita os CSVs e a saída dela e passa direto pelas etapas seguintes;
+- `filter` (processos): descarta as tabelas sem compostos desejados, gera os CSVs das demais e tenta lê-las pelas
+  regras de `composition_tables`;
+- `extract` (threads): envia ao LLM só as tabelas que as regras não leram;
+- `write` (thread): quando todas as tabelas de uma patente terminam, grava registro, tabelas, CSVs e saída do LLM
+  no banco de patentes em uma única transação.
+
+Uma tabela cujo filtro ou extração levanta exceção segue adiante marcada como `failed`: a patente é gravada sem a
+saída do LLM (que fica para uma próxima execução) e marcada como falha na fronteira. Uma falha no parsing, na
+divisão ou na gravação marca a patente como falha na fronteira.
+
+Ao final o dataset é atualizado de forma incremental com os CSVs novos.
+
+    python -m src.pipeline.run_pipeline --keyword "glass composition" --page_max 10
+    python -m src.pipeline.run_pipeline --from_store --no_llm        # reprocessa as patentes já salvas
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from src.data.compounds import COMPOUND_LIST, get_matcher
+from src.data.dedup import add_dedup_arguments, canonical_table_result, dedup_from_args
+from src.data.patent_store import get_store
+from src.data.process_table_to_csv import table_to_csv
+from src.instrumentation import add_instrumentation_arguments, instrumentation_from_args
+from src.llm.llm_cache import add_cache_arguments, cache_from_args
+from src.llm.ollama_runner import DEFAULT_BASE_URL, DEFAULT_MODEL
+from src.llm.run_tllama import RUNNER, make_runner, rule_based_output, table_input
+from src.pipeline.stages import Pipeline, Stage
+from src.scraping.fetch import add_fetch_arguments, extract_patent_id_from_url, fetcher_from_args
+from src.scraping.frontier import add_frontier_arguments, discover, frontier_from_args
+from src.scraping.parsers import default_parser_name, get_parser
+
+# Nome da etapa na fronteira de crawl
+FRONTIER_STAGE = "pipeline"
+
+
+def parse_page(item):
+    """Etapa `parse` (roda em outro processo): página baixada → registro da patente."""
+    url, content, parser_name, metadata = item
+    parsed = get_parser(parser_name).parse_patent_page(content)
+    record = {
+        "url": url,
+        "patent_id": extract_patent_id_from_url(url),
+        "claims": parsed["claims"],
+        "description_html": parsed["description"],
+        "tables": parsed["tables_html"],
+        "tables_text": parsed["tables_text"],
+        "metadata": metadata,
+    }
+    return [record]
+
+
+def filter_table(item):
+    """Etapa `filter` (roda em outro processo): marca a rota da tabela e gera seus CSVs."""
+    if item.get("route") in ("duplicate", "failed"):
+        return [item]
+    text = item["text"] or item["html"]
+    if not get_matcher(item["compound_list"]).contains_any(text):
+        item["route"] = "filtered"
+        return [item]
+
+    item["csv_texts"] = table_to_csv(text)
+    rules = None if item["llm_only"] else rule_based_output(text)
+    if rules is not None:
+        item["route"] = "rules"
+        item["llm_output"], item["compositions"] = rules
+    else:
+        item["route"] = "llm"
+    return [item]
+
+
+class PatentPipeline:
+    """Funções das etapas que dependem do banco, da fronteira e do LLM (rodam em threads deste processo)."""
+
+    def __init__(
+        self, store, frontier=None, fetcher=None, runner=None, parser_name=None, metadata=None, options=None, dedup=None
+    ):
+        self.store = store
+        self.frontier = frontier
+        self.fetcher = fetcher
+        self.runner = runner
+        self.parser_name = parser_name or default_parser_name()
+        self.metadata = metadata or {}
+        self.options = options or {}
+        self.dedup = dedup
+        self.lock = threading.Lock()
+        # Registros e tabelas das patentes ainda com tabelas em andamento, por ID
+        self.pending = {}
+        self.counts = {
+            "patents": 0,
+            "failed_patents": 0,
+            "filtered": 0,
+            "duplicate": 0,
+            "rules": 0,
+            "llm": 0,
+            "llm_errors": 0,
+            "failed": 0,
+        }
+
+    def fetch(self, url):
+        page = self.fetcher.get(url)
+        if page is None:
+            self.frontier.mark_patent(extract_patent_id_from_url(url), FRONTIER_STAGE, "failed", "download falhou")
+            return []
+        metadata = dict(self.metadata, fetched_at=datetime.now(timezone.utc).isoformat())
+        return [(url, page.text, self.parser_name, metadata)]
+
+    def split(self, record):
+        patent_id = record["patent_id"]
+        tables_html = record.get("tables") or []
+        tables_text = record.get("tables_text") or []
+        if not tables_html and not tables_text:
+            self.write_patent(record, [])
+            return []
+
+        n_tables = max(len(tables_html), len(tables_text))
+        if self.dedup is not None:
+            match = self.dedup.check_claims(patent_id, record.get("claims"))
+            if match is not None:
+                record["duplicate_of"] = match.canonical
+        items = [
+            {
+                "patent_id": patent_id,
+                "idx": idx,
+                "n_tables": n_tables,
+                "html": tables_html[idx] if idx < len(tables_html) else "",
+                "text": tables_text[idx] if idx < len(tables_text) else "",
+                "compound_list": self.options.get("compound_list", COMPOUND_LIST),
+                "llm_only": self.options.get("llm_only", False),
+            }
+            for idx in range(n_tables)
+        ]
+        if self.dedup is not None:
+            for item in items:
+                self.reuse_duplicate(item)
+        with self.lock:
+            self.pending[patent_id] = {"record": record, "tables": []}
+        return items
+
+    def patent_failed(self, item, error):
+        """Falha no parsing, na divisão ou na gravação (`on_error`): marca a patente como falha na fronteira."""
+        if isinstance(item, dict):
+            patent_id = item["patent_id"]
+        else:
+            patent_id = extract_patent_id_from_url(item[0] if isinstance(item, tuple) else item)
+        if self.frontier is not None:
+            self.frontier.mark_patent(patent_id, FRONTIER_STAGE, "failed", str(error))
+        with self.lock:
+            self.counts["failed_patents"] += 1
+        return []
+
+    def table_failed(self, item, error):
+        """Falha no filtro ou na extração (`on_error`): a tabela segue marcada como falha até a gravação."""
+        return [dict(item, route="failed", error=f"{type(error).__name__}: {error}")]
+
+    def reuse_duplicate(self, item):
+        """Copia para a tabela os CSVs e a saída da tabela canônica, se ela for uma duplicata já gravada."""
+        match = self.dedup.check_table(item["patent_id"], item["idx"] + 1, item["text"] or item["html"])
+        if match is None:
+            return
+        reuse = canonical_table_result(self.store, match, RUNNER)
+        if reuse["csv_texts"] is not None and reuse["llm_output"] is not None:
+            item.update(
+                route="duplicate",
+                csv_texts=reuse["csv_texts"],
+                llm_output=reuse["llm_output"],
+                compositions=reuse["compositions"],
+                duplicate_of=reuse["duplicate_of"],
+            )
+
+    def extract(self, item):
+        if item["route"] == "llm" and self.runner is not None:
+            try:
+                item["llm_output"] = self.runner.invoke(table_input(item["html"] or item["text"]))
+            except Exception as e:
+                print(f"Erro na tabela {item['idx']} de {item['patent_id']}: {e}")
+                item["llm_error"] = True
+        return [item]
+
+    def write(self, item):
+        with self.lock:
+            pending = self.pending[item["patent_id"]]
+            pending["tables"].append(item)
+            if len(pending["tables"]) < item["n_tables"]:
+                return []
+            del self.pending[item["patent_id"]]
+        self.write_patent(pending["record"], sorted(pending["tables"], key=lambda table: table["idx"]))
+        return []
+
+    def write_patent(self, record, tables):
+        """Grava registro, tabelas desejadas, CSVs e saída das tabelas de uma patente em uma única transação."""
+        patent_id = record["patent_id"]
+        # O texto de uma tabela que falhou é gravado sem CSVs, e `process_table_to_csv` a converte depois
+        desired = [table for table in tables if table["route"] != "filtered"]
+        failed = [table for table in tables if table["route"] == "failed"]
+        record = dict(record, saved_tables=[table["idx"] + 1 for table in desired])
+        output = {
+            "llm_output": [table.get("llm_output") for table in tables],
+            "table_routes": [table["route"] for table in tables],
+            "table_compositions": [table.get("compositions") for table in tables],
+        }
+        llm_failed = any(table.get("llm_error") for table in tables)
+        llm_skipped = self.runner is None and any(table["route"] == "llm" for table in tables)
+
+        with self.store.batch():
+            self.store.put_patent(patent_id, record)
+            self.store.put_tables(patent_id, {table["idx"] + 1: table["text"] for table in desired})
+            for table in desired:
+                if table["route"] != "failed":
+                    self.store.put_csv_tables(patent_id, table["idx"] + 1, table["csv_texts"])
+            # Com falha ou sem LLM, a saída fica para uma próxima execução (`--from_store` ou `run_tllama`)
+            if tables and not failed and not llm_failed and not llm_skipped:
+                self.store.put_output(patent_id, RUNNER, output)
+        if self.frontier is not None:
+            if failed:
+                errors = "; ".join(f"tabela {table['idx'] + 1}: {table['error']}" for table in failed)
+                self.frontier.mark_patent(patent_id, FRONTIER_STAGE, "failed", errors)
+            else:
+                self.frontier.mark_patent(patent_id, FRONTIER_STAGE, "done")
+
+        with self.lock:
+            self.counts["patents"] += 1
+            self.counts["failed_patents"] += bool(failed)
+            self.counts["llm_errors"] += sum(bool(table.get("llm_error")) for table in tables)
+            for table in tables:
+                self.counts[table["route"]] += 1
+
+
+def build_stages(patents, args, from_store):
+    cpus = os.cpu_count() or 1
+    stages = []
+    if not from_store:
+        stages += [
+            Stage("fetch", patents.fetch, workers=args.workers, queue_size=args.queue_size),
+            Stage(
+                "parse",
+                parse_page,
+                workers=args.parse_workers or cpus,
+                queue_size=args.queue_size,
+                processes=True,
+                on_error=patents.patent_failed,
+            ),
+        ]
+    stages += [
+        Stage("split", patents.split, workers=1, queue_size=args.queue_size, on_error=patents.patent_failed),
+        Stage(
+            "filter",
+            filter_table,
+            workers=args.filter_workers or cpus,
+            queue_size=args.queue_size,
+            processes=True,
+            on_error=patents.table_failed,
+        ),
+        Stage(
+            "extract",
+            patents.extract,
+            workers=args.llm_workers,
+            queue_size=args.queue_size,
+            on_error=patents.table_failed,
+        ),
+        Stage("write", patents.write, workers=1, queue_size=args.queue_size, on_error=patents.patent_failed),
+    ]
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roda busca, download, extração e dataset como um único pipeline.")
+    parser.add_argument("--page_max", "-p", type=int, default=1, help="Número máximo de páginas a serem buscadas")
+    parser.add_argument(
+        "--keyword", "-k", type=str, default="glass composition", help="Palavra-chave para busca de patentes"
+    )
+    parser.add_argument(
+        "--from_store",
+        action="store_true",
+        help="Processa as patentes do banco ainda sem saída, sem buscar nem baixar páginas",
+    )
+    parser.add_argument(
+        "--compound_list",
+        choices=["desired_compounds", "all_compounds"],
+        default=COMPOUND_LIST,
+        help=f"Lista de compostos de properties.json usada para filtrar as tabelas (padrão: {COMPOUND_LIST})",
+    )
+    parser.add_argument("--parse_workers", type=int, default=None, help="Processos de parsing (padrão: nº de CPUs)")
+    parser.add_argument("--filter_workers", type=int, default=None, help="Processos do filtro (padrão: nº de CPUs)")
+    parser.add_argument("--llm_workers", type=int, default=4, help="Requisições simultâneas ao LLM (padrão: 4)")
+    parser.add_argument("--queue_size", type=int, default=64, help="Tamanho de cada fila entre etapas (padrão: 64)")
+    parser.add_argument(
+        "--report_every", type=float, default=10.0, help="Intervalo em segundos do resumo das filas (padrão: 10)"
+    )
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help=f"Modelo do Ollama (padrão: {DEFAULT_MODEL})")
+    parser.add_argument(
+        "--ollama_url", type=str, default=DEFAULT_BASE_URL, help=f"URL do servidor Ollama (padrão: {DEFAULT_BASE_URL})"
+    )
+    parser.add_argument("--llm_retries", type=int, default=3, help="Tentativas por requisição ao LLM (padrão: 3)")
+    parser.add_argument(
+        "--no_llm", action="store_true", help="Só as regras: tabelas que precisariam do LLM ficam sem saída"
+    )
+    parser.add_argument(
+        "--llm_only", action="store_true", help="Envia todas as tabelas ao LLM, sem o interpretador por regras"
+    )
+    parser.add_argument("--no_dataset", action="store_true", help="Não atualiza o dataset ao final")
+    add_fetch_arguments(parser)
+    add_frontier_arguments(parser)
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocessa patentes que já têm saída (respostas em cache são reusadas)"
+    )
+    add_cache_arguments(parser)
+    add_dedup_arguments(parser)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
+
+    store = get_store()
+    dedup = dedup_from_args(args, store)
+    runner = None
+    if not args.no_llm:
+        runner = make_runner(args.model, args.ollama_url, args.llm_workers, args.llm_retries, cache_from_args(args))
+    options = {"compound_list": args.compound_list, "llm_only": args.llm_only}
+    metadata = {"keyword": args.keyword, "page_max": args.page_max}
+
+    start = time.perf_counter()
+    if args.from_store:
+        patents = PatentPipeline(store, runner=runner, options=options, dedup=dedup)
+        patents_iter = store.iter_patents(without_output=None if args.force else RUNNER)
+        source = (record for _, record in patents_iter if record.get("tables"))
+        pipeline = Pipeline(source, build_stages(patents, args, True), args.report_every)
+        pipeline.run()
+    else:
+        with fetcher_from_args(args) as fetcher, frontier_from_args(args) as frontier:
+            patents = PatentPipeline(store, frontier, fetcher, runner, args.parser, metadata, options, dedup)
+            source = discover(
+                fetcher,
+                frontier,
+                args.keyword,
+                args.page_max,
+                FRONTIER_STAGE,
+                args.base_url,
+                get_parser(args.parser),
+                skip=lambda patent_id: store.get_output(patent_id, RUNNER) is not None,
+                force=args.force,
+                retry_failed=args.retry_failed,
+                refresh_search=args.refresh_search,
+            )
+            pipeline = Pipeline(source, build_stages(patents, args, False), args.report_every)
+            pipeline.run()
+
+    print()
+    print(pipeline.format_report())
+    counts = patents.counts
+    n_tables = counts["filtered"] + counts["duplicate"] + counts["rules"] + counts["llm"] + counts["failed"]
+    print(
+        f"{counts['patents']} patentes gravadas, {n_tables} tabelas: {counts['filtered']} sem compostos desejados, "
+        f"{counts['duplicate']} reaproveitadas de duplicatas (sem filtro, CSV nem LLM), {counts['rules']} lidas por "
+        f"regras, {counts['llm']} para o LLM ({counts['llm_errors']} com erro), {counts['failed']} com falha no "
+        f"filtro ou na extração. {counts['failed_patents']} patentes marcadas como falha."
+    )
+    if dedup is not None:
+        print(dedup.report())
+
+    if not args.no_dataset:
+        # pandas e pyarrow só são carregados quando o dataset é atualizado
+        from src.data.generate_dataset import build_dataset, report_build
+
+        start_dataset = time.perf_counter()
+        report_build(build_dataset(store), time.perf_counter() - start_dataset)
+    print(f"Pipeline concluído em {time.perf_counter() - start:.1f}s.")
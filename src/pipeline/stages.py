@@ -0,0 +1,212 @@
+"""Execução de um pipeline em etapas encadeadas por filas limitadas, com métricas por etapa.
+
+Cada `Stage` tem seu próprio pool de workers e lê de uma fila de tamanho `queue_size`. Uma função de etapa recebe
+um item e devolve uma lista (ou gerador) de itens para a etapa seguinte: zero para filtrar, um para transformar,
+vários para dividir. Quando a fila da etapa seguinte está cheia, os workers esperam (contrapressão), de modo que uma
+etapa lenta segura as anteriores em vez de acumular tudo na memória.
+
+Etapas com `processes=True` rodam a função em um `ProcessPoolExecutor` próprio (para parsing e outras tarefas de
+CPU que o GIL serializaria); as demais rodam em threads (download, banco, LLM). Assim o parsing de uma patente
+acontece enquanto outras estão sendo baixadas e outras tabelas estão no LLM.
+
+Um item cuja função levanta exceção é contado como erro da etapa. Com `on_error(item, exc)`, a etapa repassa às
+seguintes os itens devolvidos por ele (por exemplo, o próprio item marcado como falho), para que uma etapa que
+espera todas as partes de um todo, como a gravação de uma patente, não fique esperando a parte perdida.
+
+As métricas de cada etapa separam o tempo dos workers em ocupado (na função), ocioso (esperando itens da etapa
+anterior) e bloqueado (esperando espaço na fila da etapa seguinte). Uma etapa muito ocupada e com as anteriores
+bloqueadas é o gargalo. Cada item processado também é um intervalo `pipeline.<etapa>` da instrumentação, que pode
+ir para o trace ou ser perfilado (nas etapas em threads).
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.instrumentation import span
+
+_END = object()
+
+
+class StageMetrics:
+    """Contadores de uma etapa, atualizados pelos workers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.max_queue = 0
+
+    def add(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+class Stage:
+    """Uma etapa do pipeline: `func(item)` devolve os itens da etapa seguinte; `on_error(item, exc)`, os da falha."""
+
+    def __init__(self, name, func, workers=1, queue_size=64, processes=False, on_error=None):
+        self.name = name
+        self.func = func
+        self.on_error = on_error
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processes = processes
+        self.metrics = StageMetrics()
+
+
+class Pipeline:
+    """Liga uma fonte de itens a uma sequência de `Stage`s e roda tudo de uma vez.
+
+    A fonte é consumida em uma thread própria. `run()` bloqueia até todas as etapas terminarem e devolve as métricas;
+    com `report_every`, um resumo é impresso periodicamente enquanto o pipeline roda.
+    """
+
+    def __init__(self, source, stages, report_every=None):
+        self.source = source
+        self.stages = stages
+        self.report_every = report_every
+        self.queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self.source_metrics = StageMetrics()
+        self.started = None
+        self.finished = None
+        self.errors = []
+
+    def _put(self, idx, item, metrics):
+        """Coloca o item na fila da etapa `idx`, contando o tempo bloqueado como contrapressão."""
+        if idx >= len(self.queues):
+            metrics.add(items_out=1)
+            return
+        target = self.queues[idx]
+        start = time.perf_counter()
+        target.put(item)
+        blocked = time.perf_counter() - start
+        size = target.qsize()
+        with self.stages[idx].metrics.lock:
+            self.stages[idx].metrics.max_queue = max(self.stages[idx].metrics.max_queue, size)
+        metrics.add(blocked=blocked, items_out=1)
+
+    def _feed(self):
+        try:
+            for item in self.source:
+                self._put(0, item, self.source_metrics)
+        except Exception as e:
+            print(f"Erro na fonte do pipeline: {e}")
+            self.errors.append(e)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.queues[0].put(_END)
+
+    def _work(self, idx, executor, remaining):
+        stage = self.stages[idx]
+        inbox = self.queues[idx]
+        while True:
+            start = time.perf_counter()
+            item = inbox.get()
+            stage.metrics.add(idle=time.perf_counter() - start)
+            if item is _END:
+                break
+
+            start = time.perf_counter()
+            try:
+                with span(f"pipeline.{stage.name}"):
+                    outputs = executor.submit(stage.func, item).result() if executor else stage.func(item)
+                    outputs = list(outputs or [])
+            except Exception as e:
+                stage.metrics.add(items_in=1, errors=1, busy=time.perf_counter() - start)
+                print(f"Erro na etapa {stage.name}: {e}")
+                outputs = list(stage.on_error(item, e) or []) if stage.on_error is not None else []
+            else:
+                stage.metrics.add(items_in=1, busy=time.perf_counter() - start)
+
+            for output in outputs:
+                self._put(idx + 1, output, stage.metrics)
+
+        # O último worker a sair avisa a etapa seguinte
+        with remaining["lock"]:
+            remaining["count"] -= 1
+            last = remaining["count"] == 0
+        if last and idx + 1 < len(self.stages):
+            for _ in range(self.stages[idx + 1].workers):
+                self.queues[idx + 1].put(_END)
+
+    def _reporter(self, done):
+        while not done.wait(self.report_every):
+            print(self.format_report(compact=True))
+
+    def run(self):
+        self.started = time.perf_counter()
+        executors = [ProcessPoolExecutor(stage.workers) if stage.processes else None for stage in self.stages]
+        threads = [threading.Thread(target=self._feed, daemon=True)]
+        for idx, stage in enumerate(self.stages):
+            remaining = {"lock": threading.Lock(), "count": stage.workers}
+            threads += [
+                threading.Thread(target=self._work, args=(idx, executors[idx], remaining), daemon=True)
+                for _ in range(stage.workers)
+            ]
+
+        done = threading.Event()
+        if self.report_every:
+            threading.Thread(target=self._reporter, args=(done,), daemon=True).start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown()
+        self.finished = time.perf_counter()
+        return self.report()
+
+    def report(self):
+        """Métricas por etapa: itens, vazão e fração do tempo dos workers ocupada, ociosa e bloqueada."""
+        elapsed = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        rows = []
+        for idx, stage in enumerate(self.stages):
+            m = stage.metrics
+            capacity = max(elapsed * stage.workers, 1e-9)
+            rows.append(
+                {
+                    "stage": stage.name,
+                    "workers": stage.workers,
+                    "items_in": m.items_in,
+                    "items_out": m.items_out,
+                    "errors": m.errors,
+                    "throughput": m.items_in / elapsed if elapsed else 0.0,
+                    "busy": m.busy / capacity,
+                    "idle": m.idle / capacity,
+                    "blocked": m.blocked / capacity,
+                    "queue": self.queues[idx].qsize(),
+                    "max_queue": m.max_queue,
+                    "queue_size": stage.queue_size,
+                }
+            )
+        return {"elapsed": elapsed, "source_items": self.source_metrics.items_out, "stages": rows}
+
+    def format_report(self, compact=False):
+        report = self.report()
+        if compact:
+            parts = [
+                f"{row['stage']} {row['items_in']} ({row['queue']}/{row['queue_size']})" for row in report["stages"]
+            ]
+            return f"[{report['elapsed']:.0f}s] " + " | ".join(parts)
+
+        lines = [
+            f"{'etapa':<10} {'workers':>7} {'entrada':>8} {'saída':>7} {'erros':>6} {'itens/s':>8} "
+            f"{'ocupado':>8} {'ocioso':>7} {'bloqueado':>10} {'fila máx':>9}"
+        ]
+        for row in report["stages"]:
+            lines.append(
+                f"{row['stage']:<10} {row['workers']:>7} {row['items_in']:>8} {row['items_out']:>7} {row['errors']:>6} "
+                f"{row['throughput']:>8.2f} {row['busy']:>8.0%} {row['idle']:>7.0%} {row['blocked']:>10.0%} "
+                f"{row['max_queue']:>4}/{row['queue_size']:<4}"
+            )
+        lines.append(f"{report['source_items']} itens da fonte em {report['elapsed']:.1f}s.")
+        return "\n".join(lines)
@@ -0,0 +1,67 @@
+"""Mede a vazão sustentável do motor de download contra o servidor local com injeção de falhas.
+
+Roda o mesmo lote de páginas com a taxa fixa (o comportamento antigo, uma requisição a cada `host_delay`) e com o
+controle adaptativo, e mostra tempo total, páginas perdidas, novas tentativas, 429 recebidos e a taxa final.
+
+    python -m src.scraping.bench_fetch --pages 200 --capacity 10 --error_rate 0.05
+"""
+
+import argparse
+import time
+
+from src.scraping.fault_server import add_fault_arguments, config_from_args, start_server
+from src.scraping.fetch import PatentFetcher
+from src.scraping.rate_limit import AdaptiveRateLimiter, RetryPolicy
+
+
+def run(base_url, pages, workers, host_delay, adaptive, retries, read_timeout):
+    limiter = AdaptiveRateLimiter(rate=1 / host_delay, max_rate=1000.0, adaptive=adaptive)
+    fetcher = PatentFetcher(
+        max_workers=workers,
+        timeout=(2.0, read_timeout),
+        limiter=limiter,
+        retry=RetryPolicy(retries=retries, backoff=0.5, max_backoff=5.0) if retries else RetryPolicy(retries=0),
+    )
+    urls = [f"{base_url}/{2000000 + idx}.html" for idx in range(pages)]
+    start = time.perf_counter()
+    ok = sum(page is not None for _, page in fetcher.fetch_all(urls))
+    elapsed = time.perf_counter() - start
+    fetcher.close()
+    stats = next(iter(limiter.stats().values()))
+    return {"elapsed": elapsed, "ok": ok, "retries": fetcher.retries, **stats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara taxa fixa e adaptativa contra o servidor de testes.")
+    parser.add_argument("--pages", type=int, default=200, help="Páginas baixadas por configuração (padrão: 200)")
+    parser.add_argument("--workers", type=int, default=8, help="Downloads simultâneos (padrão: 8)")
+    parser.add_argument("--host_delay", type=float, default=0.5, help="Intervalo da taxa fixa e inicial (padrão: 0.5)")
+    parser.add_argument("--read_timeout", type=float, default=2.0, help="Timeout de leitura (padrão: 2)")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    variants = [
+        ("fixa, sem retry", False, 0),
+        ("fixa", False, 4),
+        ("adaptativa", True, 4),
+    ]
+    results = []
+    for name, adaptive, retries in variants:
+        print(f"== {name}")
+        config = config_from_args(args)
+        server, base_url = start_server(config)
+        results.append(
+            (name, run(base_url, args.pages, args.workers, args.host_delay, adaptive, retries, args.read_timeout))
+        )
+        server.shutdown()
+
+    print(f"\n{args.pages} páginas, capacidade do servidor {args.capacity} req/s, {args.error_rate:.0%} de erros\n")
+    print(
+        f"{'taxa':<16} {'tempo (s)':>10} {'páginas/s':>10} {'perdidas':>9} {'retries':>8} {'429':>5} "
+        f"{'taxa final':>11}"
+    )
+    for name, result in results:
+        print(
+            f"{name:<16} {result['elapsed']:>10.1f} {result['ok'] / result['elapsed']:>10.2f} "
+            f"{args.pages - result['ok']:>9} {result['retries']:>8} {result['throttled']:>5} {result['rate']:>11.2f}"
+        )
@@ -0,0 +1,76 @@
+import argparse
+import time
+from pathlib import Path
+
+from src.scraping.page_cache import CACHE_DIR, PageCache
+from src.scraping.parsers import available_parsers, get_parser
+
+
+def load_pages(pages_dir=None, cache_dir=CACHE_DIR, limit=None):
+    """Carrega páginas de patentes salvas, de uma pasta de arquivos .html ou do cache de páginas."""
+    if pages_dir is not None:
+        paths = sorted(Path(pages_dir).glob("*.html"))[:limit]
+        return [path.read_bytes() for path in paths]
+
+    cache = PageCache(cache_dir)
+    urls = [url for url in cache.urls() if "/result.html" not in url][:limit]
+    pages = [cache.get(url)["content"] for url in urls]
+    cache.close()
+    return pages
+
+
+def benchmark_parser(name, pages, repeat):
+    """Mede o tempo de `parse_patent_page` do backend sobre todas as páginas, `repeat` vezes."""
+    html_parser = get_parser(name)
+    results = [html_parser.parse_patent_page(html) for html in pages]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            html_parser.parse_patent_page(html)
+    elapsed = time.perf_counter() - start
+    return elapsed, results
+
+
+COMPARED_FIELDS = ("claims", "description", "tables_text")
+
+
+def compare_results(reference, results):
+    """Conta quantas páginas produziram claims, descrição e tabelas idênticas às da referência."""
+    return sum(all(ref[f] == res[f] for f in COMPARED_FIELDS) for ref, res in zip(reference, results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o desempenho dos backends de parsing em páginas salvas.")
+    parser.add_argument("--pages_dir", type=Path, default=None, help="Pasta com páginas .html (padrão: usa o cache)")
+    parser.add_argument("--cache_dir", type=Path, default=CACHE_DIR, help=f"Pasta do cache (padrão: {CACHE_DIR})")
+    parser.add_argument("--limit", type=int, default=None, help="Número máximo de páginas a usar")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições sobre o conjunto de páginas (padrão: 3)")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir, args.cache_dir, args.limit)
+    if not pages:
+        raise SystemExit("Nenhuma página encontrada para o benchmark.")
+
+    total_mb = sum(len(html) for html in pages) / 1024**2
+    print(f"{len(pages)} páginas, {total_mb:.1f} MB, {args.repeat} repetições\n")
+    print(f"{'parser':<12} {'ms/página':>10} {'páginas/s':>10} {'MB/s':>8} {'speedup':>8} {'iguais':>8}")
+
+    baseline, reference = benchmark_parser("html.parser", pages, args.repeat)
+    divergent = []
+    for name in available_parsers():
+        elapsed, results = (
+            (baseline, reference) if name == "html.parser" else benchmark_parser(name, pages, args.repeat)
+        )
+        n_parsed = len(pages) * args.repeat
+        identical = compare_results(reference, results)
+        if identical < len(pages):
+            divergent.append(f"{name} ({len(pages) - identical} páginas)")
+        print(
+            f"{name:<12} {1000 * elapsed / n_parsed:>10.2f} {n_parsed / elapsed:>10.1f} "
+            f"{total_mb * args.repeat / elapsed:>8.2f} {baseline / elapsed:>7.1f}x "
+            f"{identical:>4}/{len(pages)}"
+        )
+
+    if divergent:
+        raise SystemExit(f"\nResultado diferente do html.parser: {', '.join(divergent)}.")
@@ -0,0 +1,160 @@
+"""Servidor HTTP local que imita o freepatentsonline e injeta falhas, para testar o motor de download.
+
+Serve páginas de busca e de patentes sintéticas e, conforme as opções, responde 429 (com `Retry-After`) acima de
+`capacity` requisições por segundo, devolve 500/503 ao acaso, fica calado além do timeout de leitura em uma fração
+das requisições e fica mais lento quanto mais requisições estão em andamento.
+
+    python -m src.scraping.fault_server --port 8765 --capacity 5 --error_rate 0.05
+    python -m src.scraping.harvest_patents --base_url http://127.0.0.1:8765 --no_cache
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LINKS_PER_PAGE = 10
+
+
+def search_page(page):
+    links = "".join(
+        f'<a href="/{1000000 + page * LINKS_PER_PAGE + idx}.html">Glass composition {idx}</a>'
+        for idx in range(LINKS_PER_PAGE)
+    )
+    return f"<html><body>{links}</body></html>"
+
+
+def patent_page(patent_id):
+    return f"""<html><body><div class="disp_elm_title">Claims:</div><div>1. A glass comprising SiO2 and Na2O.</div>
+<div class="disp_elm_title">Description:</div><div>Glass {patent_id} with SiO2 60 mol%.</div>
+<patent-tables><table><tr><th>Oxide</th><th>Ex1</th><th>Ex2</th></tr><tr><td>SiO2</td><td>60</td><td>65</td></tr>
+<tr><td>Na2O</td><td>15</td><td>10</td></tr><tr><td>CaO</td><td>25</td><td>25</td></tr></table></patent-tables>
+</body></html>"""
+
+
+class FaultConfig:
+    """Falhas injetadas pelo servidor; os contadores são atualizados a cada requisição."""
+
+    def __init__(self, capacity=5.0, error_rate=0.0, hang_rate=0.0, hang_seconds=60.0, latency=0.02, seed=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.in_flight = 0
+        self.counts = {"ok": 0, "throttled": 0, "errors": 0, "hangs": 0}
+
+    def decide(self):
+        """Sorteia o destino da requisição: 'throttled', 'error', 'hang' ou 'ok', com a latência a aplicar."""
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            self.recent.append(now)
+            self.in_flight += 1
+            latency = self.latency * self.in_flight
+            if self.capacity and len(self.recent) > self.capacity:
+                outcome = "throttled"
+            elif self.random.random() < self.error_rate:
+                outcome = "errors"
+            elif self.random.random() < self.hang_rate:
+                outcome = "hangs"
+            else:
+                outcome = "ok"
+            self.counts[outcome] += 1
+        return outcome, latency
+
+    def finish(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def make_handler(config):
+    class FaultHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            outcome, latency = config.decide()
+            try:
+                if outcome == "hangs":
+                    time.sleep(config.hang_seconds)
+                    return
+                time.sleep(latency)
+                if outcome == "throttled":
+                    self._send(429, b"Too Many Requests", {"Retry-After": "1"})
+                elif outcome == "errors":
+                    self._send(config.random.choice([500, 503]), b"Server Error")
+                else:
+                    url = urlsplit(self.path)
+                    if url.path == "/result.html":
+                        body = search_page(int(parse_qs(url.query).get("p", ["1"])[0]))
+                    else:
+                        body = patent_page(url.path.strip("/").split(".")[0])
+                    self._send(200, body.encode("utf-8"), {"Content-Type": "text/html"})
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                config.finish()
+
+        def _send(self, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FaultHandler
+
+
+def start_server(config, port=0):
+    """Sobe o servidor em uma thread e devolve (servidor, URL base); `port=0` escolhe uma porta livre."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_fault_arguments(parser):
+    """Adiciona ao argparse as opções de falhas do servidor de testes."""
+    parser.add_argument(
+        "--capacity", type=float, default=5.0, help="Requisições por segundo antes de responder 429 (padrão: 5)"
+    )
+    parser.add_argument(
+        "--error_rate", type=float, default=0.05, help="Fração de respostas 500/503 ao acaso (padrão: 0.05)"
+    )
+    parser.add_argument(
+        "--hang_rate", type=float, default=0.01, help="Fração de requisições que nunca respondem (padrão: 0.01)"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Latência por requisição em andamento, em segundos (padrão: 0.02)"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Semente do sorteio das falhas")
+
+
+def config_from_args(args):
+    return FaultConfig(args.capacity, args.error_rate, args.hang_rate, latency=args.latency, seed=args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de patentes com injeção de falhas.")
+    parser.add_argument("--port", type=int, default=8765, help="Porta do servidor (padrão: 8765)")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    server, base_url = start_server(config, args.port)
+    print(f"Servidor de testes em {base_url} (Ctrl+C para parar).")
+    try:
+        while True:
+            time.sleep(10)
+            print(config.counts)
+    except KeyboardInterrupt:
+        server.shutdown()
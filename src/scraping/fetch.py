@@ -0,0 +1,293 @@
+"""Motor de download compartilhado pelos scrapers de patentes."""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.instrumentation import count, span
+from src.scraping.page_cache import CACHE_DIR, PageCache
+from src.scraping.parsers import PARSERS, charset_from_headers, decode_html, get_parser
+from src.scraping.rate_limit import RETRY_STATUS, AdaptiveRateLimiter, RetryPolicy, parse_retry_after
+
+BASE_URL = "https://www.freepatentsonline.com"
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/91.0.4472.124 Safari/537.36"
+)
+
+
+@dataclass
+class Page:
+    """Resposta de uma página já baixada."""
+
+    url: str
+    status_code: int
+    content: bytes
+    headers: dict = field(default_factory=dict)
+    from_cache: bool = False
+
+    @property
+    def text(self):
+        """Conteúdo decodificado com o charset da resposta, o declarado na página ou UTF-8."""
+        return decode_html(self.content, charset_from_headers(self.headers))
+
+
+class PatentFetcher:
+    """Baixa páginas em paralelo com uma sessão HTTP compartilhada.
+
+    Usa um pool de threads limitado a `max_workers` e um pool de conexões do mesmo tamanho (reaproveitando conexões
+    TCP/TLS). O ritmo por host é dado por um `AdaptiveRateLimiter`, que começa em uma requisição a cada `host_delay`
+    segundos e se ajusta à latência e aos erros observados; 429/5xx, timeouts e erros de conexão são repetidos
+    conforme o `RetryPolicy`. `timeout` é um par (conexão, leitura) em segundos, para que um socket travado não
+    prenda um worker para sempre.
+
+    Com um `PageCache`, páginas já baixadas são revalidadas com ETag/Last-Modified (ou servidas direto se tiverem
+    menos de `max_age` segundos) e, com `offline=True`, nenhuma requisição é feita: só o cache é consultado.
+    """
+
+    def __init__(
+        self,
+        max_workers=8,
+        host_delay=0.5,
+        timeout=(10, 30),
+        cache=None,
+        offline=False,
+        max_age=None,
+        limiter=None,
+        retry=None,
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.max_age = max_age
+        self.limiter = limiter or AdaptiveRateLimiter(rate=1 / host_delay if host_delay > 0 else 1000.0)
+        self.retry = retry or RetryPolicy()
+        self.retries = 0
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _request(self, url, headers):
+        """Faz a requisição com controle de taxa e novas tentativas; devolve a resposta ou levanta a última falha."""
+        host = urlsplit(url).netloc
+        for attempt in range(self.retry.retries + 1):
+            self.limiter.acquire(host)
+            start = time.monotonic()
+            try:
+                with span("fetch.request", host=host) as attrs:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                    attrs["status"] = response.status_code
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.limiter.record(host, None, time.monotonic() - start)
+                count("fetch_requests", host=host, status=type(e).__name__)
+                error, retry_after = e, None
+            else:
+                count("fetch_requests", host=host, status=response.status_code)
+                count("fetch_bytes", len(response.content), host=host)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.limiter.record(host, response.status_code, time.monotonic() - start, retry_after)
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                error = requests.exceptions.HTTPError(f"{response.status_code} para {url}", response=response)
+
+            if attempt < self.retry.retries:
+                self.retries += 1
+                time.sleep(self.retry.delay(attempt, retry_after))
+        raise error
+
+    def get(self, url):
+        """Baixa uma URL e devolve um `Page`, ou None em caso de erro."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None:
+            fresh = self.max_age is not None and time.time() - cached["stored_at"] < self.max_age
+            if self.offline or fresh:
+                count("page_cache", result="hit")
+                return Page(url, 200, cached["content"], from_cache=True)
+        elif self.offline:
+            print(f"Página {url} não está no cache (modo offline).")
+            return None
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = self._request(url, headers)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Erro ao acessar a página {url}: {e}")
+            return None
+
+        if response.status_code == 304 and cached is not None:
+            count("page_cache", result="revalidated")
+            self.cache.touch(url)
+            return Page(url, 200, cached["content"], dict(response.headers), from_cache=True)
+
+        if self.cache is not None:
+            count("page_cache", result="miss")
+            self.cache.put(url, response.content, response.headers)
+        return Page(url, response.status_code, response.content, dict(response.headers))
+
+    def fetch_all(self, urls):
+        """Baixa as URLs em paralelo e devolve pares (url, página) na ordem em que terminam."""
+        futures = {self.submit(url): url for url in urls}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def submit(self, url):
+        """Agenda o download de uma URL no pool e devolve o `Future` com o `Page` (ou None)."""
+        return self._executor.submit(self.get, url)
+
+    def fetch_iter(self, urls, max_pending=None):
+        """Como `fetch_all`, mas consome `urls` aos poucos, com no máximo `max_pending` downloads em andamento."""
+        max_pending = max_pending or self.max_workers
+        urls = iter(urls)
+        futures = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(futures) < max_pending:
+                url = next(urls, None)
+                if url is None:
+                    exhausted = True
+                else:
+                    futures[self.submit(url)] = url
+            if not futures:
+                return
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures.pop(future), future.result()
+
+    def report(self):
+        """Resumo por host da taxa ajustada, da vazão medida e dos erros."""
+        for host, stats in self.limiter.stats().items():
+            throughput = f"{stats['throughput']:.2f} req/s" if stats["throughput"] else "-"
+            print(
+                f"{host}: taxa final {stats['rate']:.2f} req/s (entre {stats['min_rate']:.2f} e "
+                f"{stats['max_rate']:.2f}), vazão medida {throughput}, {stats['successes']}/{stats['requests']} "
+                f"requisições com sucesso, {stats['throttled']} 429/503, {stats['errors']} erros"
+            )
+        if self.retries:
+            print(f"{self.retries} novas tentativas.")
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        self.report()
+        if self.cache is not None:
+            print(f"Cache de páginas: {self.cache.hits} acertos, {self.cache.misses} faltas.")
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extract_patent_id_from_url(url):
+    """Extrai o ID da patente a partir da URL."""
+    return url.split("/")[-1].split(".")[0]
+
+
+def build_search_url(page, keyword, base_url=BASE_URL):
+    """Monta a URL de uma página de resultados de busca."""
+    keyword = keyword.replace(" ", "+")
+    return f"{base_url}/result.html?p={page}&sort=relevance&srch=top&query_txt={keyword}&patents_us=on"
+
+
+def discover_patent_links(fetcher, keyword, page_max, base_url=BASE_URL, parser=None):
+    """Baixa as páginas de busca de 1 a `page_max` em paralelo e devolve os links de patentes sem repetição."""
+    parser = parser or get_parser()
+    search_urls = [build_search_url(page, keyword, base_url) for page in range(1, page_max + 1)]
+    seen = set()
+    for _, page in fetcher.fetch_all(search_urls):
+        if page is None:
+            continue
+        for link in parser.links(page.text, base_url):
+            if link not in seen:
+                seen.add(link)
+                yield link
+
+
+def add_fetch_arguments(parser):
+    """Adiciona ao argparse as opções comuns do motor de download."""
+    parser.add_argument("--workers", type=int, default=8, help="Número máximo de downloads simultâneos (padrão: 8)")
+    parser.add_argument(
+        "--host_delay",
+        type=float,
+        default=0.5,
+        help="Intervalo inicial em segundos entre requisições ao mesmo host (padrão: 0.5)",
+    )
+    parser.add_argument(
+        "--max_rate",
+        type=float,
+        default=20.0,
+        help="Taxa máxima em requisições por segundo a que o controle adaptativo pode chegar por host (padrão: 20)",
+    )
+    parser.add_argument(
+        "--fixed_rate", action="store_true", help="Mantém a taxa fixa em 1/host_delay, sem ajuste adaptativo"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=4, help="Novas tentativas após 429/5xx, timeout ou erro de conexão (padrão: 4)"
+    )
+    parser.add_argument(
+        "--connect_timeout", type=float, default=10.0, help="Timeout de conexão em segundos (padrão: 10)"
+    )
+    parser.add_argument("--read_timeout", type=float, default=30.0, help="Timeout de leitura em segundos (padrão: 30)")
+    parser.add_argument(
+        "--base_url", type=str, default=BASE_URL, help=f"URL base do site de patentes (padrão: {BASE_URL})"
+    )
+    parser.add_argument(
+        "--cache_dir", type=Path, default=CACHE_DIR, help=f"Pasta do cache de páginas (padrão: {CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--cache_max_mb", type=int, default=2048, help="Tamanho máximo do cache de páginas em MB (padrão: 2048)"
+    )
+    parser.add_argument(
+        "--parser",
+        choices=sorted(PARSERS),
+        default=None,
+        help="Backend de parsing do HTML (padrão: lxml se instalado, senão html.parser)",
+    )
+    parser.add_argument("--no_cache", action="store_true", help="Desativa o cache de páginas")
+    parser.add_argument("--offline", action="store_true", help="Usa apenas páginas do cache, sem acessar a rede")
+    parser.add_argument(
+        "--max_age",
+        type=float,
+        default=None,
+        help="Idade máxima em segundos para usar uma página do cache sem revalidar (padrão: sempre revalida)",
+    )
+
+
+def fetcher_from_args(args):
+    """Cria um `PatentFetcher` a partir das opções de `add_fetch_arguments`."""
+    cache = None if args.no_cache else PageCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024**2)
+    limiter = AdaptiveRateLimiter(
+        rate=1 / args.host_delay if args.host_delay > 0 else args.max_rate,
+        max_rate=args.max_rate,
+        adaptive=not args.fixed_rate,
+    )
+    return PatentFetcher(
+        max_workers=args.workers,
+        timeout=(args.connect_timeout, args.read_timeout),
+        cache=cache,
+        limiter=limiter,
+        retry=RetryPolicy(retries=args.retries),
+        offline=args.offline,
+        max_age=args.max_age,
+    )
@@ -0,0 +1,459 @@
+"""Fronteira de crawl persistente para a paginação da busca e o download das patentes.
+
+Antes, cada execução dos scrapers refazia `for page in range(1, page_max + 1)` desde a página 1: se o crawl morria
+na página 73, todas as páginas de busca eram baixadas de novo só para redescobrir links já vistos. Aqui um SQLite
+(`data/frontier.sqlite`, modo WAL) guarda:
+
+- `search_pages`: cada página de busca visitada, com status, tentativas e número de links encontrados;
+- `patents` e `patent_keywords`: as patentes descobertas, uma única vez por ID, e as palavras-chave que as acharam;
+- `fetches`: o status e as tentativas de download de cada patente por etapa (`harvest`, `tables`, `claims`, ...).
+
+Assim um crawl interrompido retoma das páginas de busca ainda não visitadas e das patentes ainda não baixadas, e
+uma patente já processada por uma busca com outra `--keyword` não é baixada de novo. A descoberta de links e o
+download das patentes rodam como duas etapas em paralelo, ligadas por uma fila limitada.
+
+    python -m src.scraping.frontier stats
+    python -m src.scraping.frontier reset --keyword "glass composition"
+"""
+
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+
+from src.scraping.fetch import BASE_URL, build_search_url, extract_patent_id_from_url
+from src.scraping.parsers import get_parser
+
+FRONTIER_PATH = Path("data/frontier.sqlite")
+MAX_ATTEMPTS = 3
+QUEUE_SIZE = 256
+
+_DONE = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_pages (
+    keyword TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    links INTEGER,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (keyword, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS patents (
+    patent_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    discovered_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patent_keywords (
+    keyword TEXT NOT NULL,
+    patent_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    PRIMARY KEY (keyword, patent_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fetches (
+    patent_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (patent_id, stage)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_keyword(keyword):
+    """Palavra-chave em minúsculas e com espaços simples, para que 'Glass  Composition' e 'glass composition' batam."""
+    return " ".join(keyword.lower().split())
+
+
+class CrawlFrontier:
+    """Estado persistente do crawl: páginas de busca visitadas, patentes descobertas e downloads por etapa."""
+
+    def __init__(self, path=FRONTIER_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    # Páginas de busca
+
+    def pending_search_pages(self, keyword, page_max, base_url=BASE_URL, refresh=False):
+        """Pares (página, URL) das páginas de busca de 1 a `page_max` ainda não visitadas (todas, com `refresh`).
+
+        Páginas que falharam `max_attempts` vezes também ficam de fora.
+        """
+        visited = set()
+        if not refresh:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT page FROM search_pages WHERE keyword = ? AND (status = 'done' OR attempts >= ?)",
+                    (normalize_keyword(keyword), self.max_attempts),
+                ).fetchall()
+            visited = {page for (page,) in rows}
+        return [
+            (page, build_search_url(page, keyword, base_url)) for page in range(1, page_max + 1) if page not in visited
+        ]
+
+    def mark_search_page(self, url, keyword, page, links=None, error=None):
+        """Registra a visita a uma página de busca: `done` com o número de links, ou `failed` com o erro."""
+        status = "failed" if error else "done"
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO search_pages (keyword, page, url, status, attempts, links, last_error, updated_at)
+                VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT (keyword, page) DO UPDATE SET
+                    url = excluded.url, status = excluded.status, attempts = attempts + 1, links = excluded.links,
+                    last_error = excluded.last_error, updated_at = excluded.updated_at
+                """,
+                (normalize_keyword(keyword), page, url, status, links, error, time.time()),
+            )
+            self._db.commit()
+
+    # Patentes
+
+    def add_patents(self, urls, keyword, page):
+        """Registra os links descobertos na página `page` de uma busca; cada patente é guardada uma única vez."""
+        now = time.time()
+        keyword = normalize_keyword(keyword)
+        rows = [(extract_patent_id_from_url(url), url) for url in urls]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO patents (patent_id, url, discovered_at) VALUES (?, ?, ?)",
+                [(patent_id, url, now) for patent_id, url in rows],
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO patent_keywords (keyword, patent_id, page) VALUES (?, ?, ?)",
+                [(keyword, patent_id, page) for patent_id, _ in rows],
+            )
+            self._db.commit()
+
+    def needs_fetch(self, patent_id, stage, retry_failed=False):
+        """Verdadeiro se a patente ainda não foi baixada nesta etapa (ou falhou menos de `max_attempts` vezes)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, attempts FROM fetches WHERE patent_id = ? AND stage = ?", (patent_id, stage)
+            ).fetchone()
+        if row is None:
+            return True
+        status, attempts = row
+        return status == "failed" and (retry_failed or attempts < self.max_attempts)
+
+    def pending_patents(self, keyword, page_max, stage, force=False, retry_failed=False):
+        """URLs das patentes descobertas nas páginas 1 a `page_max` de `keyword` ainda por baixar na etapa `stage`."""
+        query = """
+            SELECT p.url FROM patent_keywords k
+            JOIN patents p ON p.patent_id = k.patent_id
+            LEFT JOIN fetches f ON f.patent_id = k.patent_id AND f.stage = ?
+            WHERE k.keyword = ? AND k.page <= ?
+        """
+        params = [stage, normalize_keyword(keyword), page_max]
+        if not force:
+            query += " AND (f.status IS NULL OR (f.status = 'failed' AND (? OR f.attempts < ?)))"
+            params += [retry_failed, self.max_attempts]
+        with self._lock:
+            return [url for (url,) in self._db.execute(query + " ORDER BY p.discovered_at", params).fetchall()]
+
+    def mark_patent(self, patent_id, stage, status, error=None):
+        """Registra o resultado do download de uma patente na etapa: `done`, `skipped` ou `failed`."""
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO fetches (patent_id, stage, status, attempts, last_error, updated_at)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (patent_id, stage) DO UPDATE SET
+                    status = excluded.status, attempts = attempts + 1, last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+                """,
+                (patent_id, stage, status, error, time.time()),
+            )
+            self._db.commit()
+
+    def reset(self, keyword=None, stage=None):
+        """Esquece as páginas de busca visitadas (de uma palavra-chave) e/ou os downloads (de uma etapa)."""
+        with self._lock:
+            if stage is None:
+                if keyword is None:
+                    self._db.execute("DELETE FROM search_pages")
+                else:
+                    self._db.execute("DELETE FROM search_pages WHERE keyword = ?", (normalize_keyword(keyword),))
+            if stage is not None or keyword is None:
+                where, params = ("WHERE stage = ?", (stage,)) if stage is not None else ("", ())
+                self._db.execute(f"DELETE FROM fetches {where}", params)
+            self._db.commit()
+
+    def stats(self):
+        """Contagens por palavra-chave e por etapa/status."""
+        with self._lock:
+            searches = self._db.execute(
+                "SELECT keyword, COUNT(*), SUM(status = 'done'), COALESCE(SUM(links), 0) FROM search_pages "
+                "GROUP BY keyword ORDER BY keyword"
+            ).fetchall()
+            discovered = dict(
+                self._db.execute("SELECT keyword, COUNT(*) FROM patent_keywords GROUP BY keyword").fetchall()
+            )
+            patents = self._db.execute("SELECT COUNT(*) FROM patents").fetchone()[0]
+            fetches = self._db.execute(
+                "SELECT stage, status, COUNT(*) FROM fetches GROUP BY stage, status ORDER BY stage, status"
+            ).fetchall()
+        return {
+            "patents": patents,
+            "keywords": {
+                keyword: {"search_pages": total, "visited": done, "links": links, "patents": discovered.get(keyword, 0)}
+                for keyword, total, done, links in searches
+            },
+            "fetches": [{"stage": stage, "status": status, "count": count} for stage, status, count in fetches],
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Discovery(threading.Thread):
+    """Etapa de descoberta: reenfileira as patentes pendentes e visita as páginas de busca ainda não vistas.
+
+    Cada patente entra na fila uma única vez; as que `skip` manda pular são marcadas sem ocupar o pool de download.
+    """
+
+    def __init__(self, fetcher, frontier, keyword, page_max, stage, base_url, parser, skip, options):
+        super().__init__(daemon=True)
+        self.fetcher = fetcher
+        self.frontier = frontier
+        self.keyword = keyword
+        self.page_max = page_max
+        self.stage = stage
+        self.base_url = base_url
+        self.parser = parser
+        self.skip = skip
+        self.options = options
+        self.urls = queue.Queue(maxsize=QUEUE_SIZE)
+        self.seen = set()
+        self.skipped = 0
+        self.error = None
+
+    def enqueue(self, url):
+        patent_id = extract_patent_id_from_url(url)
+        if patent_id in self.seen:
+            return
+        self.seen.add(patent_id)
+        if not self.options["force"] and self.skip is not None and self.skip(patent_id):
+            self.frontier.mark_patent(patent_id, self.stage, "skipped")
+            self.skipped += 1
+            print(f"Patente {patent_id} já processada ({self.stage}). Pulando.")
+            return
+        self.urls.put(url)
+
+    def run(self):
+        force, retry_failed = self.options["force"], self.options["retry_failed"]
+        try:
+            for url in self.frontier.pending_patents(self.keyword, self.page_max, self.stage, force, retry_failed):
+                self.enqueue(url)
+
+            pending = self.frontier.pending_search_pages(
+                self.keyword, self.page_max, self.base_url, self.options["refresh_search"]
+            )
+            pages = {url: number for number, url in pending}
+            print(f"Busca '{self.keyword}': {len(pending)} de {self.page_max} páginas ainda não visitadas.")
+            for url, page in self.fetcher.fetch_iter(pages, self.options["search_workers"]):
+                if page is None:
+                    self.frontier.mark_search_page(url, self.keyword, pages[url], error="download falhou")
+                    continue
+                links = self.parser.links(page.text, self.base_url)
+                self.frontier.add_patents(links, self.keyword, pages[url])
+                self.frontier.mark_search_page(url, self.keyword, pages[url], links=len(links))
+                for link in links:
+                    if force or self.frontier.needs_fetch(extract_patent_id_from_url(link), self.stage, retry_failed):
+                        self.enqueue(link)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.urls.put(_DONE)
+
+
+def discover(
+    fetcher,
+    frontier,
+    keyword,
+    page_max,
+    stage,
+    base_url=BASE_URL,
+    parser=None,
+    skip=None,
+    force=False,
+    retry_failed=False,
+    refresh_search=False,
+    search_workers=2,
+):
+    """Só a etapa de descoberta de `crawl`: gera as URLs das patentes a baixar, sem baixá-las.
+
+    Quem consome as URLs fica responsável por marcar cada patente com `frontier.mark_patent`.
+    """
+    options = {
+        "force": force,
+        "retry_failed": retry_failed,
+        "refresh_search": refresh_search,
+        "search_workers": search_workers,
+    }
+    discovery = _Discovery(fetcher, frontier, keyword, page_max, stage, base_url, parser or get_parser(), skip, options)
+    discovery.start()
+    while True:
+        url = discovery.urls.get()
+        if url is _DONE:
+            break
+        yield url
+    discovery.join()
+    if discovery.error is not None:
+        raise discovery.error
+
+
+def _fetch_queue(fetcher, urls, max_pending):
+    """Baixa as URLs que chegam pela fila assim que aparecem, sem esperar o fim da descoberta."""
+    futures = {}
+    finished = False
+    while futures or not finished:
+        while not finished and len(futures) < max_pending:
+            try:
+                url = urls.get(block=not futures)
+            except queue.Empty:
+                break
+            if url is _DONE:
+                finished = True
+            else:
+                futures[fetcher.submit(url)] = url
+        if not futures:
+            continue
+        done, _ = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield futures.pop(future), future.result()
+
+
+def crawl(
+    fetcher,
+    frontier,
+    keyword,
+    page_max,
+    stage,
+    base_url=BASE_URL,
+    parser=None,
+    skip=None,
+    force=False,
+    retry_failed=False,
+    refresh_search=False,
+    search_workers=2,
+):
+    """Descobre e baixa as patentes de uma busca, retomando de onde o último crawl parou.
+
+    A descoberta roda em uma thread própria e alimenta uma fila limitada que o download consome enquanto as páginas
+    de busca ainda estão sendo visitadas. Patentes para as quais `skip(patent_id)` é verdadeiro não são baixadas.
+    Gera pares (url, página); a patente só é marcada como `done` quando o consumidor pede o próximo par, de modo que
+    uma patente cujo processamento falhou continua pendente para a próxima execução.
+    """
+    options = {
+        "force": force,
+        "retry_failed": retry_failed,
+        "refresh_search": refresh_search,
+        "search_workers": search_workers,
+    }
+    discovery = _Discovery(fetcher, frontier, keyword, page_max, stage, base_url, parser or get_parser(), skip, options)
+    discovery.start()
+
+    done = failed = 0
+    for url, page in _fetch_queue(fetcher, discovery.urls, fetcher.max_workers):
+        patent_id = extract_patent_id_from_url(url)
+        if page is None:
+            frontier.mark_patent(patent_id, stage, "failed", "download falhou")
+            failed += 1
+            continue
+        yield url, page
+        frontier.mark_patent(patent_id, stage, "done")
+        done += 1
+
+    discovery.join()
+    print(f"Crawl '{keyword}' ({stage}): {done} baixadas, {discovery.skipped} puladas, {failed} falharam.")
+    if discovery.error is not None:
+        raise discovery.error
+
+
+def add_frontier_arguments(parser):
+    """Adiciona ao argparse as opções da fronteira de crawl."""
+    parser.add_argument(
+        "--frontier", type=Path, default=FRONTIER_PATH, help=f"Banco da fronteira de crawl (padrão: {FRONTIER_PATH})"
+    )
+    parser.add_argument(
+        "--max_attempts",
+        type=int,
+        default=MAX_ATTEMPTS,
+        help=f"Tentativas por página de busca ou patente antes de desistir (padrão: {MAX_ATTEMPTS})",
+    )
+    parser.add_argument(
+        "--refresh_search", action="store_true", help="Revisita páginas de busca já visitadas em crawls anteriores"
+    )
+    parser.add_argument(
+        "--retry_failed", action="store_true", help="Tenta de novo patentes que já esgotaram as tentativas"
+    )
+
+
+def frontier_from_args(args):
+    """Cria uma `CrawlFrontier` a partir das opções de `add_frontier_arguments`."""
+    return CrawlFrontier(args.frontier, max_attempts=args.max_attempts)
+
+
+def crawl_from_args(fetcher, frontier, args, page_max, stage, parser, skip=None, force=False):
+    """Atalho para `crawl` com as opções de `add_fetch_arguments` e `add_frontier_arguments`."""
+    return crawl(
+        fetcher,
+        frontier,
+        args.keyword,
+        page_max,
+        stage,
+        args.base_url,
+        parser,
+        skip=skip,
+        force=force,
+        retry_failed=args.retry_failed,
+        refresh_search=args.refresh_search,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta ou limpa a fronteira de crawl.")
+    parser.add_argument("command", choices=["stats", "reset"], help="Ação a executar")
+    parser.add_argument(
+        "--frontier", type=Path, default=FRONTIER_PATH, help=f"Banco da fronteira de crawl (padrão: {FRONTIER_PATH})"
+    )
+    parser.add_argument("--keyword", type=str, default=None, help="Com reset, só as páginas de busca desta busca")
+    parser.add_argument("--stage", type=str, default=None, help="Com reset, só os downloads desta etapa")
+    args = parser.parse_args()
+
+    with CrawlFrontier(args.frontier) as frontier:
+        if args.command == "reset":
+            frontier.reset(args.keyword, args.stage)
+            print("Fronteira de crawl limpa.")
+        stats = frontier.stats()
+        print(f"{stats['patents']} patentes descobertas.")
+        for keyword, counts in stats["keywords"].items():
+            print(
+                f"  '{keyword}': {counts['visited']}/{counts['search_pages']} páginas de busca visitadas, "
+                f"{counts['links']} links, {counts['patents']} patentes"
+            )
+        for row in stats["fetches"]:
+            print(f"  {row['stage']}: {row['count']} {row['status']}")
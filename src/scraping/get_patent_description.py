@@ -1,80 +1,26 @@
 import argparse
-import json
-from pathlib import Path
 
-import requests
-from bs4 import BeautifulSoup
+from src.data.patent_store import get_store
+from src.instrumentation import add_instrumentation_arguments, instrumentation_from_args, span
+from src.scraping.fetch import add_fetch_arguments, extract_patent_id_from_url, fetcher_from_args
+from src.scraping.frontier import add_frontier_arguments, crawl_from_args, frontier_from_args
+from src.scraping.parsers import get_parser
+from src.scraping.patent_page import save_patent_record
 
 
-def extract_patent_id_from_url(url):
-    # Extrai o ID da patente da URL (última parte após a "/")
-    return url.split("/")[-1].split(".")[0]
+def extract_description_from_html(url, html, html_parser):
+    # Extrai o texto da seção após o <div> que contém "Description:"
+    with span("parse", bytes=len(html)):
+        description_text = html_parser.description(html)
 
+    if description_text is not None:
+        # Atualiza o registro da patente sem apagar campos salvos por outros scrapers
+        patent_id = extract_patent_id_from_url(url)
+        store_path = save_patent_record(patent_id, {"url": url, "description_html": description_text})
 
-def extract_description_from_html(url):
-    try:
-        # Acessa a página da patente
-        response = requests.get(url)
-        response.raise_for_status()
-
-        # Faz o parsing do conteúdo HTML da página
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Encontra o elemento <div> que contém "Description:"
-        description_div = soup.find("div", class_="disp_elm_title", string="Description:")
-
-        if description_div:
-            # Acha o próximo conteúdo após o div "Description:"
-            description_section = description_div.find_next_sibling()
-
-            if description_section:
-                # Extrai o HTML completo da seção de descrição
-                description_text = description_section.get_text()
-
-                # Estrutura do JSON a ser salvo
-                patent_data = {"url": url, "description_html": description_text}
-
-                # Cria o diretório usando pathlib
-                output_dir = Path("data/patents/")
-                output_dir.mkdir(parents=True, exist_ok=True)
-
-                # Extrai o ID da patente da URL e salva o arquivo com esse nome
-                patent_id = extract_patent_id_from_url(url)
-                json_file_path = output_dir / f"{patent_id}.json"
-
-                # Salva os dados no formato JSON
-                with open(json_file_path, "w") as json_file:
-                    json.dump(patent_data, json_file, indent=4)
-
-                print(f"Dados da patente extraídos com sucesso e salvos em '{json_file_path}'.")
-            else:
-                print("Seção de Description não encontrada.")
-        else:
-            print("Elemento 'Description:' não encontrado na página.")
-
-    except requests.exceptions.RequestException as e:
-        print(f"Erro ao acessar a página: {e}")
-
-
-def get_patent_links(search_url):
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/91.0.4472.124 Safari/537.36"
-        )
-    }
-    response = requests.get(search_url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    # Encontrar links de patentes cujo texto contenha a palavra-chave
-    links = []
-    for link in soup.find_all("a", href=True):
-        # Verifica se o texto do link contém "glass" (não sensível a maiúsculas/minúsculas)
-        if "glass" in link.get_text().lower():
-            full_url = f"https://www.freepatentsonline.com{link['href']}"
-            links.append(full_url)
-
-    return links
+        print(f"Dados da patente extraídos com sucesso e salvos em '{store_path}'.")
+    else:
+        print("Elemento 'Description:' não encontrado na página.")
 
 
 if __name__ == "__main__":
@@ -85,27 +31,25 @@ if __name__ == "__main__":
     parser.add_argument(
         "--keyword", type=str, default="glass refractive", help="Palavra-chave para busca (padrão: 'glass refractive')"
     )
+    add_fetch_arguments(parser)
+    add_frontier_arguments(parser)
+    add_instrumentation_arguments(parser)
 
     args = parser.parse_args()
-
-    keyword = args.keyword
-    keyword = keyword.replace(" ", "+")
-
-    for page in range(1, args.max_page + 1):
-        search_url = (
-            f"https://www.freepatentsonline.com/result.html?"
-            f"p={page}&sort=relevance&srch=top&"
-            f"query_txt={keyword}&patents_us=on"
+    instrumentation_from_args(args)
+
+    html_parser = get_parser(args.parser)
+
+    with fetcher_from_args(args) as fetcher, frontier_from_args(args) as frontier:
+        # Patentes que já têm o campo no registro são puladas sem download
+        crawled = crawl_from_args(
+            fetcher,
+            frontier,
+            args,
+            args.max_page,
+            "description",
+            html_parser,
+            skip=lambda patent_id: get_store().has_field(patent_id, "description_html"),
         )
-
-        patent_links = get_patent_links(search_url)
-
-        for pat in patent_links:
-            patent_id = extract_patent_id_from_url(pat)
-            json_file_path = Path(f"data/patents/{patent_id}.json")
-
-            # Verifica se o arquivo já existe
-            if not json_file_path.exists():
-                extract_description_from_html(pat)
-            else:
-                print(f"Arquivo {json_file_path} já existe. Pulando extração.")
+        for pat, page in crawled:
+            extract_description_from_html(pat, page.text, html_parser)
@@ -1,81 +1,43 @@
 import argparse
-import json
-from pathlib import Path
 
-import requests
-from bs4 import BeautifulSoup
+from src.data.compounds import COMPOUND_LIST, get_matcher
+from src.data.patent_store import get_store
+from src.instrumentation import add_instrumentation_arguments, count, instrumentation_from_args, span
+from src.scraping.fetch import add_fetch_arguments, extract_patent_id_from_url, fetcher_from_args
+from src.scraping.frontier import add_frontier_arguments, crawl_from_args, frontier_from_args
+from src.scraping.parsers import get_parser
 
 
-def extract_patent_id_from_url(url):
-    """Extrai o ID da patente a partir da URL."""
-    return url.split("/")[-1].split(".")[0]
-
-
-def format_table_as_text(table):
-    """Formata uma tabela HTML como texto separado por vírgula."""
-    rows = table.find_all("tr")
-    return "\n".join(",".join(col.get_text(strip=True) for col in row.find_all(["th", "td"])) for row in rows)
-
-
-def contains_desired_compounds(table_text, desired_compounds):
+def contains_desired_compounds(table_text, matcher):
     """Verifica se a tabela contém algum dos compostos desejados."""
-    return any(compound in table_text for compound in desired_compounds)
-
-
-def save_table_text(table_text, output_dir, table_idx):
-    """Salva o texto formatado da tabela no arquivo .txt."""
-    output_dir.mkdir(parents=True, exist_ok=True)
-    table_file_path = output_dir / f"table_{table_idx}.txt"
-    with open(table_file_path, "w") as table_file:
-        table_file.write(table_text)
-    print(f"Tabela {table_idx} salva em '{table_file_path}'.")
-
-
-def save_raw_tables_from_html(url, desired_compounds):
-    """Acessa uma página de patente, processa tabelas e salva as que contêm compostos desejados."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
-        tables = soup.find_all("patent-tables")
-
-        if not tables:
-            print("Elemento '<patent-tables>' não encontrado na página.")
-            return 0
-
-        patent_id = extract_patent_id_from_url(url)
-        output_dir = Path(f"data/patents/{patent_id}")
-        saved_tables = 0
+    return matcher.contains_any(table_text)
 
-        for idx, table in enumerate(tables, start=1):
-            table_text = format_table_as_text(table)
-            if contains_desired_compounds(table_text, desired_compounds):
-                save_table_text(table_text, output_dir, idx)
-                saved_tables += 1
 
-        if saved_tables == 0:
-            print("Nenhuma tabela contém compostos desejados. Nenhum arquivo foi salvo.")
+def save_raw_tables_from_html(url, html, matcher, html_parser, store=None):
+    """Processa as tabelas de uma página de patente já baixada e salva as que contêm compostos desejados."""
+    with span("parse", bytes=len(html)):
+        tables = html_parser.tables(html)
 
-        return saved_tables
-
-    except requests.exceptions.RequestException as e:
-        print(f"Erro ao acessar a página: {e}")
+    if not tables:
+        print("Elemento '<patent-tables>' não encontrado na página.")
         return 0
 
-
-def get_patent_links(search_url):
-    """Obtém links de patentes de uma página de busca que contenham a palavra 'glass'."""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) \
-                Chrome/91.0.4472.124 Safari/537.36"
+    patent_id = extract_patent_id_from_url(url)
+    saved_tables = {
+        idx: table_text
+        for idx, table_text in enumerate(tables, start=1)
+        if contains_desired_compounds(table_text, matcher)
     }
-    response = requests.get(search_url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
-    return [
-        f"https://www.freepatentsonline.com{link['href']}"
-        for link in soup.find_all("a", href=True)
-        if "glass" in link.get_text().lower()
-    ]
+
+    count("tables", len(saved_tables), result="kept")
+    count("tables", len(tables) - len(saved_tables), result="dropped")
+    if saved_tables:
+        (store or get_store()).put_tables(patent_id, saved_tables)
+        print(f"Tabelas {sorted(saved_tables)} da patente {patent_id} salvas.")
+    else:
+        print("Nenhuma tabela contém compostos desejados. Nenhuma tabela foi salva.")
+
+    return len(saved_tables)
 
 
 if __name__ == "__main__":
@@ -96,40 +58,34 @@ if __name__ == "__main__":
         default="glass composition",
         help="Palavra-chave para busca de patentes",
     )
+    parser.add_argument(
+        "--compound_list",
+        choices=["desired_compounds", "all_compounds"],
+        default=COMPOUND_LIST,
+        help=f"Lista de compostos de properties.json usada para filtrar as tabelas (padrão: {COMPOUND_LIST})",
+    )
+    add_fetch_arguments(parser)
+    add_frontier_arguments(parser)
+    add_instrumentation_arguments(parser)
     args = parser.parse_args()
+    instrumentation_from_args(args)
 
-    keyword = args.keyword.replace(" ", "+")
-
-    with open("json/properties.json", "r") as json_file:
-        desired_compounds = json.load(json_file)["desired_compounds"]
+    matcher = get_matcher(args.compound_list)
 
-    for page in range(1, args.page_max + 1):
-        search_url = (
-            f"https://www.freepatentsonline.com/result.html?"
-            f"p={page}&sort=relevance&srch=top&query_txt={keyword}&patents_us=on"
-        )
-        patent_links = get_patent_links(search_url)
+    html_parser = get_parser(args.parser)
 
-        for pat in patent_links:
+    store = get_store()
+    with fetcher_from_args(args) as fetcher, frontier_from_args(args) as frontier:
+        crawled = crawl_from_args(fetcher, frontier, args, args.page_max, "tables", html_parser, skip=store.has_tables)
+        for pat, page in crawled:
             patent_id = extract_patent_id_from_url(pat)
-            output_dir = Path(f"data/patents/{patent_id}")
-
-            if output_dir.exists():
-                print(f"Pasta {output_dir} já existe. Pulando extração.")
-                continue
-
-            # Salvar as tabelas de dados
-            saved_tables = save_raw_tables_from_html(pat, desired_compounds)
-
-            # Se pelo menos uma tabela foi salva, salvar metadados e criar o diretório
-            if saved_tables > 0:
-                output_dir.mkdir(parents=True, exist_ok=True)
-                metadata_file_path = output_dir / "metadata.txt"
-                with open(metadata_file_path, "w") as metadata_file:
-                    metadata_file.write(f"Patent URL: {pat}\n")
-                    metadata_file.write(f"Page Max: {args.page_max}\n")
-                    metadata_file.write(f"Keyword: {args.keyword}\n")
-                print(f"Metadados salvos em '{metadata_file_path}'.")
 
-            else:
-                print(f"Nenhuma tabela foi salva para a patente {patent_id}. Metadados não foram gerados.")
+            # Salvar as tabelas de dados e, se pelo menos uma foi salva, os metadados no registro da patente
+            with store.batch():
+                saved_tables = save_raw_tables_from_html(pat, page.text, matcher, html_parser, store)
+                if saved_tables > 0:
+                    metadata = {"keyword": args.keyword, "page_max": args.page_max}
+                    store.put_patent(patent_id, {"url": pat, "patent_id": patent_id, "metadata": metadata})
+                    print(f"Metadados da patente {patent_id} salvos.")
+                else:
+                    print(f"Nenhuma tabela foi salva para a patente {patent_id}. Metadados não foram gerados.")
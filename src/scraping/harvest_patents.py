@@ -0,0 +1,121 @@
+import argparse
+from datetime import datetime, timezone
+
+from src.data.compounds import COMPOUND_LIST, get_matcher
+from src.data.dedup import add_dedup_arguments, dedup_from_args, fingerprint_record
+from src.data.patent_store import get_store
+from src.instrumentation import add_instrumentation_arguments, count, instrumentation_from_args, span
+from src.scraping.fetch import add_fetch_arguments, extract_patent_id_from_url, fetcher_from_args
+from src.scraping.frontier import add_frontier_arguments, crawl_from_args, frontier_from_args
+from src.scraping.get_patent_tables import contains_desired_compounds
+from src.scraping.page_cache import PageCache
+from src.scraping.parsers import get_parser
+from src.scraping.patent_page import load_patent_record, save_patent_record
+
+
+def harvest_patent(url, html, matcher, metadata, html_parser, store=None, dedup=None):
+    """Extrai claims, descrição e tabelas de uma página já baixada e grava um único registro por patente.
+
+    O registro completo vai para o banco de patentes, e as tabelas com compostos desejados também são salvas
+    na tabela `tables`, lida por `process_table_to_csv`, na mesma transação. Com `dedup`, as claims e as tabelas
+    salvas são assinadas, e uma patente com claims quase iguais às de outra recebe `duplicate_of`.
+    """
+    store = store or get_store()
+    patent_id = extract_patent_id_from_url(url)
+    with span("parse", bytes=len(html)):
+        parsed = html_parser.parse_patent_page(html)
+
+    tables = {
+        idx: table_text
+        for idx, table_text in enumerate(parsed["tables_text"], start=1)
+        if contains_desired_compounds(table_text, matcher)
+    }
+    record = {
+        "url": url,
+        "patent_id": patent_id,
+        "claims": parsed["claims"],
+        "description_html": parsed["description"],
+        "tables": parsed["tables_html"],
+        "tables_text": parsed["tables_text"],
+        "saved_tables": sorted(tables),
+        "metadata": metadata,
+    }
+    count("tables", len(tables), result="kept")
+    count("tables", len(parsed["tables_text"]) - len(tables), result="dropped")
+    with span("store.write"), store.batch():
+        store.put_tables(patent_id, tables)
+        match = fingerprint_record(dedup, patent_id, record, sorted(tables)) if dedup is not None else None
+        if match is not None:
+            record["duplicate_of"] = match.canonical
+        save_patent_record(patent_id, record, store)
+    duplicate = f", claims quase iguais às de {match.canonical}" if match is not None else ""
+    print(f"Patente {patent_id}: {len(parsed['tables_html'])} tabelas ({len(tables)} salvas){duplicate}.")
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Baixa cada página de patente uma única vez e extrai claims, descrição e tabelas."
+    )
+    parser.add_argument("--page_max", "-p", type=int, default=1, help="Número máximo de páginas a serem buscadas")
+    parser.add_argument(
+        "--keyword", "-k", type=str, default="glass composition", help="Palavra-chave para busca de patentes"
+    )
+    parser.add_argument("--force", action="store_true", help="Reprocessa patentes que já possuem registro completo")
+    parser.add_argument(
+        "--from_cache",
+        action="store_true",
+        help="Reextrai todas as patentes presentes no cache de páginas, sem buscar nem acessar a rede",
+    )
+    parser.add_argument(
+        "--compound_list",
+        choices=["desired_compounds", "all_compounds"],
+        default=COMPOUND_LIST,
+        help=f"Lista de compostos de properties.json usada para filtrar as tabelas (padrão: {COMPOUND_LIST})",
+    )
+    add_fetch_arguments(parser)
+    add_frontier_arguments(parser)
+    add_dedup_arguments(parser)
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    instrumentation_from_args(args)
+
+    matcher = get_matcher(args.compound_list)
+
+    html_parser = get_parser(args.parser)
+    store = get_store()
+    dedup = dedup_from_args(args, store)
+
+    if args.from_cache:
+        cache = PageCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024**2)
+        for pat in cache.urls():
+            if "/result.html" in pat:
+                continue
+            previous = load_patent_record(extract_patent_id_from_url(pat), store)
+            metadata = previous.get("metadata", {"keyword": args.keyword, "page_max": args.page_max})
+            harvest_patent(pat, cache.get(pat)["content"], matcher, metadata, html_parser, store, dedup)
+        cache.close()
+        if dedup is not None:
+            print(dedup.report())
+        raise SystemExit(0)
+
+    with fetcher_from_args(args) as fetcher, frontier_from_args(args) as frontier:
+        crawled = crawl_from_args(
+            fetcher,
+            frontier,
+            args,
+            args.page_max,
+            "harvest",
+            html_parser,
+            skip=lambda patent_id: store.has_field(patent_id, "tables"),
+            force=args.force,
+        )
+        for pat, page in crawled:
+            metadata = {
+                "keyword": args.keyword,
+                "page_max": args.page_max,
+                "fetched_at": datetime.now(timezone.utc).isoformat(),
+            }
+            harvest_patent(pat, page.text, matcher, metadata, html_parser, store, dedup)
+    if dedup is not None:
+        print(dedup.report())
@@ -0,0 +1,172 @@
+"""Cache em disco do HTML bruto das páginas baixadas.
+
+Os corpos são gravados comprimidos (zstd quando o pacote `zstandard` está instalado, gzip caso contrário) em
+arquivos nomeados pelo SHA-256 do conteúdo, de modo que páginas idênticas ocupam um único arquivo. Um índice
+SQLite associa cada URL ao seu conteúdo, aos cabeçalhos ETag/Last-Modified e ao horário do último acesso, que é
+usado para remover as entradas menos usadas quando o cache passa de `max_bytes`.
+"""
+
+import gzip
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CACHE_DIR = Path("data/cache/pages")
+
+
+def _compress(content):
+    if zstandard is not None:
+        return "zst", zstandard.ZstdCompressor(level=10).compress(content)
+    return "gz", gzip.compress(content, compresslevel=6)
+
+
+def _decompress(codec, data):
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("O pacote 'zstandard' é necessário para ler este cache.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageCache:
+    """Cache de páginas indexado por URL, com revalidação HTTP e remoção LRU."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=2 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.cache_dir / "index.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self._db.commit()
+        # Total mantido a cada gravação e remoção, para não somar o índice inteiro a cada `put`
+        self._bytes = self._sum_bytes()
+
+    def _body_path(self, digest, codec):
+        return self.cache_dir / digest[:2] / f"{digest}.{codec}"
+
+    def get(self, url):
+        """Devolve um dicionário com `content`, `etag`, `last_modified` e `stored_at`, ou None se não houver."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, codec, size, etag, last_modified, stored_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            digest, codec, size, etag, last_modified, stored_at = row
+            # Lido sob o lock: fora dele, um `_evict` de outra thread pode apagar o arquivo
+            try:
+                data = self._body_path(digest, codec).read_bytes()
+            except FileNotFoundError:
+                self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._remove_body_if_unused(digest, codec, size)
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+            self.hits += 1
+
+        content = _decompress(codec, data)
+        return {"content": content, "etag": etag, "last_modified": last_modified, "stored_at": stored_at}
+
+    def put(self, url, content, headers=None):
+        """Grava o corpo de uma página e os cabeçalhos de validação da resposta."""
+        headers = headers or {}
+        digest = hashlib.sha256(content).hexdigest()
+        codec, data = _compress(content)
+        body_path = self._body_path(digest, codec)
+        now = time.time()
+
+        with self._lock:
+            if not body_path.exists():
+                body_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = body_path.with_suffix(".tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(body_path)
+
+            previous = self._db.execute("SELECT digest, codec, size FROM pages WHERE url = ?", (url,)).fetchone()
+            if not self._in_use(digest, codec):
+                self._bytes += len(data)
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, codec, len(data), headers.get("ETag"), headers.get("Last-Modified"), now, now),
+            )
+            if previous is not None and tuple(previous[:2]) != (digest, codec):
+                self._remove_body_if_unused(*previous)
+            self._db.commit()
+            self._evict()
+
+    def touch(self, url):
+        """Marca a entrada como revalidada (resposta 304) sem regravar o corpo."""
+        with self._lock:
+            now = time.time()
+            self._db.execute("UPDATE pages SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._db.commit()
+
+    def urls(self):
+        """Lista todas as URLs presentes no cache."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT url FROM pages ORDER BY url")]
+
+    def total_bytes(self):
+        """Tamanho comprimido dos corpos armazenados, contando cada conteúdo uma única vez."""
+        with self._lock:
+            return self._bytes
+
+    def _sum_bytes(self):
+        row = self._db.execute("SELECT SUM(size) FROM (SELECT DISTINCT digest, codec, size FROM pages)").fetchone()
+        return row[0] or 0
+
+    def _in_use(self, digest, codec):
+        in_use = self._db.execute("SELECT 1 FROM pages WHERE digest = ? AND codec = ? LIMIT 1", (digest, codec))
+        return in_use.fetchone() is not None
+
+    def _remove_body_if_unused(self, digest, codec, size):
+        """Apaga o corpo de uma entrada removida e o desconta do total, se nenhuma outra URL o usa."""
+        if not self._in_use(digest, codec):
+            self._bytes -= size
+            self._body_path(digest, codec).unlink(missing_ok=True)
+
+    def _evict(self):
+        """Remove as entradas acessadas há mais tempo até o cache caber em `max_bytes`."""
+        if self._bytes <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT url, digest, codec, size FROM pages ORDER BY accessed_at").fetchall()
+        for url, digest, codec, size in rows:
+            if self._bytes <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._remove_body_if_unused(digest, codec, size)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,232 @@
+"""Backends de parsing de páginas de patentes.
+
+Todos os backends expõem a mesma interface e produzem o mesmo resultado de `patent_page.parse_patent_page`:
+
+- `html.parser`: caminho original com BeautifulSoup, em Python puro (sempre disponível).
+- `lxml`: árvore construída pelo libxml2 e consultas XPath apenas nos elementos `disp_elm_title`, no elemento
+  seguinte a eles e nos `<patent-tables>`, sem percorrer o documento inteiro com `find_all`.
+- `selectolax`: parser Lexbor com seletores CSS, o mais rápido quando o pacote está instalado.
+
+Páginas em bytes são decodificadas antes do parsing por `decode_html`, igual para todos os backends: o lxml sozinho lê
+como latin-1 uma página UTF-8 sem `<meta charset>` ('—' vira 'â\x80\x94'). O texto de `<script>` e `<style>` fica de
+fora de claims e descrição, como no `get_text` do BeautifulSoup.
+
+BeautifulSoup, lxml e selectolax só são importados quando o backend faz o primeiro parsing, para que os comandos
+que só recebem o parser como opção (e o `--help` deles) não paguem o import.
+"""
+
+import re
+from importlib.util import find_spec
+
+from src.scraping.patent_page import extract_claims, extract_description, format_table_as_text, parse_patent_page
+
+TITLE_XPATH = (
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' disp_elm_title ')][normalize-space(.)=$title]"
+)
+TEXT_XPATH = ".//text()[not(ancestor::script or ancestor::style)]"
+
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+def charset_from_headers(headers):
+    """Charset do cabeçalho Content-Type, ou None se a resposta não o informar."""
+    for key, value in (headers or {}).items():
+        if key.lower() == "content-type":
+            match = _CHARSET_RE.search(value)
+            return match.group(1) if match else None
+    return None
+
+
+def decode_html(html, encoding=None):
+    """Texto da página: com `encoding` (o charset da resposta), senão o declarado na página, senão UTF-8."""
+    if isinstance(html, str):
+        return html
+    from bs4 import UnicodeDammit
+
+    known = [encoding] if encoding else []
+    return UnicodeDammit(html, known_definite_encodings=known, user_encodings=["utf-8"], is_html=True).unicode_markup
+
+
+def _join_stripped(strings):
+    """Equivalente a `get_text(strip=True)` do BeautifulSoup."""
+    return "".join(s.strip() for s in strings)
+
+
+class SoupParser:
+    """Backend de referência com BeautifulSoup e `html.parser`."""
+
+    name = "html.parser"
+
+    def _soup(self, html):
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(decode_html(html), "html.parser")
+
+    def links(self, html, base_url):
+        soup = self._soup(html)
+        return [f"{base_url}{a['href']}" for a in soup.find_all("a", href=True) if "glass" in a.get_text().lower()]
+
+    def claims(self, html):
+        return extract_claims(self._soup(html))
+
+    def description(self, html):
+        return extract_description(self._soup(html))
+
+    def tables(self, html):
+        soup = self._soup(html)
+        return [format_table_as_text(table) for table in soup.find_all("patent-tables")]
+
+    def parse_patent_page(self, html):
+        return parse_patent_page(decode_html(html))
+
+
+class LxmlParser:
+    """Backend com lxml e consultas XPath direcionadas."""
+
+    name = "lxml"
+
+    def _tree(self, html):
+        import lxml.html
+
+        return lxml.html.fromstring(decode_html(html))
+
+    def _section(self, tree, title):
+        titles = tree.xpath(TITLE_XPATH, title=title)
+        if not titles:
+            return None
+        following = titles[0].xpath("following-sibling::*[1]")
+        return following[0] if following else None
+
+    def _text(self, element):
+        return element.xpath(TEXT_XPATH, smart_strings=False)
+
+    def _claims(self, tree):
+        section = self._section(tree, "Claims:")
+        return _join_stripped(self._text(section)) if section is not None else None
+
+    def _description(self, tree):
+        section = self._section(tree, "Description:")
+        return "".join(self._text(section)) if section is not None else None
+
+    def _table_text(self, table):
+        return "\n".join(
+            ",".join(_join_stripped(cell.itertext()) for cell in row.xpath(".//th|.//td")) for row in table.iter("tr")
+        )
+
+    def links(self, html, base_url):
+        tree = self._tree(html)
+        return [f"{base_url}{a.get('href')}" for a in tree.xpath("//a[@href]") if "glass" in a.text_content().lower()]
+
+    def claims(self, html):
+        return self._claims(self._tree(html))
+
+    def description(self, html):
+        return self._description(self._tree(html))
+
+    def tables(self, html):
+        return [self._table_text(table) for table in self._tree(html).xpath("//patent-tables")]
+
+    def parse_patent_page(self, html):
+        import lxml.html
+
+        tree = self._tree(html)
+        tables = tree.xpath("//patent-tables")
+        return {
+            "claims": self._claims(tree),
+            "description": self._description(tree),
+            "tables_html": [lxml.html.tostring(table, encoding="unicode", with_tail=False) for table in tables],
+            "tables_text": [self._table_text(table) for table in tables],
+        }
+
+
+class SelectolaxParser:
+    """Backend com selectolax (Lexbor) e seletores CSS."""
+
+    name = "selectolax"
+
+    def _tree(self, html):
+        from selectolax.lexbor import LexborHTMLParser
+
+        return LexborHTMLParser(decode_html(html))
+
+    def _section(self, tree, title):
+        for node in tree.css("div.disp_elm_title"):
+            if node.text(deep=True).strip() == title:
+                sibling = node.next
+                while sibling is not None and sibling.tag in ("-text", "_text", "-comment", "_comment"):
+                    sibling = sibling.next
+                return sibling
+        return None
+
+    def _section_text(self, tree, title, strip=False):
+        section = self._section(tree, title)
+        if section is None:
+            return None
+        # Remove <script> e <style> da seção; as tabelas já foram lidas antes, em `parse_patent_page`
+        for node in section.css("script, style"):
+            node.decompose()
+        return section.text(deep=True, strip=strip)
+
+    def _claims(self, tree):
+        return self._section_text(tree, "Claims:", strip=True)
+
+    def _description(self, tree):
+        return self._section_text(tree, "Description:")
+
+    def _table_text(self, table):
+        return "\n".join(
+            ",".join(cell.text(deep=True, strip=True) for cell in row.css("th, td")) for row in table.css("tr")
+        )
+
+    def links(self, html, base_url):
+        tree = self._tree(html)
+        return [
+            f"{base_url}{a.attributes['href']}" for a in tree.css("a[href]") if "glass" in a.text(deep=True).lower()
+        ]
+
+    def claims(self, html):
+        return self._claims(self._tree(html))
+
+    def description(self, html):
+        return self._description(self._tree(html))
+
+    def tables(self, html):
+        return [self._table_text(table) for table in self._tree(html).css("patent-tables")]
+
+    def parse_patent_page(self, html):
+        tree = self._tree(html)
+        tables = tree.css("patent-tables")
+        tables_html = [table.html for table in tables]
+        tables_text = [self._table_text(table) for table in tables]
+        return {
+            "claims": self._claims(tree),
+            "description": self._description(tree),
+            "tables_html": tables_html,
+            "tables_text": tables_text,
+        }
+
+
+PARSERS = {"html.parser": SoupParser, "lxml": LxmlParser, "selectolax": SelectolaxParser}
+
+
+def available_parsers():
+    """Lista os backends cujas dependências estão instaladas."""
+    names = ["html.parser"]
+    if find_spec("lxml") is not None:
+        names.append("lxml")
+    if find_spec("selectolax") is not None:
+        names.append("selectolax")
+    return names
+
+
+def default_parser_name():
+    """Backend padrão: lxml, se instalado, com o mesmo resultado do `html.parser` em bem menos tempo."""
+    return "lxml" if find_spec("lxml") is not None else "html.parser"
+
+
+def get_parser(name=None):
+    """Devolve uma instância do backend pedido (ou do padrão, se `name` for None)."""
+    name = name or default_parser_name()
+    if name not in available_parsers():
+        raise ValueError(f"Parser '{name}' indisponível. Opções instaladas: {', '.join(available_parsers())}")
+    return PARSERS[name]()
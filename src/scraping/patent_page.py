@@ -0,0 +1,53 @@
+"""Extração do conteúdo de uma página de patente e gravação do registro por patente no banco de patentes."""
+
+from src.data.patent_store import get_store
+
+
+def find_section(soup, title):
+    """Devolve o elemento logo após o <div class="disp_elm_title"> com o título dado."""
+    title_div = soup.find("div", class_="disp_elm_title", string=title)
+    return title_div.find_next_sibling() if title_div else None
+
+
+def extract_claims(soup):
+    """Extrai o texto da seção 'Claims:' ou None se ela não existir."""
+    claims_section = find_section(soup, "Claims:")
+    return claims_section.get_text(strip=True) if claims_section else None
+
+
+def extract_description(soup):
+    """Extrai o texto da seção 'Description:' ou None se ela não existir."""
+    description_section = find_section(soup, "Description:")
+    return description_section.get_text() if description_section else None
+
+
+def format_table_as_text(table):
+    """Formata uma tabela HTML como texto separado por vírgula."""
+    rows = table.find_all("tr")
+    return "\n".join(",".join(col.get_text(strip=True) for col in row.find_all(["th", "td"])) for row in rows)
+
+
+def parse_patent_page(html):
+    """Faz o parsing da página uma única vez e extrai claims, descrição e tabelas."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    tables = soup.find_all("patent-tables")
+    return {
+        "claims": extract_claims(soup),
+        "description": extract_description(soup),
+        "tables_html": [str(table) for table in tables],
+        "tables_text": [format_table_as_text(table) for table in tables],
+    }
+
+
+def save_patent_record(patent_id, fields, store=None):
+    """Atualiza o registro da patente com os campos dados, preservando os que já existem."""
+    store = store or get_store()
+    store.put_patent(patent_id, fields)
+    return store.path
+
+
+def load_patent_record(patent_id, store=None):
+    """Lê o registro de uma patente ou devolve um dicionário vazio."""
+    return (store or get_store()).get_patent(patent_id)
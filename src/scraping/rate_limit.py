@@ -0,0 +1,180 @@
+"""Controle de taxa adaptativo e política de novas tentativas para as requisições dos scrapers.
+
+Um intervalo fixo entre requisições ou é lento demais (quando o site aguenta mais) ou rápido demais (quando ele
+começa a responder 429/503). Aqui cada host tem um balde de tokens cuja taxa é ajustada por AIMD: cada resposta
+rápida e bem-sucedida aumenta a taxa um pouco (aditivo) e cada 429, 5xx, timeout ou resposta lenta a corta pela
+metade (multiplicativo), respeitando `Retry-After`. Assim a taxa converge para a máxima que o site sustenta, e ela
+fica medida em `stats()` em vez de chutada.
+
+As falhas transitórias são repetidas com backoff exponencial com jitter, e `RETRY_STATUS` diz quais códigos HTTP
+valem uma nova tentativa.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+
+def parse_retry_after(value):
+    """Segundos pedidos pelo cabeçalho `Retry-After` (em segundos ou data HTTP), ou None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Quantas vezes repetir uma requisição e quanto esperar entre as tentativas.
+
+    A espera da tentativa `n` é sorteada entre 0 e `min(max_backoff, backoff * 2**n)` ("full jitter"), para que os
+    workers que falharam juntos não voltem todos ao mesmo tempo, e nunca é menor que o `Retry-After` do servidor.
+    """
+
+    retries: int = 4
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+
+    def delay(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+
+@dataclass
+class _HostState:
+    rate: float
+    tokens: float = 1.0
+    updated: float = field(default_factory=time.monotonic)
+    paused_until: float = 0.0
+    last_decrease: float = 0.0
+    requests: int = 0
+    successes: int = 0
+    throttled: int = 0
+    errors: int = 0
+    latency: float = 0.0
+    first_success: float = None
+    last_success: float = None
+    min_rate_seen: float = None
+    max_rate_seen: float = None
+
+
+class AdaptiveRateLimiter:
+    """Balde de tokens por host com taxa ajustada por AIMD.
+
+    - `acquire(host)` bloqueia até haver um token (a taxa inicial é `rate` requisições por segundo, com rajadas de
+      até `burst` requisições);
+    - `record(host, status, latency, retry_after)` informa o resultado: sucessos com latência até `target_latency`
+      somam cerca de `increase` req/s à taxa a cada segundo, e 429/5xx/timeouts/respostas lentas a multiplicam por
+      `decrease` (no máximo uma vez por intervalo de `cooldown` segundos, para que as respostas de uma mesma rajada
+      não a derrubem várias vezes). Com `adaptive=False` a taxa fica fixa.
+    """
+
+    def __init__(
+        self,
+        rate=2.0,
+        min_rate=0.2,
+        max_rate=20.0,
+        burst=2,
+        increase=0.5,
+        decrease=0.5,
+        target_latency=5.0,
+        cooldown=1.0,
+        adaptive=True,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(rate=self.rate, tokens=min(1.0, self.burst))
+        return state
+
+    def acquire(self, host):
+        """Reserva um token do host e espera até ele estar disponível (e até o fim de um `Retry-After`)."""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            state.tokens -= 1
+            delay = max(-state.tokens / state.rate, state.paused_until - now)
+            state.requests += 1
+        if delay > 0:
+            time.sleep(delay)
+
+    def _decrease(self, state, now):
+        if now - state.last_decrease < self.cooldown:
+            return
+        state.last_decrease = now
+        state.rate = max(self.min_rate, state.rate * self.decrease)
+
+    def record(self, host, status=None, latency=0.0, retry_after=None):
+        """Ajusta a taxa do host pelo resultado de uma requisição (`status=None` para timeout ou erro de conexão)."""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            if retry_after:
+                state.paused_until = max(state.paused_until, now + retry_after)
+
+            if status is None or status in RETRY_STATUS:
+                if status in THROTTLE_STATUS:
+                    state.throttled += 1
+                else:
+                    state.errors += 1
+                if self.adaptive:
+                    self._decrease(state, now)
+            else:
+                state.successes += 1
+                state.latency += latency
+                state.first_success = state.first_success or now
+                state.last_success = now
+                if self.adaptive:
+                    if latency > self.target_latency:
+                        self._decrease(state, now)
+                    else:
+                        state.rate = min(self.max_rate, state.rate + self.increase / state.rate)
+
+            state.min_rate_seen = min(state.rate, state.min_rate_seen or state.rate)
+            state.max_rate_seen = max(state.rate, state.max_rate_seen or state.rate)
+
+    def stats(self):
+        """Por host: taxa atual, vazão medida entre o primeiro e o último sucesso, latência média e contagens."""
+        with self._lock:
+            result = {}
+            for host, state in self._hosts.items():
+                span = (state.last_success or 0) - (state.first_success or 0)
+                result[host] = {
+                    "rate": state.rate,
+                    "min_rate": state.min_rate_seen,
+                    "max_rate": state.max_rate_seen,
+                    "throughput": (state.successes - 1) / span if span > 0 else None,
+                    "mean_latency": state.latency / state.successes if state.successes else None,
+                    "requests": state.requests,
+                    "successes": state.successes,
+                    "throttled": state.throttled,
+                    "errors": state.errors,
+                }
+            return result
@@ -0,0 +1,53 @@
+"""Servidores locais usados pelos testes: o site de patentes com falhas injetadas e o Ollama falso."""
+
+import pytest
+
+from src.bench.fake_llm import start_fake_llm
+from src.scraping.fault_server import FaultConfig, start_server
+
+
+class RecordingFaultConfig(FaultConfig):
+    """`FaultConfig` que também guarda o maior número de requisições em andamento ao mesmo tempo."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_in_flight = 0
+
+    def decide(self):
+        outcome, latency = super().decide()
+        with self.lock:
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return outcome, latency
+
+
+@pytest.fixture
+def fault_server():
+    """Sobe o servidor de patentes com as falhas pedidas; devolve (URL base, configuração)."""
+    servers = []
+
+    def start(**options):
+        config = RecordingFaultConfig(**{"capacity": 0, "latency": 0.0, "seed": 0, **options})
+        server, base_url = start_server(config)
+        servers.append(server)
+        return base_url, config
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fake_llm():
+    """Sobe o Ollama falso com o `FakeLLM` dado; devolve a URL base."""
+    servers = []
+
+    def start(llm):
+        server, base_url, _ = start_fake_llm(llm)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,63 @@
+from src.scraping.fault_server import LINKS_PER_PAGE
+from src.scraping.fetch import PatentFetcher, discover_patent_links
+from src.scraping.page_cache import PageCache
+from src.scraping.rate_limit import AdaptiveRateLimiter
+
+
+def make_fetcher(**options):
+    limiter = AdaptiveRateLimiter(rate=1000.0, max_rate=1000.0, burst=100, adaptive=False)
+    return PatentFetcher(limiter=limiter, **{"timeout": (2, 5), **options})
+
+
+def test_fetch_all_downloads_every_url(fault_server):
+    base_url, config = fault_server()
+    urls = [f"{base_url}/{1000 + idx}.html" for idx in range(20)]
+    with make_fetcher(max_workers=4) as fetcher:
+        pages = dict(fetcher.fetch_all(urls))
+
+    assert set(pages) == set(urls)
+    assert all(page.status_code == 200 for page in pages.values())
+    assert "Glass 1000 with SiO2" in pages[urls[0]].text
+    assert config.counts["ok"] == len(urls)
+
+
+def test_concurrency_is_bounded_by_max_workers(fault_server):
+    base_url, config = fault_server(latency=0.05)
+    urls = [f"{base_url}/{1000 + idx}.html" for idx in range(24)]
+    with make_fetcher(max_workers=3) as fetcher:
+        list(fetcher.fetch_all(urls))
+
+    assert 1 < config.max_in_flight <= 3
+
+
+def test_fetch_iter_limits_pending_downloads(fault_server):
+    base_url, config = fault_server(latency=0.05)
+    urls = (f"{base_url}/{1000 + idx}.html" for idx in range(12))
+    with make_fetcher(max_workers=8) as fetcher:
+        results = list(fetcher.fetch_iter(urls, max_pending=2))
+
+    assert len(results) == 12
+    assert config.max_in_flight <= 2
+
+
+def test_discover_patent_links_deduplicates_search_results(fault_server):
+    base_url, _ = fault_server()
+    with make_fetcher(max_workers=4) as fetcher:
+        links = list(discover_patent_links(fetcher, "glass composition", 3, base_url))
+
+    assert len(links) == len(set(links)) == 3 * LINKS_PER_PAGE
+    assert all(link.startswith(base_url) and link.endswith(".html") for link in links)
+
+
+def test_offline_fetch_is_served_from_cache(fault_server, tmp_path):
+    base_url, config = fault_server()
+    url = f"{base_url}/1000.html"
+    with make_fetcher(cache=PageCache(tmp_path / "pages")) as fetcher:
+        online = fetcher.get(url)
+    with make_fetcher(cache=PageCache(tmp_path / "pages"), offline=True) as fetcher:
+        offline = fetcher.get(url)
+        missing = fetcher.get(f"{base_url}/1001.html")
+
+    assert offline.from_cache and offline.content == online.content
+    assert missing is None
+    assert config.counts["ok"] == 1
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from src.bench.fake_llm import FakeLLM, fake_completion
+from src.llm.llm_cache import LLMCache
+from src.llm.ollama_runner import OllamaRunner
+
+PROMPT = [("human", "{text}")]
+
+
+class ScriptedLLM(FakeLLM):
+    """`FakeLLM` sem latência por token, com uma espera fixa por requisição e falhas nas primeiras `failures`."""
+
+    def __init__(self, delay=0.0, failures=0):
+        super().__init__(prefill_ms=0.0, decode_ms=0.0)
+        self.delay = delay
+        self.failures = failures
+        self.attempts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.state_lock = threading.Lock()
+
+    def respond(self, messages):
+        with self.state_lock:
+            self.attempts += 1
+            if self.attempts <= self.failures:
+                raise RuntimeError("modelo indisponível")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return super().respond(messages)
+        finally:
+            with self.state_lock:
+                self.in_flight -= 1
+
+
+def make_runner(base_url, **options):
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return OllamaRunner(ChatPromptTemplate.from_messages(PROMPT), model="fake", base_url=base_url, **options)
+
+
+def run_all(runner, texts):
+    results = {}
+    runner.run([{"text": text} for text in texts], results.__setitem__)
+    return results
+
+
+def test_run_returns_every_response_by_index(fake_llm):
+    base_url = fake_llm(ScriptedLLM())
+    texts = [f"SiO2 {60 + idx}\nNa2O {idx}" for idx in range(12)]
+    results = run_all(make_runner(base_url, max_concurrency=4), texts)
+
+    assert results == {idx: fake_completion(text) for idx, text in enumerate(texts)}
+
+
+def test_requests_in_flight_are_bounded(fake_llm):
+    llm = ScriptedLLM(delay=0.05)
+    base_url = fake_llm(llm)
+    run_all(make_runner(base_url, max_concurrency=3), [f"SiO2 {idx}" for idx in range(15)])
+
+    assert llm.requests == 15
+    assert 1 < llm.max_in_flight <= 3
+
+
+def test_failed_request_is_retried(fake_llm):
+    llm = ScriptedLLM(failures=1)
+    base_url = fake_llm(llm)
+    results = run_all(make_runner(base_url, max_retries=3), ["SiO2 70"])
+
+    assert results == {0: fake_completion("SiO2 70")}
+    assert llm.attempts == 2
+
+
+def test_error_is_reported_after_the_last_retry(fake_llm):
+    llm = ScriptedLLM(failures=100)
+    base_url = fake_llm(llm)
+    results = run_all(make_runner(base_url, max_retries=2), ["SiO2 70"])
+
+    assert isinstance(results[0], Exception)
+    assert llm.attempts == 2
+
+
+def test_cached_responses_skip_the_server(fake_llm, tmp_path):
+    llm = ScriptedLLM()
+    base_url = fake_llm(llm)
+    texts = ["SiO2 70", "SiO2 71", "SiO2 70"]
+    first = run_all(make_runner(base_url, cache=LLMCache(tmp_path / "llm.sqlite")), texts)
+    requests = llm.requests
+    second = run_all(make_runner(base_url, cache=LLMCache(tmp_path / "llm.sqlite")), texts)
+
+    assert first == second
+    assert llm.requests == requests
+
+
+def test_invoke_matches_run(fake_llm):
+    base_url = fake_llm(ScriptedLLM())
+    runner = make_runner(base_url)
+
+    assert runner.invoke({"text": "SiO2 70"}) == run_all(runner, ["SiO2 70"])[0]
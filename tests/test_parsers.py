@@ -0,0 +1,73 @@
+import pytest
+
+from src.bench.fixtures import load_fixtures, synthetic_fixtures
+from src.scraping.fault_server import patent_page, search_page
+from src.scraping.fetch import Page
+from src.scraping.parsers import available_parsers, decode_html, get_parser
+
+FIELDS = ("claims", "description", "tables_text")
+
+UTF8_PAGE = """<html><body><div class="disp_elm_title">Claims:</div><div>1. A glass with Tg of 500 °C — 600 °C
+<script>var tracking = 1;</script></div><div class="disp_elm_title">Description:</div><div><style>p {color: red}</style>
+<p>SiO2 – 60 mol% and Na2O ≤ 15 mol%.</p><!-- nota --><script>window.x = "SiO2";</script><p>Liquidus (°C)</p></div>
+<patent-tables><table><tr><th>Oxide</th><th>Liquidus (°C)</th></tr><tr><td>SiO2</td><td>—</td></tr></table>
+</patent-tables></body></html>"""
+
+LATIN1_PAGE = """<html><head><meta charset="iso-8859-1"></head><body><div class="disp_elm_title">Claims:</div>
+<div>1. A glass melted at 1400 °C.</div><div class="disp_elm_title">Description:</div><div>Tg (°C) é 500.</div>
+</body></html>"""
+
+PAGES = {
+    "fault_server": patent_page("1000000").encode("utf-8"),
+    "utf8_sem_meta": UTF8_PAGE.encode("utf-8"),
+    "latin1_com_meta": LATIN1_PAGE.encode("latin-1"),
+}
+
+
+def extract(name, html):
+    parsed = get_parser(name).parse_patent_page(html)
+    return {field: parsed[field] for field in FIELDS}
+
+
+@pytest.mark.parametrize("name", available_parsers())
+@pytest.mark.parametrize("page", PAGES)
+def test_backends_match_html_parser(name, page):
+    assert extract(name, PAGES[page]) == extract("html.parser", PAGES[page])
+
+
+@pytest.mark.parametrize("name", available_parsers())
+def test_utf8_without_meta_is_decoded_as_utf8(name):
+    parsed = extract(name, PAGES["utf8_sem_meta"])
+
+    assert "500 °C — 600 °C" in parsed["claims"]
+    assert parsed["tables_text"] == ["Oxide,Liquidus (°C)\nSiO2,—"]
+    assert "var tracking" not in parsed["claims"]
+    assert "window.x" not in parsed["description"] and "color: red" not in parsed["description"]
+    assert "nota" not in parsed["description"]
+
+
+@pytest.mark.parametrize("name", available_parsers())
+def test_links_match_html_parser(name):
+    html = search_page(3).encode("utf-8")
+    base_url = "http://127.0.0.1"
+
+    assert get_parser(name).links(html, base_url) == get_parser("html.parser").links(html, base_url)
+
+
+@pytest.mark.parametrize("name", available_parsers())
+def test_backends_match_on_the_synthetic_corpus(name, tmp_path):
+    synthetic_fixtures(tmp_path, n_patents=20, seed=0)
+    pages = load_fixtures(tmp_path)["pages"]
+
+    assert pages
+    for _, html in pages:
+        assert extract(name, html) == extract("html.parser", html)
+
+
+def test_response_charset_takes_precedence():
+    html = "<html><body><p>1400 °C</p></body></html>".encode("latin-1")
+    page = Page("http://127.0.0.1/1.html", 200, html, {"Content-Type": "text/html; charset=ISO-8859-1"})
+
+    assert "1400 °C" in page.text
+    assert "1400 °C" in decode_html(html, "iso-8859-1")
+    assert decode_html("já é texto") == "já é texto"
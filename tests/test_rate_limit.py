@@ -0,0 +1,93 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from src.scraping.fetch import PatentFetcher
+from src.scraping.rate_limit import AdaptiveRateLimiter, RetryPolicy, parse_retry_after
+
+FAST_RETRY = RetryPolicy(retries=3, backoff=0.01, max_backoff=0.05)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("amanhã") is None
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+
+def test_retry_delay_is_jittered_and_honours_retry_after():
+    policy = RetryPolicy(retries=5, backoff=1.0, max_backoff=8.0)
+    delays = [policy.delay(attempt) for attempt in range(6) for _ in range(50)]
+
+    assert all(0 <= delay <= 8.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert policy.delay(0, retry_after=5.0) >= 5.0
+    assert policy.delay(0, retry_after=100.0) == 8.0
+
+
+def test_limiter_increases_on_success_and_halves_on_throttling():
+    limiter = AdaptiveRateLimiter(rate=2.0, increase=0.5, decrease=0.5, cooldown=0.0)
+    for _ in range(10):
+        limiter.record("host", 200, latency=0.1)
+    increased = limiter.stats()["host"]["rate"]
+    limiter.record("host", 429)
+
+    assert increased > 2.0
+    assert limiter.stats()["host"]["rate"] == pytest.approx(increased / 2)
+    assert limiter.stats()["host"]["throttled"] == 1
+
+
+def test_limiter_decreases_once_per_cooldown():
+    limiter = AdaptiveRateLimiter(rate=8.0, decrease=0.5, cooldown=60.0)
+    for _ in range(5):
+        limiter.record("host", 503)
+
+    assert limiter.stats()["host"]["rate"] == 4.0
+
+
+def test_limiter_paces_requests():
+    limiter = AdaptiveRateLimiter(rate=20.0, burst=1, adaptive=False)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire("host")
+
+    assert time.monotonic() - start >= 0.2
+
+
+def test_throttled_requests_are_retried_after_retry_after(fault_server):
+    base_url, config = fault_server(capacity=3)
+    limiter = AdaptiveRateLimiter(rate=50.0, max_rate=50.0, burst=10)
+    urls = [f"{base_url}/{1000 + idx}.html" for idx in range(6)]
+    start = time.monotonic()
+    with PatentFetcher(max_workers=6, limiter=limiter, retry=FAST_RETRY, timeout=(2, 5)) as fetcher:
+        pages = dict(fetcher.fetch_all(urls))
+        retries = fetcher.retries
+
+    host = base_url.split("//")[1]
+    assert all(page is not None and page.status_code == 200 for page in pages.values())
+    assert config.counts["throttled"] > 0 and retries >= config.counts["throttled"]
+    assert limiter.stats()[host]["rate"] < 50.0
+    # O servidor pede `Retry-After: 1`, e o limitador pausa o host por esse tempo
+    assert time.monotonic() - start >= 1.0
+
+
+def test_server_errors_are_retried_until_the_limit(fault_server):
+    base_url, config = fault_server(error_rate=1.0)
+    with PatentFetcher(max_workers=1, retry=FAST_RETRY, host_delay=0, timeout=(2, 5)) as fetcher:
+        page = fetcher.get(f"{base_url}/1000.html")
+
+    assert page is None
+    assert config.counts["errors"] == FAST_RETRY.retries + 1
+
+
+def test_hung_requests_time_out(fault_server):
+    base_url, config = fault_server(hang_rate=1.0, hang_seconds=3.0)
+    retry = RetryPolicy(retries=1, backoff=0.01, max_backoff=0.01)
+    start = time.monotonic()
+    with PatentFetcher(max_workers=1, retry=retry, host_delay=0, timeout=(1, 0.2)) as fetcher:
+        page = fetcher.get(f"{base_url}/1000.html")
+
+    assert page is None
+    assert config.counts["hangs"] == 2
+    assert time.monotonic() - start < 2.0